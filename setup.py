@@ -30,6 +30,7 @@ setup(
     python_requires=">=3.7",
     install_requires=[
         "fastapi==0.95.1",
+        "numpy",
         "openai==1.51.2",
         "qdrant-client==1.12.0",
         "requests==2.30.0",
@@ -38,6 +39,9 @@ setup(
         "uvicorn==0.22.0",
     ],
     extras_require={
+        "async": ["httpx"],
+        "ann": ["hnswlib"],
+        "onnx": ["optimum[onnxruntime]"],
         "dev": ["pytest", "black", "isort"],
     },
 )
\ No newline at end of file
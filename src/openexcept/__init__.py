@@ -1,5 +1,6 @@
 from .easy import OpenExcept
 from .handlers import OpenExceptHandler
+from .remote import AsyncOpenExcept
 
 __version__ = "0.1.0"
-__all__ = ["OpenExcept", "OpenExceptHandler"]
+__all__ = ["OpenExcept", "OpenExceptHandler", "AsyncOpenExcept"]
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import threading
+import time
+import typing as t
+from datetime import datetime
+from .histogram import OccurrenceDelta
+from .storage.base import VectorStorage
+
+if t.TYPE_CHECKING:
+    from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+class OccurrenceAggregator:
+    """Write-behind buffer for group occurrences.
+
+    Repeat occurrences are accumulated in memory as an OccurrenceDelta per group
+    (count, latest timestamp and per-minute counts), then written with one
+    ``increment_occurrences`` call every ``flush_interval`` seconds, as soon as
+    ``max_pending`` occurrences are buffered, and at interpreter exit.
+    """
+
+    def __init__(self, storage: VectorStorage, flush_interval: float = 1.0, max_pending: int = 10000,
+                 metrics: t.Optional["Metrics"] = None):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.flushes = 0
+
+        self._pending: t.Dict[str, OccurrenceDelta] = {}
+        self._pending_total = 0
+        # Groups discarded while a flush is writing, whose deltas it must not put back
+        self._discarded: t.Set[str] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="openexcept-aggregator", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, group_id: str, timestamp: datetime, count: int = 1):
+        if self._closed:
+            delta = OccurrenceDelta()
+            delta.add(timestamp, count)
+            self.storage.increment_occurrences({group_id: delta})
+            return
+        with self._lock:
+            delta = self._pending.get(group_id)
+            if delta is None:
+                delta = self._pending[group_id] = OccurrenceDelta()
+            delta.add(timestamp, count)
+            self._pending_total += count
+            if self._pending_total >= self.max_pending:
+                self._wakeup.set()
+
+    def discard(self, group_id: str):
+        """Drop unflushed occurrences of a group that no longer exists."""
+        with self._lock:
+            delta = self._pending.pop(group_id, None)
+            if delta is not None:
+                self._pending_total -= delta.count
+            self._discarded.add(group_id)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_total = 0
+                self._discarded.clear()
+            if not pending:
+                return
+            try:
+                started = time.perf_counter()
+                self.storage.increment_occurrences(pending)
+                if self.metrics is not None:
+                    self.metrics.stage("increment", type(self.storage).__name__, time.perf_counter() - started,
+                                       len(pending))
+                self.flushes += 1
+            except Exception:
+                # Put the deltas back so that the next flush retries them, except
+                # those of groups deleted meanwhile; the storage drops or redirects
+                # deltas of groups that other processes deleted or merged
+                with self._lock:
+                    for group_id, delta in pending.items():
+                        if group_id in self._discarded:
+                            continue
+                        self._pending_total += delta.count
+                        if group_id in self._pending:
+                            delta.merge(self._pending[group_id])
+                        self._pending[group_id] = delta
+                raise
+
+    def stats(self) -> t.Dict[str, int]:
+        return {"pending": self._pending_total, "flushes": self.flushes}
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        atexit.unregister(self.close)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush occurrence counts")
@@ -0,0 +1,124 @@
+import atexit
+import logging
+import threading
+import time
+import typing as t
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class BackgroundReporter:
+    """Groups exceptions on a background thread so reporting never blocks the caller.
+
+    ``submit`` only appends to a bounded queue. A worker thread sends queued
+    exceptions to ``send_batch`` in batches of up to ``batch_size``, at least every
+    ``flush_interval`` seconds, and drains the queue at interpreter exit. When the
+    queue is full, ``overflow`` decides what happens: ``drop_oldest`` discards the
+    oldest queued exception, ``drop_newest`` discards the submitted one and
+    ``block`` waits for room.
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, send_batch: t.Callable[[t.List[dict]], t.Any], max_queue_size: int = 10000,
+                 batch_size: int = 100, flush_interval: float = 1.0, overflow: str = "drop_oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {self.OVERFLOW_POLICIES}, got {overflow!r}")
+        self.send_batch = send_batch
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue: t.Deque[dict] = deque()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="openexcept-reporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, exception: dict) -> bool:
+        """Queue an exception; returns False if it was dropped."""
+        with self._condition:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue_size:
+                if self.overflow == "drop_newest":
+                    self.dropped += 1
+                    return False
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.max_queue_size and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        self.dropped += 1
+                        return False
+            self._queue.append(exception)
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+            return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything queued so far has been sent; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self, timeout: float = 5.0):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if len(self._queue) < self.batch_size and not (self._closed or self._flush_requested):
+                    self._condition.wait(self.flush_interval)
+                if not self._queue:
+                    self._flush_requested = False
+                    if self._closed:
+                        return
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                # Wake up producers blocked on a full queue
+                self._condition.notify_all()
+
+            try:
+                self.send_batch(batch)
+                self.sent += len(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Failed to report %d exceptions", len(batch))
+
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
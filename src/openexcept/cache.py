@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+if t.TYPE_CHECKING:
+    from .core import ExceptionEvent
+
+
+def fingerprint(event: "ExceptionEvent") -> str:
+    return fingerprint_text(event.type, event.message)
+
+
+def fingerprint_text(type_name: str, message: str) -> str:
+    text = " ".join(f"{type_name}: {message}".split())
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class GroupCache:
+    """Bounded LRU cache mapping exception fingerprints to group ids.
+
+    Entries expire ``ttl`` seconds after they were stored (never if ``ttl`` is
+    falsy). A reverse index of group id to fingerprints lets a deleted or merged
+    group be dropped in one call.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: t.Optional[float] = 3600.0):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, t.Tuple[str, float, float]]" = OrderedDict()
+        self._keys_by_group: t.Dict[str, t.Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> t.Optional[t.Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            group_id, confidence, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return group_id, confidence
+
+    def put(self, key: str, group_id: str, confidence: float = 1.0):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+            self._entries[key] = (group_id, confidence, expires_at)
+            self._keys_by_group.setdefault(group_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, group_id: str) -> int:
+        with self._lock:
+            keys = self._keys_by_group.pop(group_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_group.clear()
+
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: str):
+        group_id, _, _ = self._entries.pop(key)
+        keys = self._keys_by_group.get(group_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_group[group_id]
@@ -1,8 +1,23 @@
 from datetime import datetime, timedelta
+import threading
+import time
 import typing as t
-from abc import ABC, abstractmethod
+import numpy as np
+from .cache import GroupCache, fingerprint_text
+# VectorStorage and VectorEmbedding are defined next to their implementations;
+# re-exported here for existing imports
+from .storage.base import VectorStorage
+from .embeddings.base import VectorEmbedding
+
+if t.TYPE_CHECKING:
+    from .aggregator import OccurrenceAggregator
+    from .metrics import Metrics
+    from .normalizers import MessageNormalizer
+    from .stacktrace import StackFingerprinter
 
 class ExceptionEvent:
+    __slots__ = ("message", "type", "timestamp", "stack_trace", "context")
+
     def __init__(self, message: str, type: str, timestamp: datetime = None, stack_trace: str = "", context: dict = None):
         self.message = message
         self.type = type
@@ -11,65 +26,354 @@ class ExceptionEvent:
         self.context = context or {}
 
 class GroupingResult:
+    __slots__ = ("group_id", "confidence", "similar_groups", "is_new_group")
+
     def __init__(self, group_id: str, confidence: float, similar_groups: t.List[str] = None, is_new_group: bool = False):
         self.group_id = group_id
         self.confidence = confidence
         self.similar_groups = similar_groups or []
         self.is_new_group = is_new_group
 
-class VectorStorage(ABC):
-    @abstractmethod
-    def store_vector(self, vector: t.List[float], metadata: dict) -> str:
-        pass
+class GroupingResults:
+    """Results of ExceptionGrouper.process_columns as arrays in input order."""
 
-    @abstractmethod
-    def find_similar(self, vector: t.List[float], threshold: float) -> t.List[tuple[str, float]]:
-        pass
+    __slots__ = ("group_ids", "confidences", "is_new_group", "similar_groups")
 
-    @abstractmethod
-    def increment_occurrence(self, group_id: str, timestamp: datetime):
-        pass
+    def __init__(self, size: int):
+        self.group_ids = np.empty(size, dtype=object)
+        self.confidences = np.zeros(size, dtype=np.float32)
+        self.is_new_group = np.zeros(size, dtype=bool)
+        # Only filled for events that matched an existing group
+        self.similar_groups: t.List[t.Optional[t.List[str]]] = [None] * size
 
-    @abstractmethod
-    def get_top_exceptions(self, limit: int, time_range: timedelta) -> t.List[dict]:
-        pass
+    def __len__(self) -> int:
+        return len(self.group_ids)
 
-class VectorEmbedding(ABC):
-    @abstractmethod
-    def embed(self, exception: ExceptionEvent) -> t.List[float]:
-        pass
+    def __getitem__(self, i: int) -> GroupingResult:
+        return GroupingResult(
+            group_id=self.group_ids[i],
+            confidence=float(self.confidences[i]),
+            similar_groups=self.similar_groups[i],
+            is_new_group=bool(self.is_new_group[i])
+        )
+
+    def __iter__(self) -> t.Iterator[GroupingResult]:
+        return (self[i] for i in range(len(self)))
 
 class ExceptionGrouper:
-    def __init__(self, storage: VectorStorage, embedding: VectorEmbedding, similarity_threshold: float):
+    def __init__(self, storage: VectorStorage, embedding: VectorEmbedding, similarity_threshold: float,
+                 cache: t.Optional[GroupCache] = None, normalizer: t.Optional["MessageNormalizer"] = None,
+                 aggregator: t.Optional["OccurrenceAggregator"] = None,
+                 stack_fingerprinter: t.Optional["StackFingerprinter"] = None,
+                 filter_fields: t.Sequence[str] = (), filter_fallback: bool = False,
+                 metrics: t.Optional["Metrics"] = None):
         self.storage = storage
         self.embedding = embedding
         self.similarity_threshold = similarity_threshold
+        self.cache = cache
+        self.normalizer = normalizer
+        self.aggregator = aggregator
+        self.stack_fingerprinter = stack_fingerprinter
+        # Only groups whose metadata matches the event in these fields ("type" or
+        # "context.<key>") are search candidates; with filter_fallback all groups
+        # are searched when none of them is similar enough
+        self.filter_fields = list(filter_fields)
+        self.filter_fallback = filter_fallback
+        # Receives stage timings and grouping counts; None turns timing off
+        self.metrics = metrics
+        self._assign_lock = threading.Lock()
 
     def process(self, event: ExceptionEvent) -> GroupingResult:
-        vector = self.embedding.embed(event)
-        similar = self.storage.find_similar(vector, self.similarity_threshold)
-
-        if similar:
-            group_id, confidence = similar[0]
-            self.storage.increment_occurrence(group_id, event.timestamp)
-            return GroupingResult(
-                group_id=group_id,
-                confidence=confidence,
-                similar_groups=[g for g, _ in similar[1:]],
-                is_new_group=False
-            )
-
-        group_id = self.storage.store_vector(vector, {
-            "first_seen": event.timestamp.isoformat(),
-            "type": event.type,
-            "example_message": event.message
-        })
+        return self.process_columns(
+            [event.message], [event.type], [event.timestamp], [event.stack_trace], [event.context]
+        )[0]
 
-        return GroupingResult(
-            group_id=group_id,
-            confidence=1.0,
-            is_new_group=True
-        )
+    def process_batch(self, events: t.List[ExceptionEvent]) -> t.List[GroupingResult]:
+        """Group many events with one embedding pass, one bulk search and one upsert.
+
+        Events that match nothing in storage are clustered against each other, so
+        near-duplicates within the batch share a single new group.
+        """
+        return list(self.process_columns(
+            [event.message for event in events],
+            [event.type for event in events],
+            [event.timestamp for event in events],
+            [event.stack_trace for event in events],
+            [event.context for event in events]
+        ))
+
+    def process_columns(self, messages: t.Sequence[str], types: t.Sequence[str],
+                        timestamps: t.Sequence[datetime] = None, stack_traces: t.Sequence[str] = None,
+                        contexts: t.Sequence[dict] = None) -> GroupingResults:
+        """Group exceptions given as columns, without an ExceptionEvent per exception.
+
+        Vectors stay in one float32 matrix from the embedding to the storage. Only
+        one event per distinct template is built, as embedding input.
+        """
+        n = len(messages)
+        results = GroupingResults(n)
+        if timestamps is None:
+            timestamps = [datetime.now()] * n
+
+        # The normalized template is both the cache key and the embedding input
+        templates = [self.normalizer.normalize(message) for message in messages] if self.normalizer is not None \
+            else list(messages)
+        stack_keys: t.List[t.Optional[str]] = [None] * n
+        if self.stack_fingerprinter is not None and stack_traces is not None:
+            for i, stack_trace in enumerate(stack_traces):
+                frames = self.stack_fingerprinter.frames(stack_trace)
+                if frames:
+                    stack_keys[i] = self.stack_fingerprinter.fingerprint(types[i], frames)
+                    if self.stack_fingerprinter.embed_frames:
+                        templates[i] += self.stack_fingerprinter.describe(frames)
+        wheres = [
+            self._candidate_filter(types[i], contexts[i] if contexts is not None else None) for i in range(n)
+        ] if self.filter_fields else [None] * n
+
+        # Identical templates, or identical stack fingerprints, are embedded and searched once
+        pending: t.Dict[str, t.List[int]] = {}
+        cached_count = 0
+        for i in range(n):
+            stack_key = stack_keys[i]
+            key = stack_key or self._cache_key(types[i], templates[i], wheres[i])
+            if key not in pending:
+                cached = None
+                if stack_key is not None:
+                    group_id = self._stack_group(stack_key)
+                    cached = (group_id, 1.0) if group_id is not None else None
+                elif self.cache is not None:
+                    cached = self.cache.get(key)
+                if cached is not None:
+                    results.group_ids[i], results.confidences[i] = cached
+                    self._record_occurrence(cached[0], timestamps[i])
+                    cached_count += 1
+                    continue
+            pending.setdefault(key, []).append(i)
+        if not pending:
+            if self.metrics is not None:
+                self.metrics.grouped(n, 0, cached_count)
+            return results
+
+        keys = list(pending)
+        firsts = [pending[key][0] for key in keys]
+        started = time.perf_counter()
+        vectors = self._embed([ExceptionEvent(templates[i], types[i], timestamps[i]) for i in firsts])
+        if self.metrics is not None:
+            self.metrics.stage("embed", type(self.embedding).__name__, time.perf_counter() - started, len(firsts))
+        # Embedding runs concurrently; searching and creating groups does not, so
+        # two threads cannot both create a group for the same new exception
+        with self._assign_lock:
+            started = time.perf_counter()
+            matches = self._find_similar_batch(vectors, [wheres[i] for i in firsts])
+            if self.metrics is not None:
+                self.metrics.stage("search", type(self.storage).__name__, time.perf_counter() - started, len(firsts))
+
+            unmatched = []
+            for j, (key, similar) in enumerate(zip(keys, matches)):
+                if not similar:
+                    unmatched.append(j)
+                    continue
+                group_id, confidence = similar[0]
+                similar_groups = [g for g, _ in similar[1:]]
+                for i in pending[key]:
+                    self._record_occurrence(group_id, timestamps[i])
+                    results.group_ids[i] = group_id
+                    results.confidences[i] = confidence
+                    results.similar_groups[i] = similar_groups
+                self._remember(key, stack_keys[firsts[j]], group_id, confidence)
+
+            # Greedy leader clustering: each unmatched template joins the first new
+            # group with the same candidate filter it is similar enough to,
+            # otherwise it leads a new group itself
+            leaders: t.List[int] = []
+            assignments: t.List[t.Tuple[int, float]] = []
+            leaders_by_filter: t.Dict[tuple, t.List[int]] = {}
+            if unmatched:
+                matrix = vectors[unmatched]
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix /= np.where(norms == 0, 1, norms)
+                for u, j in enumerate(unmatched):
+                    where = wheres[firsts[j]]
+                    own = leaders_by_filter.setdefault(tuple(sorted(where.items())) if where else (), [])
+                    if own:
+                        scores = matrix[[leaders[leader] for leader in own]] @ matrix[u]
+                        best = int(np.argmax(scores))
+                        if scores[best] >= self.similarity_threshold:
+                            assignments.append((own[best], float(scores[best])))
+                            continue
+                    own.append(len(leaders))
+                    assignments.append((len(leaders), 1.0))
+                    leaders.append(u)
+
+                metadatas = []
+                for u in leaders:
+                    i = firsts[unmatched[u]]
+                    metadatas.append(self._group_metadata(
+                        messages[i], types[i], timestamps[i], templates[i], stack_keys[i], wheres[i]
+                    ))
+                started = time.perf_counter()
+                group_ids = self._store(vectors[[unmatched[u] for u in leaders]], metadatas)
+                if self.metrics is not None:
+                    self.metrics.stage("store", type(self.storage).__name__, time.perf_counter() - started,
+                                       len(leaders))
+
+                for u, (leader, confidence) in enumerate(assignments):
+                    key = keys[unmatched[u]]
+                    group_id = group_ids[leader]
+                    for i in pending[key]:
+                        is_new_group = u == leaders[leader] and i == pending[key][0]
+                        if not is_new_group:
+                            self._record_occurrence(group_id, timestamps[i])
+                        results.group_ids[i] = group_id
+                        results.confidences[i] = confidence
+                        results.is_new_group[i] = is_new_group
+                    self._remember(key, stack_keys[pending[key][0]], group_id, confidence)
+
+        if self.metrics is not None:
+            self.metrics.grouped(n, len(leaders), cached_count)
+        return results
+
+    # Embeddings and storages that only implement the single-item methods are still supported
+
+    def _embed(self, events: t.List[ExceptionEvent]) -> np.ndarray:
+        if hasattr(self.embedding, "embed_matrix"):
+            return np.asarray(self.embedding.embed_matrix(events), dtype=np.float32)
+        if hasattr(self.embedding, "embed_batch"):
+            return np.asarray(self.embedding.embed_batch(events), dtype=np.float32)
+        return np.asarray([self.embedding.embed(event) for event in events], dtype=np.float32)
+
+    def _search(self, vectors: np.ndarray, **kwargs) -> t.List[t.List[t.Tuple[str, float]]]:
+        if hasattr(self.storage, "find_similar_batch"):
+            return self.storage.find_similar_batch(vectors, self.similarity_threshold, **kwargs)
+        return [self.storage.find_similar(vector, self.similarity_threshold, **kwargs) for vector in vectors]
+
+    def _store(self, vectors: np.ndarray, metadatas: t.List[dict]) -> t.List[str]:
+        if hasattr(self.storage, "store_vectors"):
+            return self.storage.store_vectors(vectors, metadatas)
+        return [self.storage.store_vector(vector, metadata) for vector, metadata in zip(vectors, metadatas)]
+
+    def _candidate_filter(self, type_name: str, context: t.Optional[dict]) -> t.Optional[t.Dict[str, t.Any]]:
+        where = {}
+        for field in self.filter_fields:
+            if field == "type":
+                where[field] = type_name
+            elif field.startswith("context.") and context and context.get(field[len("context."):]) is not None:
+                # Events without the key are not restricted by it
+                where[field] = context[field[len("context."):]]
+        return where or None
+
+    def _cache_key(self, type_name: str, template: str, where: t.Optional[t.Dict[str, t.Any]]) -> str:
+        key = fingerprint_text(type_name, template)
+        # The type is part of the fingerprint already, context values are not
+        context = [f"{field}={value}" for field, value in (where or {}).items() if field != "type"]
+        return "|".join([key] + context) if context else key
+
+    def _find_similar_batch(self, vectors: np.ndarray,
+                            wheres: t.List[t.Optional[t.Dict[str, t.Any]]]) -> t.List[t.List[t.Tuple[str, float]]]:
+        if not self.filter_fields:
+            return self._search(vectors)
+        # One filtered search per distinct filter in the batch
+        matches: t.List[t.List[t.Tuple[str, float]]] = [[] for _ in vectors]
+        by_filter: t.Dict[tuple, t.List[int]] = {}
+        for j, where in enumerate(wheres):
+            by_filter.setdefault(tuple(sorted(where.items())) if where else (), []).append(j)
+        for where, indices in by_filter.items():
+            found = self._search(vectors[indices], **({"where": dict(where)} if where else {}))
+            for j, similar in zip(indices, found):
+                matches[j] = similar
+        if self.filter_fallback:
+            missed = [j for j, similar in enumerate(matches) if not similar and wheres[j]]
+            if missed:
+                found = self._search(vectors[missed])
+                for j, similar in zip(missed, found):
+                    matches[j] = similar
+        return matches
+
+    def _stack_group(self, stack_key: str) -> t.Optional[str]:
+        group_id = self.stack_fingerprinter.lookup(stack_key)
+        if group_id is None:
+            # Fingerprints of groups created before a restart are only known to the storage
+            group_id = self.storage.find_group_by_fingerprint(stack_key)
+            if group_id is not None:
+                self.stack_fingerprinter.remember(stack_key, group_id)
+        return group_id
+
+    def _remember(self, key: str, stack_key: t.Optional[str], group_id: str, confidence: float):
+        if stack_key is not None:
+            self.stack_fingerprinter.remember(stack_key, group_id)
+        elif self.cache is not None:
+            self.cache.put(key, group_id, confidence)
+
+    def _record_occurrence(self, group_id: str, timestamp: datetime):
+        if self.aggregator is not None:
+            self.aggregator.add(group_id, timestamp)
+        elif self.metrics is not None:
+            started = time.perf_counter()
+            self.storage.increment_occurrence(group_id, timestamp)
+            self.metrics.stage("increment", type(self.storage).__name__, time.perf_counter() - started, 1)
+        else:
+            self.storage.increment_occurrence(group_id, timestamp)
+
+    def _group_metadata(self, message: str, type_name: str, timestamp: datetime, template: str,
+                        stack_key: str = None, where: t.Dict[str, t.Any] = None) -> dict:
+        metadata = {
+            "first_seen": timestamp.isoformat(),
+            "type": type_name,
+            "example_message": message
+        }
+        if template != message:
+            metadata["template"] = template
+        if stack_key is not None:
+            metadata["stack_fingerprint"] = stack_key
+        # Context values that candidates are filtered on
+        context = {field[len("context."):]: value for field, value in (where or {}).items() if field != "type"}
+        if context:
+            metadata["context"] = context
+        return metadata
+
+    def invalidate_group(self, group_id: str):
+        """Forget cached fingerprints of a group that was deleted or merged away."""
+        if self.cache is not None:
+            self.cache.invalidate(group_id)
+        if self.stack_fingerprinter is not None:
+            self.stack_fingerprinter.invalidate(group_id)
+        if self.aggregator is not None:
+            self.aggregator.discard(group_id)
+
+    def merge_groups(self, group_id: str, merged_ids: t.List[str]):
+        """Merge groups in storage and forget the merged ids in the caches."""
+        self.merge_groups_batch([(group_id, merged_ids)])
+
+    def merge_groups_batch(self, merges: t.List[t.Tuple[str, t.List[str]]]):
+        """merge_groups for every (group_id, merged_ids) pair, in one storage call."""
+        # Holding the assignment lock keeps new occurrences off the merged groups
+        with self._assign_lock:
+            if self.aggregator is not None:
+                self.aggregator.flush()
+            for _, merged_ids in merges:
+                for merged_id in merged_ids:
+                    self.invalidate_group(merged_id)
+            self.storage.merge_groups_batch(merges)
+
+    def evict_groups(self, last_seen_before: datetime) -> t.List[str]:
+        """Delete the groups last seen before ``last_seen_before`` and return their ids."""
+        with self._assign_lock:
+            if self.aggregator is not None:
+                self.aggregator.flush()
+            evicted = self.storage.evict_groups(last_seen_before)
+            for group_id in evicted:
+                self.invalidate_group(group_id)
+        return evicted
 
     def get_top_exceptions(self, limit: int = 10, days: int = 1) -> t.List[dict]:
+        # Buffered occurrences are written first so that the counts are exact
+        if self.aggregator is not None:
+            self.aggregator.flush()
         return self.storage.get_top_exceptions(limit, timedelta(days=days))
+
+    def get_occurrence_histogram(self, group_id: str, days: int = 1, resolution: str = None) -> t.List[tuple]:
+        if self.aggregator is not None:
+            self.aggregator.flush()
+        # Ids of merged groups resolve to the group they were merged into
+        group_id = self.storage.resolve_group(group_id) or group_id
+        return self.storage.get_occurrence_histogram(group_id, timedelta(days=days), resolution)
@@ -1,14 +1,38 @@
+import importlib
 import os
 from pathlib import Path
 import yaml
 from typing import List, Dict, Optional
 from datetime import datetime
 from .core import ExceptionGrouper, ExceptionEvent
-from .storage.qdrant import QdrantVectorStorage
-# Do not remove these imports as they are used by the embedding classes
-from .embeddings.sentence_transformers import SentenceTransformerEmbedding
-from .embeddings.openai_embedding import OpenAIEmbedding
-import requests
+from .cache import GroupCache
+from .background import BackgroundReporter
+from .aggregator import OccurrenceAggregator
+from .stacktrace import StackFingerprinter
+from .maintenance import GroupMaintenance
+from .metrics import Metrics
+from .remote import HTTPOptions, create_session, send_request
+
+# Storage, embedding and normalizer classes selectable by name in the config.
+# Their modules pull in heavy dependencies (qdrant_client, torch, openai), so
+# they are only imported once a config selects them.
+CONFIG_CLASSES = {
+    "QdrantVectorStorage": ".storage.qdrant",
+    "NumpyVectorStorage": ".storage.numpy_storage",
+    "SentenceTransformerEmbedding": ".embeddings.sentence_transformers",
+    "OnnxSentenceTransformerEmbedding": ".embeddings.onnx_embedding",
+    "OpenAIEmbedding": ".embeddings.openai_embedding",
+    "HashedNgramEmbedding": ".embeddings.hashed_ngram",
+    "CachedEmbedding": ".embeddings.cached",
+    "EmbeddingPool": ".embeddings.pool",
+    "RegexNormalizer": ".normalizers",
+}
+
+def load_class(name: str) -> type:
+    if name not in CONFIG_CLASSES:
+        raise ValueError(f"Unknown class {name!r}, expected one of {list(CONFIG_CLASSES)}")
+    module = importlib.import_module(CONFIG_CLASSES[name], __package__)
+    return getattr(module, name)
 
 class OpenExcept:
     _instance = None
@@ -25,64 +49,151 @@ class OpenExcept:
         self._initialized = True
         
         self.config = self._load_config(config_path)
+
+        # Hot-path timings and component stats, served by the server's /metrics endpoint
+        self.metrics = Metrics() if (self.config.get('metrics') or {}).get('enabled') else None
         
-        if 'local_path' in self.config['storage'] or 'local_url' in self.config['storage']:
+        if self._is_local(self.config['storage']):
             self._setup_local()
         else:
             self._setup_cloud()
+
+        self.reporter = None
+        reporting_config = dict(self.config.get('reporting') or {})
+        if reporting_config.pop('background', False):
+            self.enable_background_reporting(**reporting_config)
     
-    def _load_config(self, config_path: str = None):
+    @staticmethod
+    def _load_config(config_path: str = None):
         if not config_path:
             config_path = os.path.join(os.path.dirname(__file__), 'configs', 'config_local_fs.yaml')
         
         with open(config_path, 'r') as f:
             return yaml.safe_load(f)
 
+    @staticmethod
+    def _is_local(storage_config: Dict) -> bool:
+        return 'local_path' in storage_config or 'local_url' in storage_config or 'class' in storage_config
+
     def _setup_cloud(self):
         self.url = self.config['storage']['url']
         self.headers = {"Content-Type": "application/json"}
         if 'api_key' in self.config['storage']:
             self.headers["Authorization"] = f"Bearer {self.config['storage']['api_key']}"
+        # One pooled keep-alive session for all requests to the server
+        self.http_options = HTTPOptions.from_config(self.config['storage'])
+        self.session = create_session(self.headers, self.http_options)
 
     def _setup_local(self):
-        embedding_config = self.config['embedding']
-        embedding_class = globals()[embedding_config['class']]
-        embedding = embedding_class(**embedding_config.get('kwargs', {}))
+        self.grouper = self.create_grouper(self.config, self.metrics)
+
+        self.maintenance = None
+        maintenance_config = dict(self.config.get('maintenance') or {})
+        if maintenance_config.pop('background', False):
+            self.maintenance = GroupMaintenance(self.grouper, **maintenance_config).start()
+
+    @classmethod
+    def create_grouper(cls, config: Dict, metrics: Metrics = None) -> ExceptionGrouper:
+        """The ExceptionGrouper a local-mode config describes, reporting to ``metrics`` if given."""
+        embedding_config = config['embedding']
+        if embedding_config.get('pool'):
+            # The model runs in worker processes, not in this one
+            embedding = load_class('EmbeddingPool')(
+                embedding_config['class'], embedding_config.get('kwargs', {}), **embedding_config['pool']
+            )
+        else:
+            embedding_class = load_class(embedding_config['class'])
+            embedding = embedding_class(**embedding_config.get('kwargs', {}))
+        if embedding_config.get('cache'):
+            embedding = load_class('CachedEmbedding')(embedding, **embedding_config['cache'])
         
         # Determine the embedding vector size automatically
         embedding_vector_size = embedding.get_vector_size()
         
-        storage_config = self.config['storage']
+        try:
+            storage = cls._create_storage(config['storage'], embedding_vector_size)
+        except Exception:
+            # Do not leave embedding worker processes behind
+            if hasattr(embedding, "close"):
+                embedding.close()
+            raise
+
+        cache_config = config.get('cache')
+        cache = GroupCache(**cache_config) if cache_config else None
+
+        normalizer = None
+        normalizer_config = config.get('normalizer')
+        if normalizer_config:
+            normalizer_class = load_class(normalizer_config['class'])
+            normalizer = normalizer_class(**normalizer_config.get('kwargs', {}))
+
+        aggregation_config = config.get('aggregation')
+        aggregator = OccurrenceAggregator(storage, metrics=metrics, **aggregation_config) \
+            if aggregation_config else None
+
+        stack_trace_config = config.get('stack_trace')
+        stack_fingerprinter = StackFingerprinter(**stack_trace_config) if stack_trace_config else None
+
+        filter_config = config.get('candidate_filter') or {}
+
+        if metrics is not None:
+            for name, component in [("group", cache), ("stack_trace", stack_fingerprinter), ("embedding", embedding)]:
+                if hasattr(component, "stats"):
+                    metrics.register_stats("cache", component.stats, cache=name)
+            if aggregator is not None:
+                metrics.register_stats("aggregator", aggregator.stats)
+
+        return ExceptionGrouper(
+            storage=storage,
+            embedding=embedding,
+            similarity_threshold=embedding_config['similarity_threshold'],
+            cache=cache,
+            normalizer=normalizer,
+            aggregator=aggregator,
+            stack_fingerprinter=stack_fingerprinter,
+            filter_fields=filter_config.get('fields', ()),
+            filter_fallback=filter_config.get('fallback', False),
+            metrics=metrics
+        )
+
+    @staticmethod
+    def _create_storage(storage_config: Dict, vector_size: int):
+        histogram_retention = storage_config.get('histogram_retention')
+        if 'class' in storage_config:
+            storage_class = load_class(storage_config['class'])
+            return storage_class(
+                size=vector_size,
+                histogram_retention=histogram_retention,
+                **storage_config.get('kwargs', {})
+            )
+        qdrant_class = load_class('QdrantVectorStorage')
+        qdrant_options = qdrant_class.options_from_config(storage_config)
         if 'local_url' in storage_config:
-            storage = QdrantVectorStorage(
+            return qdrant_class(
                 url=storage_config['local_url'],
-                size=embedding_vector_size
-            )
-        else:
-            storage_path = os.path.expanduser(storage_config['local_path'])
-            Path(storage_path).mkdir(parents=True, exist_ok=True)
-            storage = QdrantVectorStorage(
-                path=storage_path,
-                size=embedding_vector_size
+                size=vector_size,
+                histogram_retention=histogram_retention,
+                **qdrant_options
             )
-        
-        self.grouper = ExceptionGrouper(
-            storage=storage,
-            embedding=embedding,
-            similarity_threshold=embedding_config['similarity_threshold']
+        storage_path = os.path.expanduser(storage_config['local_path'])
+        Path(storage_path).mkdir(parents=True, exist_ok=True)
+        return qdrant_class(
+            path=storage_path,
+            size=vector_size,
+            histogram_retention=histogram_retention,
+            **qdrant_options
         )
 
-    def _make_request(self, endpoint: str, method: str = "GET", data: Dict = None) -> Dict:
+    def _make_request(self, endpoint: str, method: str = "GET", data: Dict = None, params: Dict = None) -> Dict:
         url = f"{self.url}/{endpoint}"
-        response = requests.request(method, url, headers=self.headers, json=data)
-        response.raise_for_status()
-        return response.json()
+        return send_request(self.session, method, url, self.http_options, data=data, params=params)
 
-    def group_exception(self, message: str, type_name: str = None, **context) -> str:
+    def group_exception(self, message: str, type_name: str = None, stack_trace: str = "", **context) -> str:
         if hasattr(self, 'grouper'):
             event = ExceptionEvent(
                 message=message,
                 type=type_name or "Unknown",
+                stack_trace=stack_trace,
                 context=context
             )
             result = self.grouper.process(event)
@@ -92,17 +203,85 @@ class OpenExcept:
                 "message": message,
                 "type": type_name or "Unknown",
                 "timestamp": datetime.now().isoformat(),
+                "stack_trace": stack_trace,
                 "context": context,
                 "similarity_threshold": self.config['embedding']['similarity_threshold']
             }
             result = self._make_request("process", method="POST", data=data)
             return result["group_id"]
 
+    def group_exceptions(self, exceptions: List[Dict]) -> List[str]:
+        """Group many exceptions at once and return their group ids in order.
+
+        Each item is a dict shaped like the server's /process payload:
+        ``message`` plus optional ``type``, ``timestamp``, ``stack_trace`` and ``context``.
+        """
+        if hasattr(self, 'grouper'):
+            results = self.grouper.process_columns(
+                [exception["message"] for exception in exceptions],
+                [exception.get("type") or "Unknown" for exception in exceptions],
+                [self._parse_timestamp(exception.get("timestamp")) for exception in exceptions],
+                [exception.get("stack_trace") or "" for exception in exceptions],
+                [exception.get("context") for exception in exceptions]
+            )
+            return results.group_ids.tolist()
+        else:
+            data = [
+                {
+                    "message": exception["message"],
+                    "type": exception.get("type") or "Unknown",
+                    "timestamp": self._isoformat(exception.get("timestamp")),
+                    "stack_trace": exception.get("stack_trace") or "",
+                    "context": exception.get("context") or {},
+                }
+                for exception in exceptions
+            ]
+            result = self._make_request("process_batch", method="POST", data=data)
+            return result["group_ids"]
+
+    @staticmethod
+    def _isoformat(timestamp) -> str:
+        if timestamp is None:
+            return datetime.now().isoformat()
+        return timestamp if isinstance(timestamp, str) else timestamp.isoformat()
+
+    @staticmethod
+    def _parse_timestamp(timestamp) -> datetime:
+        if timestamp is None:
+            return datetime.now()
+        return datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp
+
+    def enable_background_reporting(self, **kwargs) -> BackgroundReporter:
+        """Send exceptions passed to report_exception from a background thread.
+
+        Keyword arguments are passed to BackgroundReporter.
+        """
+        if self.reporter is None:
+            self.reporter = BackgroundReporter(self.group_exceptions, **kwargs)
+            if self.metrics is not None:
+                self.metrics.register_stats("reporter", self.reporter.stats)
+        return self.reporter
+
+    def report_exception(self, message: str, type_name: str = None, stack_trace: str = "",
+                         **context) -> Optional[str]:
+        """Like group_exception, but only queues the exception when background
+        reporting is enabled; the group id is then not known and None is returned."""
+        if self.reporter is None:
+            return self.group_exception(message, type_name=type_name, stack_trace=stack_trace, **context)
+        self.reporter.submit({
+            "message": message,
+            "type": type_name or "Unknown",
+            "timestamp": datetime.now(),
+            "stack_trace": stack_trace,
+            "context": context,
+        })
+        return None
+
     def get_top_exceptions(self, limit: int = 10, days: int = 1) -> List[Dict]:
         if hasattr(self, 'grouper'):
             return self.grouper.get_top_exceptions(limit, days)
         else:
-            return self._make_request("top_exceptions", data={"limit": limit, "days": days})
+            return self._make_request("top_exceptions", params={"limit": limit, "days": days})
 
     @classmethod
     def setup_exception_hook(cls, **kwargs):
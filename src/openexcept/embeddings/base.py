@@ -1,8 +1,31 @@
 from abc import ABC, abstractmethod
-from ..core import ExceptionEvent
+import numpy as np
 import typing as t
 
+if t.TYPE_CHECKING:
+    # core re-exports VectorEmbedding, so ExceptionEvent is only imported for annotations
+    from ..core import ExceptionEvent
+
+def exception_text(exception: "ExceptionEvent") -> str:
+    """The text an exception is embedded as."""
+    return f"{exception.type}: {exception.message}"
+
 class VectorEmbedding(ABC):
+    # Identifies the model in persistent embedding caches
+    model_name: str = ""
+
+    def cache_identity(self) -> str:
+        """Everything besides the class that determines the vectors this embedding returns."""
+        return self.model_name
+
     @abstractmethod
-    def embed(self, exception: ExceptionEvent) -> t.List[float]:
-        pass
\ No newline at end of file
+    def embed(self, exception: "ExceptionEvent") -> t.List[float]:
+        pass
+
+    def embed_batch(self, exceptions: t.List["ExceptionEvent"]) -> t.List[t.List[float]]:
+        return [self.embed(exception) for exception in exceptions]
+
+    def embed_matrix(self, exceptions: t.List["ExceptionEvent"]) -> np.ndarray:
+        """Like embed_batch, as a (len(exceptions), size) float32 array. Embeddings
+        that compute arrays anyway override this to skip the list round trip."""
+        return np.asarray(self.embed_batch(exceptions), dtype=np.float32)
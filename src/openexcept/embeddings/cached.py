@@ -0,0 +1,148 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import typing as t
+import numpy as np
+from .base import VectorEmbedding, exception_text
+from ..core import ExceptionEvent
+
+class CachedEmbedding(VectorEmbedding):
+    """Persistent SQLite cache in front of another embedding.
+
+    Vectors are keyed by a hash of the wrapped embedding's class, model name and
+    the embedded text, so a model change never serves stale vectors, and are
+    stored as float32. At most ``max_entries`` vectors are kept; the least
+    recently used ones are evicted first.
+    """
+
+    def __init__(self, embedding: VectorEmbedding, path: str = "~/.openexcept/embeddings.sqlite",
+                 max_entries: int = 100000):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.embedding = embedding
+        self.model_name = getattr(embedding, "model_name", "")
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        identity = embedding.cache_identity() if hasattr(embedding, "cache_identity") else self.model_name
+        self._namespace = f"{type(embedding).__module__}.{type(embedding).__qualname__}\0{identity}\0"
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._size, self._clock = self._db.execute(
+            "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM embeddings"
+        ).fetchone()
+        # Inserts since the entries were last counted; other processes sharing the
+        # file are caught up with a recount every tenth of max_entries
+        self._uncounted = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def embed(self, exception: ExceptionEvent) -> t.List[float]:
+        return self.embed_batch([exception])[0]
+
+    def embed_batch(self, exceptions: t.List[ExceptionEvent]) -> t.List[t.List[float]]:
+        if not exceptions:
+            return []
+        return self.embed_matrix(exceptions).tolist()
+
+    def embed_matrix(self, exceptions: t.List[ExceptionEvent]) -> np.ndarray:
+        if not exceptions:
+            return np.zeros((0, self.get_vector_size()), dtype=np.float32)
+        keys = [self._key(exception) for exception in exceptions]
+        vectors = self._lookup(keys)
+
+        missing: t.Dict[bytes, int] = {}
+        for i, key in enumerate(keys):
+            if vectors[i] is None and key not in missing:
+                missing[key] = i
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = _embed_matrix(self.embedding, [exceptions[i] for i in missing.values()])
+            by_key = dict(zip(missing, computed))
+            self._store(by_key)
+            vectors = [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def get_vector_size(self) -> int:
+        return self.embedding.get_vector_size()
+
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _key(self, exception: ExceptionEvent) -> bytes:
+        return hashlib.blake2b((self._namespace + exception_text(exception)).encode("utf-8"), digest_size=16).digest()
+
+    def _lookup(self, keys: t.List[bytes]) -> t.List[t.Optional[np.ndarray]]:
+        unique = list(dict.fromkeys(keys))
+        found: t.Dict[bytes, np.ndarray] = {}
+        with self._lock, self._db:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                self._clock += 1
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(self._clock, key) for key in found]
+                )
+        return [found.get(key) for key in keys]
+
+    def _store(self, vectors: t.Dict[bytes, np.ndarray]):
+        with self._lock, self._db:
+            self._clock += 1
+            changes = self._db.total_changes
+            # Keys that another process stored meanwhile hold the same vector
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), self._clock) for key, vector in vectors.items()]
+            )
+            inserted = self._db.total_changes - changes
+            self._size += inserted
+            self._uncounted += inserted
+            if self._size > self.max_entries or self._uncounted >= max(1, self.max_entries // 10):
+                self._size = self._count()
+                self._uncounted = 0
+            if self._size > self.max_entries:
+                # Evict down to 90% of the cap so that eviction does not run on every insert
+                deleted = self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (self._size - int(self.max_entries * 0.9),)
+                ).rowcount
+                self.evictions += deleted
+                self._size -= deleted
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+def _embed_matrix(embedding: VectorEmbedding, exceptions: t.List[ExceptionEvent]) -> np.ndarray:
+    if hasattr(embedding, "embed_matrix"):
+        return embedding.embed_matrix(exceptions)
+    return np.asarray(embedding.embed_batch(exceptions), dtype=np.float32)
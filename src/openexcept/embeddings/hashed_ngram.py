@@ -0,0 +1,120 @@
+import typing as t
+import numpy as np
+from .base import VectorEmbedding, exception_text
+from ..core import ExceptionEvent
+
+_PRIME = np.uint64(0x100000001B3)
+_PRIME_INVERSE = np.uint64(pow(0x100000001B3, -1, 2 ** 64))
+# Bytes that belong to a token: ASCII letters, digits, underscore and any non-ASCII byte
+_TOKEN_BYTES = np.zeros(256, dtype=bool)
+for _byte in b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_":
+    _TOKEN_BYTES[_byte] = True
+_TOKEN_BYTES[128:] = True
+
+class HashedNgramEmbedding(VectorEmbedding):
+    """Non-neural embedding from hashed character n-grams and tokens.
+
+    Each exception's ``"type: message"`` text contributes its character
+    n-grams (``ngram_range``, padded with a space on both sides) and its tokens,
+    weighted by ``token_weight``, to ``dim`` signed hash buckets. The result is
+    L2-normalized, so cosine similarity measures shared n-grams. Hashes are
+    computed for a whole batch at once in NumPy and are stable across processes.
+
+    It captures lexical rather than semantic similarity, so it pairs well with
+    the RegexNormalizer and usually needs a lower similarity threshold than
+    transformer models.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: t.Tuple[int, int] = (3, 5), token_weight: float = 1.0,
+                 lowercase: bool = True):
+        low, high = ngram_range
+        if not 0 < low <= high:
+            raise ValueError(f"ngram_range must be (min, max) with 0 < min <= max, got {ngram_range}")
+        self.dim = dim
+        self.ngram_range = (low, high)
+        self.token_weight = token_weight
+        self.lowercase = lowercase
+        self.model_name = f"hashed-ngram-{dim}-{low}-{high}-{token_weight}-{'lower' if lowercase else 'cased'}"
+
+    def embed(self, exception: ExceptionEvent) -> t.List[float]:
+        return self.embed_batch([exception])[0]
+
+    def embed_batch(self, exceptions: t.List[ExceptionEvent]) -> t.List[t.List[float]]:
+        if not exceptions:
+            return []
+        return self.embed_matrix(exceptions).tolist()
+
+    def embed_matrix(self, exceptions: t.List[ExceptionEvent]) -> np.ndarray:
+        if not exceptions:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self.transform([exception_text(exception) for exception in exceptions])
+
+    def get_vector_size(self) -> int:
+        return self.dim
+
+    def transform(self, texts: t.List[str]) -> np.ndarray:
+        """Embed raw texts into a (len(texts), dim) float32 matrix."""
+        if self.lowercase:
+            texts = [text.lower() for text in texts]
+        encoded = [f" {text} ".encode("utf-8") for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        ends = np.cumsum(lengths)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        text_of = np.repeat(np.arange(len(encoded)), lengths)
+
+        rows, hashes, weights = [], [], []
+        for size in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            count = len(data) - size + 1
+            if count <= 0:
+                continue
+            ngram = np.full(count, size, dtype=np.uint64)
+            for offset in range(size):
+                ngram = ngram * _PRIME + data[offset:offset + count]
+            # Drop n-grams that run into the next text
+            inside = np.arange(size, count + size) <= ends[text_of[:count]]
+            rows.append(text_of[:count][inside])
+            hashes.append(ngram[inside])
+            weights.append(np.ones(inside.sum()))
+
+        if self.token_weight:
+            token_rows, token_hashes = self._tokens(data, text_of)
+            rows.append(token_rows)
+            hashes.append(token_hashes)
+            weights.append(np.full(len(token_rows), float(self.token_weight)))
+
+        mixed = _mix(np.concatenate(hashes))
+        buckets = (mixed % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where(mixed >> np.uint64(63), -1.0, 1.0)
+        matrix = np.bincount(
+            np.concatenate(rows) * self.dim + buckets,
+            weights=signs * np.concatenate(weights),
+            minlength=len(encoded) * self.dim
+        ).reshape(len(encoded), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+    @staticmethod
+    def _tokens(data: np.ndarray, text_of: np.ndarray) -> t.Tuple[np.ndarray, np.ndarray]:
+        # Texts are padded with spaces, so no token spans two texts
+        is_token = _TOKEN_BYTES[data.astype(np.uint8)].astype(np.int8)
+        edges = np.diff(is_token, prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        # Polynomial prefix sums give every token's hash without a Python loop:
+        # sum(data[j] * P**(j - start)) = (prefix[end] - prefix[start]) * P**-start
+        powers = np.ones(len(data), dtype=np.uint64)
+        inverse_powers = np.ones(len(data), dtype=np.uint64)
+        if len(data) > 1:
+            powers[1:] = np.cumprod(np.full(len(data) - 1, _PRIME, dtype=np.uint64))
+            inverse_powers[1:] = np.cumprod(np.full(len(data) - 1, _PRIME_INVERSE, dtype=np.uint64))
+        prefix = np.zeros(len(data) + 1, dtype=np.uint64)
+        np.cumsum(data * powers, out=prefix[1:])
+        token_hashes = (prefix[ends] - prefix[starts]) * inverse_powers[starts]
+        # Keep token hashes apart from the n-gram hashes, which start from the n-gram size
+        return text_of[starts], token_hashes ^ np.uint64(0x9E3779B97F4A7C15)
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, so that bucket and sign use well-mixed bits."""
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
@@ -0,0 +1,53 @@
+import os
+import typing as t
+from .sentence_transformers import SentenceTransformerEmbedding
+
+if t.TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Dynamic int8 quantization presets of sentence-transformers, by CPU instruction set
+QUANTIZATION_PRESETS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+class OnnxSentenceTransformerEmbedding(SentenceTransformerEmbedding):
+    """The same sentence-transformers model, run by ONNX Runtime on CPU.
+
+    With ``quantize`` set to one of QUANTIZATION_PRESETS, the model's weights
+    are quantized to int8 once and the result is kept under ``cache_dir``.
+    ``intra_op_threads`` limits the threads ONNX Runtime uses per call. Requires
+    ``pip install openexcept[onnx]``; compare groupings with the PyTorch model
+    using ``python -m openexcept.scripts.embedding_agreement``.
+    """
+
+    def __init__(self, model_name: str = "all-mpnet-base-v2", quantize: str = None, intra_op_threads: int = None,
+                 cache_dir: str = "~/.openexcept/onnx", preload: bool = False, vector_size: int = None):
+        if quantize is not None and quantize not in QUANTIZATION_PRESETS:
+            raise ValueError(f"quantize must be one of {QUANTIZATION_PRESETS}, got {quantize!r}")
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.cache_dir = os.path.expanduser(cache_dir)
+        super().__init__(model_name, preload=preload, vector_size=vector_size)
+
+    def cache_identity(self) -> str:
+        return f"{self.model_name}:{self.quantize or 'fp32'}"
+
+    def _load_model(self) -> "SentenceTransformer":
+        try:
+            import onnxruntime
+            from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+        except ImportError:
+            raise ImportError("OnnxSentenceTransformerEmbedding requires ONNX Runtime: pip install openexcept[onnx]")
+
+        session_options = onnxruntime.SessionOptions()
+        if self.intra_op_threads:
+            session_options.intra_op_num_threads = self.intra_op_threads
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+        if self.quantize is None:
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+
+        export_dir = os.path.join(self.cache_dir, self.model_name.replace("/", "__"))
+        file_name = f"onnx/model_qint8_{self.quantize}.onnx"
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            model = SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+            model.save(export_dir)
+            export_dynamic_quantized_onnx_model(model, self.quantize, export_dir)
+        return SentenceTransformer(export_dir, backend="onnx", model_kwargs={**model_kwargs, "file_name": file_name})
@@ -1,10 +1,13 @@
 import os
 from typing import List
 import openai
-from .base import VectorEmbedding
+from .base import VectorEmbedding, exception_text
 from ..core import ExceptionEvent
 
 class OpenAIEmbedding(VectorEmbedding):
+    # Maximum number of inputs the embeddings endpoint accepts per request
+    max_batch_size = 2048
+
     def __init__(self, api_key: str = None, model: str = "text-embedding-ada-002"):
         # Use the provided api_key if available, otherwise try to get it from an environment variable
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
@@ -12,13 +15,21 @@ class OpenAIEmbedding(VectorEmbedding):
             raise ValueError("OpenAI API key must be provided either in the config or as an environment variable OPENAI_API_KEY")
         
         self.model = model
+        self.model_name = model
         self.client = openai.OpenAI(api_key=self.api_key)
     
     def embed(self, exception: ExceptionEvent) -> List[float]:
-        text = f"{exception.type}: {exception.message}"
-        response = self.client.embeddings.create(input=[text], model=self.model)
+        response = self.client.embeddings.create(input=[exception_text(exception)], model=self.model)
         embedding = response.data[0].embedding
         return embedding
 
+    def embed_batch(self, exceptions: List[ExceptionEvent]) -> List[List[float]]:
+        texts = [exception_text(exception) for exception in exceptions]
+        embeddings = []
+        for start in range(0, len(texts), self.max_batch_size):
+            response = self.client.embeddings.create(input=texts[start:start + self.max_batch_size], model=self.model)
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return embeddings
+
     def get_vector_size(self) -> int:
         return 1536  # Default size for OpenAI's text-embedding-ada-002 model
@@ -0,0 +1,112 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .base import VectorEmbedding
+from ..core import ExceptionEvent
+
+# The embedding of the current worker process, created by _init_worker
+_worker_embedding: t.Optional[VectorEmbedding] = None
+
+def _init_worker(embedding_class: t.Union[str, type], kwargs: dict, torch_threads: t.Optional[int]):
+    global _worker_embedding
+    if torch_threads:
+        # Must be set before torch is imported to size its OpenMP pool
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    _worker_embedding = _create_embedding(embedding_class, kwargs)
+    # Load lazily loaded models now rather than on the first request
+    getattr(_worker_embedding, "model", None)
+
+def _embed_matrix(exceptions: t.List[ExceptionEvent]) -> np.ndarray:
+    # Arrays pickle far more compactly than lists of floats
+    return _worker_embedding.embed_matrix(exceptions)
+
+def _describe() -> t.Tuple[str, str, int]:
+    # Model name, cache identity and vector size of the worker's embedding
+    embedding = _worker_embedding
+    model_name = getattr(embedding, "model_name", "")
+    identity = embedding.cache_identity() if hasattr(embedding, "cache_identity") else model_name
+    return (model_name, f"{type(embedding).__module__}.{type(embedding).__qualname__}:{identity}",
+            embedding.get_vector_size())
+
+def _create_embedding(embedding_class: t.Union[str, type], kwargs: dict) -> VectorEmbedding:
+    if isinstance(embedding_class, str):
+        from ..easy import load_class
+
+        embedding_class = load_class(embedding_class)
+    return embedding_class(**kwargs)
+
+class EmbeddingPool(VectorEmbedding):
+    """Runs an embedding in a pool of worker processes.
+
+    Each of the ``processes`` workers holds one copy of the model, limited to
+    ``torch_threads`` intra-op threads, so the number of model copies in memory
+    is set here rather than by the number of server workers. Batches are split
+    into chunks of at least ``min_chunk_size`` exceptions that are embedded in
+    parallel. Configured with an ``embedding.pool`` section.
+
+    No embedding is created in this process: the model name and vector size
+    are asked from a worker when first needed, unless ``vector_size`` is given.
+    """
+
+    def __init__(self, embedding_class: t.Union[str, type], kwargs: dict = None, processes: int = 2,
+                 torch_threads: int = None, min_chunk_size: int = 16, vector_size: int = None):
+        kwargs = kwargs or {}
+        self.processes = processes
+        self.min_chunk_size = min_chunk_size
+        self.vector_size = vector_size
+        self._description: t.Optional[t.Tuple[str, str, int]] = None
+        self._description_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            # fork is unsafe once torch or a client library has started threads
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(embedding_class, kwargs, torch_threads)
+        )
+        atexit.register(self.close)
+
+    def embed(self, exception: ExceptionEvent) -> t.List[float]:
+        return self._executor.submit(_embed_matrix, [exception]).result()[0].tolist()
+
+    def embed_batch(self, exceptions: t.List[ExceptionEvent]) -> t.List[t.List[float]]:
+        if not exceptions:
+            return []
+        return self.embed_matrix(exceptions).tolist()
+
+    def embed_matrix(self, exceptions: t.List[ExceptionEvent]) -> np.ndarray:
+        if not exceptions:
+            return np.zeros((0, self.get_vector_size()), dtype=np.float32)
+        chunk_size = max(self.min_chunk_size, -(-len(exceptions) // self.processes))
+        chunks = [exceptions[i:i + chunk_size] for i in range(0, len(exceptions), chunk_size)]
+        return np.concatenate(list(self._executor.map(_embed_matrix, chunks)))
+
+    def get_vector_size(self) -> int:
+        return self.vector_size or self._describe()[2]
+
+    @property
+    def model_name(self) -> str:
+        return self._describe()[0]
+
+    def cache_identity(self) -> str:
+        # Vectors depend on the pooled embedding, not on the pool
+        return self._describe()[1]
+
+    def _describe(self) -> t.Tuple[str, str, int]:
+        with self._description_lock:
+            if self._description is None:
+                self._description = self._executor.submit(_describe).result()
+            return self._description
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        atexit.unregister(self.close)
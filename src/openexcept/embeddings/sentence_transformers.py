@@ -1,15 +1,66 @@
-from sentence_transformers import SentenceTransformer
-from .base import VectorEmbedding
+import threading
+import numpy as np
+from .base import VectorEmbedding, exception_text
 from ..core import ExceptionEvent
 import typing as t
 
+if t.TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Output sizes of common models, so the storage can be set up without loading the model
+KNOWN_VECTOR_SIZES = {
+    "all-mpnet-base-v2": 768,
+    "all-MiniLM-L6-v2": 384,
+    "all-MiniLM-L12-v2": 384,
+    "paraphrase-MiniLM-L3-v2": 384,
+    "paraphrase-multilingual-MiniLM-L12-v2": 384,
+    "multi-qa-MiniLM-L6-cos-v1": 384,
+}
+
 class SentenceTransformerEmbedding(VectorEmbedding):
-    def __init__(self, model_name: str = "all-mpnet-base-v2"):
-        self.model = SentenceTransformer(model_name)
+    """Embeddings from a sentence-transformers model.
+
+    sentence_transformers (and torch) are imported and the model is loaded on
+    first use. With ``preload`` that happens right away in a background thread
+    instead, so the first exception does not pay for it.
+    """
+
+    def __init__(self, model_name: str = "all-mpnet-base-v2", preload: bool = False, vector_size: int = None):
+        self.model_name = model_name
+        self.vector_size = vector_size or KNOWN_VECTOR_SIZES.get(model_name)
+        self._model: t.Optional["SentenceTransformer"] = None
+        self._load_lock = threading.Lock()
+        if preload:
+            threading.Thread(target=lambda: self.model, name="openexcept-model-loader", daemon=True).start()
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self) -> "SentenceTransformer":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.model_name)
 
     def embed(self, exception: ExceptionEvent) -> t.List[float]:
-        text = f"{exception.type}: {exception.message}"
-        return self.model.encode([text])[0].tolist()
+        return self.model.encode([exception_text(exception)])[0].tolist()
+
+    def embed_batch(self, exceptions: t.List[ExceptionEvent]) -> t.List[t.List[float]]:
+        if not exceptions:
+            return []
+        return self.embed_matrix(exceptions).tolist()
+
+    def embed_matrix(self, exceptions: t.List[ExceptionEvent]) -> np.ndarray:
+        if not exceptions:
+            return np.zeros((0, self.get_vector_size()), dtype=np.float32)
+        texts = [exception_text(exception) for exception in exceptions]
+        return np.asarray(self.model.encode(texts, convert_to_numpy=True), dtype=np.float32)
 
     def get_vector_size(self) -> int:
-        return self.model.get_sentence_embedding_dimension()
+        if self.vector_size is None:
+            self.vector_size = self.model.get_sentence_embedding_dimension()
+        return self.vector_size
@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+from openexcept.core import ExceptionEvent
+from openexcept.embeddings.base import VectorEmbedding
+from openexcept.embeddings.cached import CachedEmbedding
+
+class CountingEmbedding(VectorEmbedding):
+    model_name = "counting-v1"
+
+    def __init__(self):
+        self.calls = 0
+        self.embedded = []
+
+    def embed(self, exception):
+        self.calls += 1
+        self.embedded.append(exception.message)
+        return [float(len(exception.message)), 1.0, 0.5]
+
+    def get_vector_size(self):
+        return 3
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embeddings.sqlite")
+
+def event(message, type_name="ValueError"):
+    return ExceptionEvent(message=message, type=type_name)
+
+def test_repeat_embeddings_are_served_from_cache(cache_path):
+    inner = CountingEmbedding()
+    embedding = CachedEmbedding(inner, path=cache_path)
+
+    first = embedding.embed(event("bad value"))
+    assert embedding.embed(event("bad value")) == first
+    embedding.embed(event("bad value", "TypeError"))
+    assert inner.calls == 2
+    assert embedding.stats() == {"size": 2, "hits": 1, "misses": 2, "evictions": 0}
+    assert embedding.get_vector_size() == 3
+
+def test_cache_survives_restarts(cache_path):
+    CachedEmbedding(CountingEmbedding(), path=cache_path).embed_batch([event("a"), event("bb")])
+
+    inner = CountingEmbedding()
+    embedding = CachedEmbedding(inner, path=cache_path)
+    assert embedding.embed_batch([event("bb"), event("ccc"), event("a"), event("ccc")]) == [
+        [2.0, 1.0, 0.5], [3.0, 1.0, 0.5], [1.0, 1.0, 0.5], [3.0, 1.0, 0.5]
+    ]
+    assert inner.embedded == ["ccc"]
+
+def test_model_name_is_part_of_the_key(cache_path):
+    CachedEmbedding(CountingEmbedding(), path=cache_path).embed(event("a"))
+
+    other_model = CountingEmbedding()
+    other_model.model_name = "counting-v2"
+    CachedEmbedding(other_model, path=cache_path).embed(event("a"))
+    assert other_model.calls == 1
+
+def test_least_recently_used_entries_are_evicted(cache_path):
+    inner = CountingEmbedding()
+    embedding = CachedEmbedding(inner, path=cache_path, max_entries=3)
+    for message in ["a", "b", "c"]:
+        embedding.embed(event(message))
+    embedding.embed(event("a"))
+    embedding.embed(event("d"))
+
+    assert len(embedding) <= 3
+    inner.embedded.clear()
+    embedding.embed_batch([event("a"), event("d")])
+    assert inner.embedded == []
+    embedding.embed(event("b"))
+    assert inner.embedded == ["b"]
+
+def test_size_is_counted_in_the_shared_file(cache_path):
+    first = CachedEmbedding(CountingEmbedding(), path=cache_path, max_entries=10)
+    second = CachedEmbedding(CountingEmbedding(), path=cache_path, max_entries=10)
+    first._store({first._key(event("a")): np.ones(3)})
+    # Replacing a key adds no entry, and the other cache sees both inserts
+    first._store({first._key(event("a")): np.ones(3)})
+    second.embed_batch([event(message) for message in "bcdefghij"])
+    assert len(first) == len(second) == 10
+
+    first.embed(event("k"))
+    assert len(second) == 9
+    assert first.stats()["evictions"] == 2
+
+def test_entries_are_not_recounted_on_every_insert(cache_path):
+    embedding = CachedEmbedding(CountingEmbedding(), path=cache_path, max_entries=1000)
+    statements = []
+    embedding._db.set_trace_callback(statements.append)
+    for i in range(50):
+        embedding.embed(event(f"error {i}"))
+
+    assert not [statement for statement in statements if "COUNT(*)" in statement]
+    assert embedding.stats()["size"] == 50
+
+def test_embed_matrix_mixes_hits_and_misses(cache_path):
+    embedding = CachedEmbedding(CountingEmbedding(), path=cache_path)
+    embedding.embed(event("a"))
+
+    matrix = embedding.embed_matrix([event("bb"), event("a"), event("bb")])
+
+    assert matrix.dtype == np.float32 and matrix.shape == (3, 3)
+    assert matrix[:, 0].tolist() == [2.0, 1.0, 2.0]
+    assert embedding.embedding.calls == 2
+    assert embedding.embed_matrix([]).shape == (0, 3)
@@ -0,0 +1,36 @@
+import os
+from openexcept.core import ExceptionEvent
+from openexcept.embeddings.base import VectorEmbedding
+from openexcept.embeddings.pool import EmbeddingPool
+
+class PidEmbedding(VectorEmbedding):
+    model_name = "pid"
+    created_in = []
+
+    def __init__(self):
+        PidEmbedding.created_in.append(os.getpid())
+
+    def embed(self, exception):
+        return [float(len(exception.message)), float(os.getpid()), float(os.environ.get("OMP_NUM_THREADS", 0))]
+
+    def get_vector_size(self):
+        return 3
+
+def test_embedding_pool_embeds_in_worker_processes():
+    pool = EmbeddingPool(PidEmbedding, processes=2, torch_threads=1, min_chunk_size=2)
+    try:
+        events = [ExceptionEvent(message="x" * n, type="ValueError") for n in range(1, 9)]
+        vectors = pool.embed_batch(events)
+
+        assert [v[0] for v in vectors] == [float(n) for n in range(1, 9)]
+        assert os.getpid() not in {v[1] for v in vectors}
+        assert {v[2] for v in vectors} == {1.0}
+        assert pool.embed(events[2])[0] == 3.0
+        assert pool.embed_batch([]) == []
+        assert pool.get_vector_size() == 3
+        assert pool.model_name == "pid"
+        assert pool.cache_identity().endswith("PidEmbedding:pid")
+        # The model is only created in the workers
+        assert os.getpid() not in PidEmbedding.created_in
+    finally:
+        pool.close()
@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+import numpy as np
+import pytest
+from openexcept.core import ExceptionEvent
+from openexcept.embeddings.hashed_ngram import HashedNgramEmbedding
+
+@pytest.fixture
+def embedding():
+    return HashedNgramEmbedding(dim=256)
+
+def event(message, type_name="ConnectionError"):
+    return ExceptionEvent(message=message, type=type_name)
+
+def test_hashed_ngram_embedding_similarity(embedding):
+    a, b, c = np.array(embedding.embed_batch([
+        event("Connection refused to database xyz"),
+        event("Connection refused to database abc"),
+        event("'user_id'", "KeyError"),
+    ]))
+
+    assert embedding.get_vector_size() == 256
+    assert len(a) == 256
+    assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-6)
+    assert a @ b > 0.85
+    assert a @ c < 0.4
+
+def test_hashed_ngram_embedding_batch_matches_single(embedding):
+    events = [event("Connection refused"), event(""), event("Ünïcode error ✓", "UnicodeError")]
+    batch = embedding.embed_batch(events)
+
+    for e, vector in zip(events, batch):
+        assert np.allclose(embedding.embed(e), vector)
+
+def test_hashed_ngram_embedding_is_stable_across_processes(embedding):
+    # Python's str hash is randomized per process; the embedding must not depend on it
+    code = ("from openexcept.embeddings.hashed_ngram import HashedNgramEmbedding;"
+            "print(HashedNgramEmbedding(dim=256).transform(['ValueError: bad input'])[0].tolist())")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert np.allclose(json.loads(output), embedding.transform(["ValueError: bad input"])[0])
+
+def test_hashed_ngram_embedding_options():
+    cased = HashedNgramEmbedding(dim=64, lowercase=False, token_weight=0)
+    assert not np.allclose(cased.transform(["Error"]), cased.transform(["error"]))
+    assert cased.model_name != HashedNgramEmbedding(dim=64).model_name
+
+    with pytest.raises(ValueError):
+        HashedNgramEmbedding(ngram_range=(4, 2))
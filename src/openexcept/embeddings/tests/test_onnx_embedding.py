@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from openexcept.embeddings.onnx_embedding import OnnxSentenceTransformerEmbedding
+from openexcept.scripts.embedding_agreement import group_labels, moved_exceptions, pair_agreement, sample_exceptions
+
+def test_onnx_embedding_defers_loading_and_validates_quantization():
+    embedding = OnnxSentenceTransformerEmbedding(quantize="avx2", intra_op_threads=2)
+    assert embedding._model is None
+    assert embedding.get_vector_size() == 768
+    assert embedding.cache_identity() == "all-mpnet-base-v2:avx2"
+
+    with pytest.raises(ValueError):
+        OnnxSentenceTransformerEmbedding(quantize="int4")
+
+def test_onnx_embedding_requires_onnxruntime():
+    try:
+        import onnxruntime  # noqa: F401
+        pytest.skip("onnxruntime is installed")
+    except ImportError:
+        pass
+    with pytest.raises(ImportError, match="openexcept\\[onnx\\]"):
+        OnnxSentenceTransformerEmbedding().model
+
+def test_pair_agreement():
+    labels = np.array([0, 0, 1, 1, 2])
+    assert pair_agreement(labels, np.array([5, 5, 3, 3, 4]) - 3) == (1.0, 1.0)
+
+    rand, adjusted = pair_agreement(labels, np.array([0, 0, 1, 2, 3]))
+    assert rand == pytest.approx(0.9)
+    assert adjusted < 1.0
+    assert moved_exceptions(labels, np.array([0, 0, 1, 2, 3])) == 1
+
+def test_group_labels_follow_the_grouper():
+    vectors = np.array([[1, 0], [0.99, 0.1], [0, 1], [1, 0.01]], dtype=np.float32)
+    assert group_labels(vectors, 0.9).tolist() == [0, 0, 1, 0]
+
+def test_sample_exceptions_are_deterministic():
+    assert [e.message for e in sample_exceptions(5)] == [e.message for e in sample_exceptions(5)]
@@ -47,4 +47,11 @@ def test_sentence_transformer_embedding_different_exceptions(embedding):
     result1 = embedding.embed(exception1)
     result2 = embedding.embed(exception2)
     
-    assert result1 != result2
\ No newline at end of file
+    assert result1 != result2
+
+
+def test_sentence_transformer_embedding_defers_model_loading():
+    embedding = SentenceTransformerEmbedding()
+    assert embedding._model is None
+    assert embedding.get_vector_size() == 768
+    assert embedding._model is None
@@ -1,14 +1,28 @@
 import logging
+import traceback
 from .easy import OpenExcept
 
 class OpenExceptHandler(logging.Handler):
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, background=False, **reporting_kwargs):
         super().__init__()
         self.grouper = OpenExcept(config_path=config_path)
+        # In background mode emit() only queues the exception, so the group id
+        # is not known when the record is formatted
+        if background:
+            self.grouper.enable_background_reporting(**reporting_kwargs)
 
     def emit(self, record):
         if record.exc_info:
-            exc_type, exc_value, _ = record.exc_info
-            group_id = self.grouper.group_exception(str(exc_value), type_name=exc_type.__name__)
-            record.msg = f"[Group: {group_id}] {record.msg}"
+            exc_type, exc_value, exc_traceback = record.exc_info
+            group_id = self.grouper.report_exception(
+                str(exc_value),
+                type_name=exc_type.__name__,
+                stack_trace="".join(traceback.format_tb(exc_traceback))
+            )
+            if group_id is not None:
+                record.msg = f"[Group: {group_id}] {record.msg}"
         print(self.format(record))  # Print to console for demonstration
+
+    def flush(self):
+        if self.grouper.reporter is not None:
+            self.grouper.reporter.flush(timeout=5.0)
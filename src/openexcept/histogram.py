@@ -0,0 +1,82 @@
+import typing as t
+from datetime import datetime
+
+# Occurrence counters are kept per minute, hour and day bucket. Each resolution
+# keeps a limited number of the most recent buckets (its retention).
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+DEFAULT_RETENTION = {"minute": 120, "hour": 168, "day": 90}
+
+def bucket_start(timestamp: float, width: int) -> int:
+    return int(timestamp // width * width)
+
+class OccurrenceDelta:
+    """Occurrences of one group that have not been written to storage yet."""
+
+    __slots__ = ("count", "last_seen", "minutes")
+
+    def __init__(self):
+        self.count = 0
+        self.last_seen: t.Optional[datetime] = None
+        self.minutes: t.Dict[int, int] = {}
+
+    def add(self, timestamp: datetime, count: int = 1):
+        self.count += count
+        if self.last_seen is None or timestamp > self.last_seen:
+            self.last_seen = timestamp
+        minute = bucket_start(timestamp.timestamp(), RESOLUTIONS["minute"])
+        self.minutes[minute] = self.minutes.get(minute, 0) + count
+
+    def merge(self, other: "OccurrenceDelta"):
+        self.count += other.count
+        if self.last_seen is None or (other.last_seen is not None and other.last_seen > self.last_seen):
+            self.last_seen = other.last_seen
+        for minute, count in other.minutes.items():
+            self.minutes[minute] = self.minutes.get(minute, 0) + count
+
+class OccurrenceHistogram:
+    """Minute/hour/day occurrence counters of one group.
+
+    ``buckets`` maps a resolution name to ``{str(bucket start): count}`` so that
+    it can be stored as-is in a JSON payload.
+    """
+
+    def __init__(self, buckets: t.Dict[str, t.Dict[str, int]] = None, retention: t.Dict[str, int] = None):
+        self.buckets = {name: dict((buckets or {}).get(name, {})) for name in RESOLUTIONS}
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+
+    def add(self, minutes: t.Dict[int, int]):
+        for minute, count in minutes.items():
+            for name, width in RESOLUTIONS.items():
+                key = str(bucket_start(minute, width))
+                self.buckets[name][key] = self.buckets[name].get(key, 0) + count
+
+    def prune(self, now: float):
+        for name, width in RESOLUTIONS.items():
+            oldest = bucket_start(now, width) - width * (self.retention[name] - 1)
+            self.buckets[name] = {k: v for k, v in self.buckets[name].items() if int(k) >= oldest}
+
+    @classmethod
+    def resolution_for(cls, start: float, now: float, retention: t.Dict[str, int] = None) -> str:
+        """The finest resolution that still covers ``start``."""
+        retention = {**DEFAULT_RETENTION, **(retention or {})}
+        for name, width in RESOLUTIONS.items():
+            if bucket_start(now, width) - width * (retention[name] - 1) <= start:
+                return name
+        return "day"
+
+    def count_since(self, start: float, resolution: str) -> int:
+        first = bucket_start(start, RESOLUTIONS[resolution])
+        return sum(v for k, v in self.buckets[resolution].items() if int(k) >= first)
+
+    def series(self, start: float, resolution: str) -> t.List[t.Tuple[int, int]]:
+        first = bucket_start(start, RESOLUTIONS[resolution])
+        return sorted((int(k), v) for k, v in self.buckets[resolution].items() if int(k) >= first)
+
+    @classmethod
+    def combine(cls, histograms: t.Iterable["OccurrenceHistogram"]) -> "OccurrenceHistogram":
+        combined = cls()
+        for histogram in histograms:
+            for name in RESOLUTIONS:
+                for key, count in histogram.buckets[name].items():
+                    combined.buckets[name][key] = combined.buckets[name].get(key, 0) + count
+        return combined
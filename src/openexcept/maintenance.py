@@ -0,0 +1,118 @@
+import atexit
+import logging
+import threading
+import typing as t
+from datetime import datetime, timedelta
+from .core import ExceptionGrouper
+
+logger = logging.getLogger(__name__)
+
+class GroupMaintenance:
+    """Merges near-duplicate groups, evicts stale ones and compacts the storage.
+
+    Groups whose vectors are at least ``merge_threshold`` similar, and that
+    match in the grouper's candidate filter fields, are merged into the one
+    with the most occurrences; the merged ids keep resolving to it. Groups not
+    seen for ``ttl_days`` are deleted. Either step is skipped when its setting
+    is None. Similar groups are found by scanning the storage in blocks of
+    ``batch_size`` and searching each block in bulk.
+
+    ``run`` does one pass; ``start`` runs a pass every ``interval`` seconds on a
+    background thread.
+    """
+
+    def __init__(self, grouper: ExceptionGrouper, merge_threshold: float = None, ttl_days: float = None,
+                 compact: bool = True, batch_size: int = 1024, interval: float = 3600.0):
+        self.grouper = grouper
+        self.merge_threshold = merge_threshold
+        self.ttl_days = ttl_days
+        self.compact = compact
+        self.batch_size = batch_size
+        self.interval = interval
+        self.runs = 0
+
+        self._closed = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    def run(self) -> t.Dict[str, int]:
+        """One maintenance pass; returns the number of merged and evicted groups."""
+        merged = self.merge_duplicates() if self.merge_threshold is not None else 0
+        evicted = len(self.evict_stale()) if self.ttl_days is not None else 0
+        if self.compact and (merged or evicted):
+            self.grouper.storage.compact()
+        self.runs += 1
+        return {"merged": merged, "evicted": evicted}
+
+    def find_duplicates(self) -> t.List[t.List[str]]:
+        """Clusters of near-duplicate group ids, the group with the most occurrences first.
+
+        Every member is similar to that first group, not merely to another
+        member, so chains of similar groups are not merged end to end.
+        """
+        storage = self.grouper.storage
+        similar_to: t.Dict[str, t.Set[str]] = {}
+        counts: t.Dict[str, int] = {}
+
+        for vectors, records in storage.scan_groups(self.batch_size):
+            # Like the grouper, only compare groups with the same candidate filter
+            by_filter: t.Dict[tuple, t.List[int]] = {}
+            for i, record in enumerate(records):
+                metadata = record["metadata"]
+                where = self.grouper._candidate_filter(metadata.get("type", "Unknown"), metadata.get("context"))
+                by_filter.setdefault(tuple(sorted(where.items())) if where else (), []).append(i)
+            for where, indices in by_filter.items():
+                found = storage.find_similar_batch(vectors[indices], self.merge_threshold,
+                                                   **({"where": dict(where)} if where else {}))
+                for i, similar in zip(indices, found):
+                    group_id = records[i]["group_id"]
+                    counts[group_id] = records[i]["count"]
+                    for other, _ in similar:
+                        if other != group_id:
+                            similar_to.setdefault(group_id, set()).add(other)
+                            similar_to.setdefault(other, set()).add(group_id)
+
+        # The largest unclustered group takes the unclustered groups similar to it;
+        # the rest wait for a later pass
+        clusters: t.List[t.List[str]] = []
+        clustered: t.Set[str] = set()
+        for group_id in sorted(similar_to, key=lambda group_id: -counts.get(group_id, 0)):
+            if group_id in clustered:
+                continue
+            members = [other for other in similar_to[group_id] if other not in clustered]
+            if members:
+                clustered.add(group_id)
+                clustered.update(members)
+                clusters.append([group_id] + sorted(members, key=lambda other: -counts.get(other, 0)))
+        return clusters
+
+    def merge_duplicates(self) -> int:
+        """Merge every cluster of near-duplicate groups and return the number of groups merged away."""
+        clusters = self.find_duplicates()
+        if clusters:
+            self.grouper.merge_groups_batch([(cluster[0], cluster[1:]) for cluster in clusters])
+        return sum(len(cluster) - 1 for cluster in clusters)
+
+    def evict_stale(self) -> t.List[str]:
+        return self.grouper.evict_groups(datetime.now() - timedelta(days=self.ttl_days))
+
+    def start(self) -> "GroupMaintenance":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="openexcept-maintenance", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.stop)
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            try:
+                report = self.run()
+                logger.info("Group maintenance merged %(merged)d and evicted %(evicted)d groups", report)
+            except Exception:
+                logger.exception("Group maintenance failed")
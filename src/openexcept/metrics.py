@@ -0,0 +1,133 @@
+import bisect
+import threading
+import typing as t
+
+# Upper bounds in seconds of the stage latency buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the batch size buckets
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+# Keys of component stats that only ever grow, exported as counters
+COUNTER_STATS = ("hits", "misses", "evictions", "sent", "dropped", "failed", "flushes")
+
+Labels = t.Tuple[t.Tuple[str, str], ...]
+
+class Histogram:
+    """Observation counts per bucket upper bound, plus their count and sum."""
+
+    def __init__(self, buckets: t.Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+class Metrics:
+    """In-process metrics of the grouping hot path, rendered in the Prometheus text format.
+
+    ExceptionGrouper and OccurrenceAggregator call ``stage`` with the duration of
+    every embed, search, store and increment call and ``grouped`` once per
+    batch; they skip all timing when they have no metrics. Any object with these
+    two methods can be passed instead to send the measurements elsewhere.
+
+    ``register_stats`` adds a component whose ``stats()`` dict (cache hits, queue
+    lengths, ...) is read at scrape time, so it costs nothing on the hot path.
+    """
+
+    def __init__(self, namespace: str = "openexcept"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._counters: t.Dict[str, t.Dict[Labels, float]] = {}
+        self._histograms: t.Dict[str, t.Dict[Labels, Histogram]] = {}
+        self._buckets: t.Dict[str, t.Sequence[float]] = {}
+        self._help: t.Dict[str, str] = {}
+        self._stats: t.List[t.Tuple[str, t.Callable[[], t.Dict[str, float]], Labels]] = []
+
+    def stage(self, stage: str, backend: str, seconds: float, size: int):
+        """One call of a grouping stage on ``size`` items."""
+        labels = (("stage", stage), ("backend", backend))
+        self.observe("stage_duration_seconds", seconds, labels, LATENCY_BUCKETS,
+                     "Duration of embed, search, store and increment calls")
+        self.observe("stage_batch_size", size, labels, SIZE_BUCKETS,
+                     "Items per embed, search, store and increment call")
+
+    def grouped(self, events: int, new_groups: int, cached: int):
+        """One batch of ``events`` exceptions, ``cached`` of them answered from a cache."""
+        self.inc("exceptions_total", events, help="Exceptions grouped")
+        self.inc("new_groups_total", new_groups, help="Groups created")
+        self.inc("cached_exceptions_total", cached,
+                 help="Exceptions assigned by the fingerprint or stack trace cache without embedding")
+        self.observe("grouping_batch_size", events, (), SIZE_BUCKETS, "Exceptions per grouping call")
+
+    def inc(self, name: str, value: float = 1, labels: Labels = (), help: str = ""):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+            self._help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, labels: Labels = (), buckets: t.Sequence[float] = LATENCY_BUCKETS,
+                help: str = ""):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self._buckets.setdefault(name, buckets))
+                self._help.setdefault(name, help)
+            histogram.observe(value)
+
+    def register_stats(self, component: str, stats: t.Callable[[], t.Dict[str, float]], **labels: str):
+        """Export ``stats()`` as ``<namespace>_<component>_<key>`` at every scrape."""
+        self._stats.append((component, stats, tuple(sorted(labels.items()))))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: t.List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for labels, value in series.items():
+                    lines.append(f"{self._name(name)}{_labels(labels)} {_number(value)}")
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", "+Inf" if bound == float("inf") else _number(bound)),)
+                        lines.append(f"{self._name(name)}_bucket{_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{self._name(name)}_sum{_labels(labels)} {_number(histogram.sum)}")
+                    lines.append(f"{self._name(name)}_count{_labels(labels)} {histogram.count}")
+
+        by_name: t.Dict[str, t.List[t.Tuple[Labels, float]]] = {}
+        for component, stats, labels in self._stats:
+            for key, value in stats().items():
+                name = f"{component}_{key}" + ("_total" if key in COUNTER_STATS else "")
+                by_name.setdefault(name, []).append((labels, value))
+        for name, series in sorted(by_name.items()):
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {self._name(name)} {kind}")
+            for labels, value in series:
+                lines.append(f"{self._name(name)}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: t.List[str], name: str, kind: str):
+        if self._help.get(name):
+            lines.append(f"# HELP {self._name(name)} {self._help[name]}")
+        lines.append(f"# TYPE {self._name(name)} {kind}")
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _escape(value: t.Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
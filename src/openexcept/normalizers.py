@@ -0,0 +1,79 @@
+import re
+import typing as t
+from abc import ABC, abstractmethod
+from .core import ExceptionEvent
+
+# Names with digits that mean the same thing in every message
+ID_ALLOWLIST = (
+    "md5", "sha1", "sha224", "sha256", "sha384", "sha512", "sha3_256", "sha3_512", "crc32",
+    "base16", "base32", "base64", "base85", "utf-8", "utf-16", "utf-32", "utf8", "utf16", "utf32",
+    "latin-1", "latin1", "cp1252", "iso-8859-1", "ucs-2", "ucs-4",
+    "int8", "int16", "int32", "int64", "uint8", "uint16", "uint32", "uint64",
+    "float16", "float32", "float64", "float128", "complex64", "complex128", "bfloat16",
+    "x86_64", "amd64", "arm64", "aarch64", "win32", "win64", "i386", "i686",
+    "ipv4", "ipv6", "http2", "http11", "tls12", "tls13",
+)
+_ALLOWED_IDS = "|".join(re.escape(name) for name in sorted(ID_ALLOWLIST, key=len, reverse=True))
+
+class MessageNormalizer(ABC):
+    @abstractmethod
+    def normalize(self, message: str) -> str:
+        pass
+
+    def normalize_event(self, event: ExceptionEvent) -> ExceptionEvent:
+        return ExceptionEvent(
+            message=self.normalize(event.message),
+            type=event.type,
+            timestamp=event.timestamp,
+            stack_trace=event.stack_trace,
+            context=event.context
+        )
+
+class RegexNormalizer(MessageNormalizer):
+    """Masks variable tokens so that messages differing only in ids, addresses,
+    numbers and the like collapse to one template, e.g.
+    ``"Connection refused to database xyz123"`` becomes
+    ``"Connection refused to database <ID>"``.
+
+    Masks are applied in order; ``masks`` selects a subset of the defaults and
+    ``extra_patterns`` maps additional placeholders to regexes applied first.
+    """
+
+    DEFAULT_MASKS: t.Dict[str, t.Tuple[str, str]] = {
+        "uuid": (r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b", "<UUID>"),
+        "url": (r"\b[a-zA-Z][a-zA-Z0-9+.\-]*://[^\s'\"]+", "<URL>"),
+        # IPv4 with an optional port, full IPv6 with a hex letter (so that times
+        # like 12:30:45 stay) or compressed IPv6 with "::"
+        "ip": (
+            r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?\b"
+            r"|\b(?=[0-9a-fA-F:]*[a-fA-F])(?:[0-9a-fA-F]{1,4}:){2,7}[0-9a-fA-F]{1,4}\b"
+            r"|(?<![\w:])(?=[0-9a-fA-F:]*[0-9a-fA-F])(?:[0-9a-fA-F]{1,4}(?::[0-9a-fA-F]{1,4}){0,6})?::"
+            r"(?:[0-9a-fA-F]{1,4}(?::[0-9a-fA-F]{1,4}){0,6})?(?![\w:])",
+            "<IP>"
+        ),
+        "hex": (r"\b0[xX][0-9a-fA-F]+\b", "<HEX>"),
+        "path": (r"(?<![\w/.<>])(?:[A-Za-z]:)?(?:[\\/][\w.\-]+)+[\\/]?", "<PATH>"),
+        # Identifiers ending in a digit run, as in xyz123, user_42 or db-7, and hex
+        # runs of 6+ digits and letters; names in ID_ALLOWLIST stay
+        "id": (
+            rf"\b(?!(?i:{_ALLOWED_IDS})\b)(?=[\w\-]*[A-Za-z])\w[\w\-]*?(?:[-_]\d+|\d{{2,}})\b"
+            r"|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{6,}\b",
+            "<ID>"
+        ),
+        # Dotted versions are one number; not digits glued to a word with a dash, as in utf-8
+        "number": (r"(?<![\w.])(?<![A-Za-z]-)(?:[-+]|[vV](?=\d+\.\d))?\d+(?:\.\d+)*\b", "<NUM>"),
+    }
+
+    def __init__(self, masks: t.List[str] = None, extra_patterns: t.Dict[str, str] = None):
+        masks = list(self.DEFAULT_MASKS) if masks is None else masks
+        unknown = [m for m in masks if m not in self.DEFAULT_MASKS]
+        if unknown:
+            raise ValueError(f"Unknown normalizer masks: {unknown}")
+
+        self.patterns = [(re.compile(regex), placeholder) for placeholder, regex in (extra_patterns or {}).items()]
+        self.patterns += [(re.compile(self.DEFAULT_MASKS[m][0]), self.DEFAULT_MASKS[m][1]) for m in masks]
+
+    def normalize(self, message: str) -> str:
+        for pattern, placeholder in self.patterns:
+            message = pattern.sub(placeholder, message)
+        return " ".join(message.split())
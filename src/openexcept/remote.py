@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import json
+import random
+import time
+import typing as t
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# A POST that failed with another status or timed out reading the response may
+# have been grouped already, and resending it would count its exceptions twice.
+# It is only resent when it never reached the server or was turned away.
+UNPROCESSED_STATUS_CODES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+class HTTPOptions:
+    """Connection, retry and compression settings of the remote client, read from
+    the ``storage`` section of the config next to ``url`` and ``api_key``."""
+
+    def __init__(self, timeout: float = 10.0, pool_size: int = 10, max_retries: int = 3,
+                 backoff_factor: float = 0.5, max_backoff: float = 10.0, gzip: bool = True,
+                 gzip_min_size: int = 1024):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.gzip = gzip
+        self.gzip_min_size = gzip_min_size
+
+    @classmethod
+    def from_config(cls, storage_config: dict) -> "HTTPOptions":
+        names = ("timeout", "pool_size", "max_retries", "backoff_factor", "max_backoff", "gzip", "gzip_min_size")
+        return cls(**{name: storage_config[name] for name in names if name in storage_config})
+
+    def retry_delay(self, attempt: int, retry_after: t.Optional[str] = None) -> float:
+        # Honour a numeric Retry-After, otherwise exponential backoff with full jitter
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def encode(self, data: t.Any) -> t.Tuple[t.Optional[bytes], t.Dict[str, str]]:
+        if data is None:
+            return None, {}
+        body = json.dumps(data, default=_json_default).encode("utf-8")
+        if self.gzip and len(body) >= self.gzip_min_size:
+            return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
+        return body, {}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def create_session(headers: t.Dict[str, str], options: HTTPOptions) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=options.pool_size, pool_maxsize=options.pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def retry_status_codes(method: str) -> t.FrozenSet[int]:
+    return RETRY_STATUS_CODES if method.upper() in IDEMPOTENT_METHODS else UNPROCESSED_STATUS_CODES
+
+def _not_sent(error: Exception) -> bool:
+    # Connection refused and connect timeouts; the adapter wraps urllib3's error
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, ConnectTimeoutError)
+
+def send_request(session: requests.Session, method: str, url: str, options: HTTPOptions,
+                 data: t.Any = None, params: dict = None) -> t.Any:
+    body, headers = options.encode(data)
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    for attempt in range(options.max_retries + 1):
+        try:
+            response = session.request(method, url, data=body, params=params, headers=headers, timeout=options.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == options.max_retries or not (idempotent or _not_sent(e)):
+                raise
+            time.sleep(options.retry_delay(attempt))
+            continue
+        if response.status_code in retry_status_codes(method) and attempt < options.max_retries:
+            time.sleep(options.retry_delay(attempt, response.headers.get("Retry-After")))
+            continue
+        response.raise_for_status()
+        return response.json()
+
+class AsyncOpenExcept:
+    """asyncio counterpart of OpenExcept.
+
+    Against a remote server requests go through a pooled ``httpx.AsyncClient``
+    (install ``httpx``); with a local storage config grouping runs in a worker
+    thread of the shared OpenExcept instance so the event loop never blocks.
+    """
+
+    def __init__(self, config_path: str = None):
+        from .easy import OpenExcept
+
+        self.config = OpenExcept._load_config(config_path)
+        storage_config = self.config['storage']
+        if OpenExcept._is_local(storage_config):
+            self._local = OpenExcept(config_path=config_path)
+            self.client = None
+            return
+
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("AsyncOpenExcept requires httpx for remote mode: pip install httpx")
+
+        self._local = None
+        self.url = storage_config['url']
+        self.options = HTTPOptions.from_config(storage_config)
+        headers = {"Content-Type": "application/json"}
+        if 'api_key' in storage_config:
+            headers["Authorization"] = f"Bearer {storage_config['api_key']}"
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=self.options.timeout,
+            limits=httpx.Limits(max_connections=self.options.pool_size,
+                                max_keepalive_connections=self.options.pool_size)
+        )
+
+    async def __aenter__(self) -> "AsyncOpenExcept":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def _make_request(self, endpoint: str, method: str = "GET", data: t.Any = None, params: dict = None) -> t.Any:
+        import httpx
+
+        url = f"{self.url}/{endpoint}"
+        body, headers = self.options.encode(data)
+        # As in send_request, POSTs are only resent if they never reached the server
+        retry_errors = httpx.TransportError if method.upper() in IDEMPOTENT_METHODS else \
+            (httpx.ConnectError, httpx.ConnectTimeout)
+        for attempt in range(self.options.max_retries + 1):
+            try:
+                response = await self.client.request(method, url, content=body, params=params, headers=headers)
+            except retry_errors:
+                if attempt == self.options.max_retries:
+                    raise
+                await asyncio.sleep(self.options.retry_delay(attempt))
+                continue
+            if response.status_code in retry_status_codes(method) and attempt < self.options.max_retries:
+                await asyncio.sleep(self.options.retry_delay(attempt, response.headers.get("Retry-After")))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    async def group_exception(self, message: str, type_name: str = None, stack_trace: str = "", **context) -> str:
+        if self._local is not None:
+            return await asyncio.to_thread(self._local.group_exception, message, type_name, stack_trace, **context)
+        data = {
+            "message": message,
+            "type": type_name or "Unknown",
+            "timestamp": datetime.now().isoformat(),
+            "stack_trace": stack_trace,
+            "context": context,
+        }
+        result = await self._make_request("process", method="POST", data=data)
+        return result["group_id"]
+
+    async def group_exceptions(self, exceptions: t.List[dict]) -> t.List[str]:
+        if self._local is not None:
+            return await asyncio.to_thread(self._local.group_exceptions, exceptions)
+        data = [
+            {
+                "message": exception["message"],
+                "type": exception.get("type") or "Unknown",
+                "timestamp": exception.get("timestamp") or datetime.now(),
+                "stack_trace": exception.get("stack_trace") or "",
+                "context": exception.get("context") or {},
+            }
+            for exception in exceptions
+        ]
+        result = await self._make_request("process_batch", method="POST", data=data)
+        return result["group_ids"]
+
+    async def get_top_exceptions(self, limit: int = 10, days: int = 1) -> t.List[dict]:
+        if self._local is not None:
+            return await asyncio.to_thread(self._local.get_top_exceptions, limit, days)
+        return await self._make_request("top_exceptions", params={"limit": limit, "days": days})
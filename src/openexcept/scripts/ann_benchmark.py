@@ -0,0 +1,85 @@
+"""Recall-vs-latency report for the NumpyVectorStorage ANN indexes.
+
+Every index configuration is compared with exact search over the same groups.
+``recall@k`` is the share of the exact top-k found, ``agreement`` the share of
+queries that get the same grouping decision (the best match above the
+threshold, or a new group) as exact search.
+
+    python -m openexcept.scripts.ann_benchmark --groups 200000 --queries 1000
+    python -m openexcept.scripts.ann_benchmark --vectors groups.npy --threshold 0.8
+"""
+import argparse
+import time
+import typing as t
+import numpy as np
+from openexcept.storage.ann import hnsw_available
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+
+def synthetic_vectors(n: int, dim: int, clusters: int, spread: float, seed: int = 0) -> np.ndarray:
+    """Points scattered around random cluster centres, like variants of recurring exceptions."""
+    random = np.random.default_rng(seed)
+    centres = random.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[random.integers(0, clusters, n)] + spread * random.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def default_configs() -> t.List[t.Dict[str, t.Any]]:
+    configs = [{"type": "ivf", "nprobe": nprobe, "min_train_size": 1} for nprobe in (1, 4, 8, 16, 32)]
+    if hnsw_available():
+        configs += [{"type": "hnsw", "M": 16, "ef": ef} for ef in (16, 32, 64, 128, 256)]
+    return configs
+
+def run(vectors: np.ndarray, queries: np.ndarray, threshold: float, k: int,
+        configs: t.List[t.Dict[str, t.Any]]) -> t.List[t.Dict[str, t.Any]]:
+    expected, build_time, exact_latency = _build_and_search(None, vectors, queries, threshold, k)
+    rows = [{"index": "exact", "build_s": build_time, "latency_ms": exact_latency, "recall": 1.0, "agreement": 1.0}]
+    for config in configs:
+        found, build_time, latency = _build_and_search(config, vectors, queries, threshold, k)
+        recalls = [len(set(hits) & set(exact_hits)) / len(exact_hits)
+                   for hits, exact_hits in zip(found, expected) if exact_hits]
+        agreement = np.mean([hits[:1] == exact_hits[:1] for hits, exact_hits in zip(found, expected)])
+        label = ", ".join(f"{key}={value}" for key, value in config.items() if key != "min_train_size")
+        rows.append({"index": label, "build_s": build_time, "latency_ms": latency,
+                     "recall": float(np.mean(recalls)) if recalls else 1.0, "agreement": float(agreement)})
+    return rows
+
+def _build_and_search(index: t.Optional[dict], vectors: np.ndarray, queries: np.ndarray, threshold: float, k: int):
+    """Hits per query as row numbers, build time in s and mean search latency in ms."""
+    storage = NumpyVectorStorage(size=vectors.shape[1], index=index)
+    start = time.perf_counter()
+    group_ids = storage.store_vectors(vectors, [{}] * len(vectors))
+    build_time = time.perf_counter() - start
+    rows = {group_id: row for row, group_id in enumerate(group_ids)}
+
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        found.append(storage.find_similar(query, threshold, limit=k))
+    latency = (time.perf_counter() - start) * 1000 / len(queries)
+    return [[rows[group_id] for group_id, _ in hits] for hits in found], build_time, latency
+
+def main(argv: t.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", help=".npy file with one group vector per row (default: synthetic)")
+    parser.add_argument("--groups", type=int, default=100000, help="number of synthetic groups")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="number of synthetic clusters")
+    parser.add_argument("--spread", type=float, default=0.05, help="noise around each synthetic cluster centre")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.groups + args.queries, args.dim, args.clusters, args.spread)
+    vectors, queries = vectors[args.queries:], vectors[:args.queries]
+
+    print(f"{len(vectors)} groups, {len(queries)} queries, threshold {args.threshold}, k={args.k}")
+    print(f"{'index':<32} {'build s':>8} {'ms/query':>9} {'recall@k':>9} {'agreement':>10}")
+    for row in run(vectors, queries, args.threshold, args.k, default_configs()):
+        print(f"{row['index']:<32} {row['build_s']:>8.2f} {row['latency_ms']:>9.3f} "
+              f"{row['recall']:>9.4f} {row['agreement']:>10.4f}")
+
+if __name__ == "__main__":
+    main()
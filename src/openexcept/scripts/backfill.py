@@ -0,0 +1,307 @@
+"""Group historical exceptions from JSON-lines or plain log files in bulk.
+
+Input is streamed in batches of --batch-size exceptions. Each batch is embedded
+in one pass, optionally by --processes worker processes, searched against the
+store in bulk, and exceptions that match no group are clustered against each
+other before the new groups are written with one upsert.
+
+JSON-lines files (.jsonl, .ndjson, .json) hold one exception per line with
+"message" and optional "type", "timestamp", "stack_trace" and "context".
+Other files are read as logs: every Python traceback in them is one
+exception, timestamped by the last log line before it. Files ending in .gz
+are decompressed on the fly.
+
+With --checkpoint, the position in every input file is saved every
+--checkpoint-every batches, and a rerun with the same checkpoint continues
+from there. Exceptions read after the last checkpoint are grouped again, so
+their occurrences may be counted twice.
+
+The storage is written directly, so stop the server that uses a local store
+first; a store in use by another process is refused. A Qdrant server can be
+shared.
+
+    python -m openexcept.scripts.backfill --config config.yaml exceptions.jsonl
+    python -m openexcept.scripts.backfill --config config.yaml --processes 8 --checkpoint backfill.json logs/*.log.gz
+"""
+import argparse
+import gzip
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import typing as t
+from datetime import datetime
+from openexcept.core import ExceptionGrouper
+from openexcept.easy import OpenExcept
+from openexcept.storage.locking import StorageInUseError
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson", ".json")
+# Field names accepted in JSON-lines input, in order of preference
+FIELD_ALIASES = {
+    "message": ("message", "msg", "error"),
+    "type": ("type", "exc_type", "exception_type"),
+    "timestamp": ("timestamp", "time", "@timestamp"),
+    "stack_trace": ("stack_trace", "traceback", "exc_info", "stack"),
+}
+
+_TRACEBACK_START = "Traceback (most recent call last):"
+_CHAINED = ("During handling of the above exception", "The above exception was the direct cause")
+_EXCEPTION_LINE = re.compile(r"^(?P<type>[A-Za-z_][\w.]*)(?:: ?(?P<message>.*))?$")
+_LOG_TIMESTAMP = re.compile(r"^\[?(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)")
+
+class Batch:
+    """Columns of up to batch_size exceptions and the input positions after them."""
+
+    def __init__(self):
+        self.messages: t.List[str] = []
+        self.types: t.List[str] = []
+        self.timestamps: t.List[datetime] = []
+        self.stack_traces: t.List[str] = []
+        self.contexts: t.List[dict] = []
+        self.positions: t.Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add(self, exception: dict):
+        self.messages.append(exception["message"])
+        self.types.append(exception.get("type") or "Unknown")
+        self.timestamps.append(exception.get("timestamp") or datetime.now())
+        self.stack_traces.append(exception.get("stack_trace") or "")
+        self.contexts.append(exception.get("context") or {})
+
+def parse_timestamp(value: t.Any) -> t.Optional[datetime]:
+    """Naive local datetime from an ISO string or epoch seconds, None if unparsable."""
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        if isinstance(value, str):
+            parsed = datetime.fromisoformat(value.strip().replace(",", ".").replace("Z", "+00:00"))
+            return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+    except (ValueError, OverflowError, OSError):
+        pass
+    return None
+
+def read_jsonl(f: t.BinaryIO) -> t.Iterator[t.Tuple[t.Optional[dict], int]]:
+    """Exceptions of a JSON-lines file with the offset after each; None for lines without a message."""
+    for line in iter(f.readline, b""):
+        exception = None
+        try:
+            record = json.loads(line) if line.strip() else None
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            fields = {name: next((record[a] for a in aliases if record.get(a)), None)
+                      for name, aliases in FIELD_ALIASES.items()}
+            if isinstance(fields["message"], str):
+                stack_trace = fields["stack_trace"]
+                exception = {
+                    "message": fields["message"],
+                    "type": str(fields["type"] or "Unknown"),
+                    "timestamp": parse_timestamp(fields["timestamp"]),
+                    "stack_trace": "".join(stack_trace) if isinstance(stack_trace, list) else str(stack_trace or ""),
+                    "context": record.get("context") if isinstance(record.get("context"), dict) else {},
+                }
+        yield exception, f.tell()
+
+def read_log(f: t.BinaryIO) -> t.Iterator[t.Tuple[t.Optional[dict], int]]:
+    """Python tracebacks in a log file with the offset after each.
+
+    Chained tracebacks ("During handling of the above exception ...") count as
+    one exception, the last one raised.
+    """
+    timestamp = None
+    trace: t.Optional[t.List[str]] = None
+    pending: t.Optional[t.Tuple[dict, int]] = None
+    for raw in iter(f.readline, b""):
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if pending is not None and line.strip():
+            if line.startswith(_CHAINED):
+                pending = None
+                continue
+            yield pending
+            pending = None
+        if _TRACEBACK_START in line:
+            trace = [] if trace is None else trace
+            continue
+        if trace is not None:
+            if line.startswith((" ", "\t")) or not line.strip():
+                trace.append(line + "\n")
+                continue
+            match = _EXCEPTION_LINE.match(line)
+            if match:
+                pending = ({
+                    "message": match["message"] or "",
+                    "type": match["type"],
+                    "timestamp": timestamp,
+                    "stack_trace": "".join(trace),
+                    "context": {},
+                }, f.tell())
+            trace = None
+            continue
+        match = _LOG_TIMESTAMP.match(line)
+        if match:
+            timestamp = parse_timestamp(match.group(1))
+    if pending is not None:
+        yield pending
+
+def open_input(path: str) -> t.BinaryIO:
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def input_format(path: str, fmt: str = "auto") -> str:
+    if fmt != "auto":
+        return fmt
+    return "jsonl" if path[:-3 if path.endswith(".gz") else None].endswith(JSONL_SUFFIXES) else "log"
+
+class Checkpoint:
+    """Input positions and totals, saved atomically as JSON."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.offsets: t.Dict[str, int] = {}
+        self.exceptions = 0
+        self.new_groups = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.offsets = state["offsets"]
+            self.exceptions = state["exceptions"]
+            self.new_groups = state["new_groups"]
+
+    def save(self):
+        if not self.path:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"offsets": self.offsets, "exceptions": self.exceptions, "new_groups": self.new_groups}, f)
+        os.replace(temporary, self.path)
+
+def read_batches(paths: t.List[str], batch_size: int, fmt: str = "auto",
+                 offsets: t.Dict[str, int] = None) -> t.Iterator[Batch]:
+    """Batches of exceptions from all files, starting at the given offsets."""
+    offsets = offsets or {}
+    batch = Batch()
+    for path in paths:
+        key = os.path.abspath(path)
+        with open_input(path) as f:
+            f.seek(offsets.get(key, 0))
+            reader = read_jsonl(f) if input_format(path, fmt) == "jsonl" else read_log(f)
+            for exception, offset in reader:
+                if exception is not None:
+                    batch.add(exception)
+                batch.positions[key] = offset
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = Batch()
+    if len(batch) or batch.positions:
+        yield batch
+
+def prefetch(iterator: t.Iterator, size: int = 2) -> t.Iterator:
+    """Run ``iterator`` in a thread, ``size`` items ahead, so reading overlaps grouping."""
+    items: "queue.Queue" = queue.Queue(maxsize=size)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        items.put(done)
+
+    threading.Thread(target=produce, name="openexcept-backfill-reader", daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def backfill(grouper: ExceptionGrouper, paths: t.List[str], batch_size: int = 2048, fmt: str = "auto",
+             checkpoint_path: str = None, checkpoint_every: int = 10, report_every: float = 10.0,
+             out: t.TextIO = sys.stderr) -> Checkpoint:
+    """Group every exception in ``paths`` and return the final totals."""
+    checkpoint = Checkpoint(checkpoint_path)
+    sizes = {os.path.abspath(p): os.path.getsize(p) for p in paths if not p.endswith(".gz")}
+    start = last_report = time.monotonic()
+    resumed_from = checkpoint.exceptions
+
+    def report(final: bool = False):
+        elapsed = time.monotonic() - start
+        rate = (checkpoint.exceptions - resumed_from) / elapsed if elapsed else 0.0
+        line = f"{checkpoint.exceptions} exceptions, {checkpoint.new_groups} new groups, {rate:.0f}/s"
+        if len(sizes) == len(paths) and sum(sizes.values()):
+            read = sum(min(checkpoint.offsets.get(p, 0), size) for p, size in sizes.items())
+            line += f", {100 * read / sum(sizes.values()):.1f}% of input"
+        print(("done: " if final else "") + line, file=out, flush=True)
+
+    for i, batch in enumerate(prefetch(read_batches(paths, batch_size, fmt, checkpoint.offsets)), 1):
+        if len(batch):
+            results = grouper.process_columns(
+                batch.messages, batch.types, batch.timestamps, batch.stack_traces, batch.contexts
+            )
+            checkpoint.new_groups += int(results.is_new_group.sum())
+        checkpoint.exceptions += len(batch)
+        checkpoint.offsets.update(batch.positions)
+        if checkpoint_path and i % checkpoint_every == 0:
+            # Buffered occurrences must be stored before the input they came from is skipped on resume
+            if grouper.aggregator is not None:
+                grouper.aggregator.flush()
+            checkpoint.save()
+        if report_every and time.monotonic() - last_report >= report_every:
+            last_report = time.monotonic()
+            report()
+
+    if grouper.aggregator is not None:
+        grouper.aggregator.flush()
+    checkpoint.save()
+    report(final=True)
+    return checkpoint
+
+def main(argv: t.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="JSON-lines or log files")
+    parser.add_argument("--config", help="OpenExcept config with local storage (default: config_local_fs.yaml)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "log"], default="auto")
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--processes", type=int, help="embedding worker processes (overrides embedding.pool)")
+    parser.add_argument("--torch-threads", type=int, help="intra-op threads per embedding worker")
+    parser.add_argument("--threshold", type=float, help="similarity threshold (overrides the config)")
+    parser.add_argument("--checkpoint", help="JSON file to save progress to and resume from")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="batches between checkpoints")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    config = OpenExcept._load_config(args.config)
+    if not OpenExcept._is_local(config['storage']):
+        parser.error("backfill writes to storage directly and needs a config with local storage")
+    if args.threshold is not None:
+        config['embedding']['similarity_threshold'] = args.threshold
+    if args.processes or args.torch_threads:
+        pool = dict(config['embedding'].get('pool') or {})
+        if args.processes:
+            pool['processes'] = args.processes
+        if args.torch_threads:
+            pool['torch_threads'] = args.torch_threads
+        # Large batches are split evenly between the workers
+        pool.setdefault('min_chunk_size', max(16, args.batch_size // pool.get('processes', 2)))
+        config['embedding']['pool'] = pool
+
+    try:
+        grouper = OpenExcept.create_grouper(config)
+    except StorageInUseError as e:
+        parser.error(str(e))
+    try:
+        backfill(grouper, args.paths, args.batch_size, args.format, args.checkpoint, args.checkpoint_every,
+                 args.report_every)
+    finally:
+        for component in (grouper.aggregator, grouper.embedding, grouper.storage):
+            if hasattr(component, "close"):
+                component.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Grouping agreement and throughput of two embedding backends.
+
+Groups the same exceptions once per backend, each with a fresh in-memory
+storage, and reports how often both backends put a pair of exceptions in the
+same group (pair agreement, adjusted Rand index), how many exceptions land in
+a different group than under the reference backend, the cosine similarity of
+the two embeddings of each exception and the embedding throughput.
+
+    python -m openexcept.scripts.embedding_agreement --candidate onnx --quantize avx512_vnni
+    python -m openexcept.scripts.embedding_agreement --messages exceptions.jsonl --threshold 0.8
+"""
+import argparse
+import json
+import random
+import time
+import typing as t
+import numpy as np
+from openexcept.core import ExceptionEvent, ExceptionGrouper
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+
+# Used when no --messages file is given: templates with variable parts, like real exception streams
+SAMPLE_TEMPLATES = [
+    ("ValueError", "invalid literal for int() with base 10: '{word}'"),
+    ("KeyError", "'{word}'"),
+    ("ConnectionError", "Failed to connect to {host}:{port}: Connection refused"),
+    ("TimeoutError", "Request to https://{host}/api/v{n}/{word} timed out after {n}s"),
+    ("FileNotFoundError", "[Errno 2] No such file or directory: '/var/data/{word}/{n}.json'"),
+    ("PermissionError", "[Errno 13] Permission denied: '/etc/{word}.conf'"),
+    ("ZeroDivisionError", "division by zero"),
+    ("AttributeError", "'NoneType' object has no attribute '{word}'"),
+    ("TypeError", "unsupported operand type(s) for +: 'int' and '{word}'"),
+    ("IndexError", "list index out of range"),
+    ("RuntimeError", "Worker {n} exited unexpectedly with code {n}"),
+    ("sqlalchemy.exc.OperationalError", "could not connect to server at {host} port {port}"),
+    ("MemoryError", "Unable to allocate {n} MiB for an array with shape ({n}, {n})"),
+    ("json.JSONDecodeError", "Expecting value: line {n} column {n} (char {n})"),
+    ("UnicodeDecodeError", "'utf-8' codec can't decode byte 0x{n} in position {n}: invalid start byte"),
+]
+WORDS = ["user_id", "order", "price", "session", "token", "config", "account", "payload", "email", "items"]
+
+def sample_exceptions(n: int, seed: int = 0) -> t.List[ExceptionEvent]:
+    rng = random.Random(seed)
+    events = []
+    for _ in range(n):
+        type_name, template = rng.choice(SAMPLE_TEMPLATES)
+        message = template.format(word=rng.choice(WORDS), host=f"db-{rng.randint(1, 9)}.internal",
+                                  port=rng.choice([5432, 6379, 8080]), n=rng.randint(1, 4096))
+        events.append(ExceptionEvent(message=message, type=type_name))
+    return events
+
+def load_exceptions(path: str) -> t.List[ExceptionEvent]:
+    """One JSON object with "message" and optional "type" per line."""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [ExceptionEvent(message=r["message"], type=r.get("type") or "Unknown") for r in records]
+
+def create_embedding(backend: str, model_name: str, quantize: str = None, intra_op_threads: int = None):
+    if backend == "torch":
+        from openexcept.embeddings.sentence_transformers import SentenceTransformerEmbedding
+        return SentenceTransformerEmbedding(model_name)
+    from openexcept.embeddings.onnx_embedding import OnnxSentenceTransformerEmbedding
+    return OnnxSentenceTransformerEmbedding(model_name, quantize=quantize, intra_op_threads=intra_op_threads)
+
+def group_labels(vectors: np.ndarray, threshold: float) -> np.ndarray:
+    """Group ids, as integers, that the grouper assigns when exceptions arrive in this order."""
+    embedding = _PrecomputedEmbedding(vectors)
+    grouper = ExceptionGrouper(NumpyVectorStorage(size=vectors.shape[1]), embedding, threshold)
+    labels: t.Dict[str, int] = {}
+    return np.array([
+        labels.setdefault(grouper.process(ExceptionEvent(message=str(i), type="")).group_id, len(labels))
+        for i in range(len(vectors))
+    ])
+
+def pair_agreement(reference: np.ndarray, candidate: np.ndarray) -> t.Tuple[float, float]:
+    """Share of exception pairs both labelings treat alike (Rand index) and the adjusted Rand index."""
+    n = len(reference)
+    contingency = np.zeros((reference.max() + 1, candidate.max() + 1), dtype=np.int64)
+    np.add.at(contingency, (reference, candidate), 1)
+    pairs = lambda counts: (counts * (counts - 1) // 2).sum()
+    total = n * (n - 1) // 2
+    both = pairs(contingency)
+    same_reference = pairs(contingency.sum(axis=1))
+    same_candidate = pairs(contingency.sum(axis=0))
+    rand = (total + 2 * both - same_reference - same_candidate) / total if total else 1.0
+    expected = same_reference * same_candidate / total if total else 0
+    maximum = (same_reference + same_candidate) / 2
+    adjusted = (both - expected) / (maximum - expected) if maximum != expected else 1.0
+    return float(rand), float(adjusted)
+
+def moved_exceptions(reference: np.ndarray, candidate: np.ndarray) -> int:
+    """Exceptions not in the candidate group that most members of their reference group are in."""
+    moved = 0
+    for group in np.unique(reference):
+        members = candidate[reference == group]
+        moved += len(members) - np.bincount(members).max()
+    return int(moved)
+
+class _PrecomputedEmbedding:
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed(self, exception: ExceptionEvent) -> t.List[float]:
+        return self.vectors[int(exception.message)].tolist()
+
+def _embed_timed(embedding, events: t.List[ExceptionEvent], batch_size: int) -> t.Tuple[np.ndarray, float]:
+    embedding.embed_batch(events[:batch_size])  # warm-up, includes model loading
+    start = time.perf_counter()
+    vectors = [v for i in range(0, len(events), batch_size) for v in embedding.embed_batch(events[i:i + batch_size])]
+    return np.asarray(vectors, dtype=np.float32), len(events) / (time.perf_counter() - start)
+
+def main(argv: t.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", help="JSON-lines file of exceptions (default: synthetic sample)")
+    parser.add_argument("--count", type=int, default=2000, help="number of synthetic exceptions")
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--reference", choices=["torch", "onnx"], default="torch")
+    parser.add_argument("--candidate", choices=["torch", "onnx"], default="onnx")
+    parser.add_argument("--quantize", choices=["arm64", "avx2", "avx512", "avx512_vnni"], help="int8 preset of the candidate")
+    parser.add_argument("--intra-op-threads", type=int)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    events = load_exceptions(args.messages) if args.messages else sample_exceptions(args.count)
+    reference = create_embedding(args.reference, args.model)
+    candidate = create_embedding(args.candidate, args.model, args.quantize, args.intra_op_threads)
+    reference_vectors, reference_rate = _embed_timed(reference, events, args.batch_size)
+    candidate_vectors, candidate_rate = _embed_timed(candidate, events, args.batch_size)
+
+    normalize = lambda m: m / np.linalg.norm(m, axis=1, keepdims=True)
+    cosine = (normalize(reference_vectors) * normalize(candidate_vectors)).sum(axis=1)
+    reference_labels = group_labels(reference_vectors, args.threshold)
+    candidate_labels = group_labels(candidate_vectors, args.threshold)
+    rand, adjusted_rand = pair_agreement(reference_labels, candidate_labels)
+
+    print(f"{len(events)} exceptions, threshold {args.threshold}")
+    print(f"throughput: {args.reference} {reference_rate:.1f}/s, {args.candidate} {candidate_rate:.1f}/s "
+          f"({candidate_rate / reference_rate:.2f}x)")
+    print(f"embedding cosine: mean {cosine.mean():.5f}, min {cosine.min():.5f}")
+    print(f"groups: {args.reference} {reference_labels.max() + 1}, {args.candidate} {candidate_labels.max() + 1}")
+    print(f"pair agreement {rand:.5f}, adjusted Rand index {adjusted_rand:.5f}, "
+          f"moved exceptions {moved_exceptions(reference_labels, candidate_labels)}")
+
+if __name__ == "__main__":
+    main()
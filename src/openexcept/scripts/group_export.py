@@ -0,0 +1,62 @@
+"""Export the groups of a store to a file and import them into another store.
+
+Groups are streamed in blocks of float32 vectors and JSON records (see
+openexcept.storage.export), read with paginated scrolls and written with one
+upsert per block, so memory use does not grow with the store. Group ids,
+counts and occurrence histograms are kept. "-" reads from stdin or writes to
+stdout, and files ending in .gz are compressed. The storage is accessed
+directly, so stop the server that uses a local store first.
+
+    python -m openexcept.scripts.group_export export --config config_local_fs.yaml groups.oex.gz
+    python -m openexcept.scripts.group_export import --config config_local_url.yaml groups.oex.gz
+
+    # Move groups to another embedding model by recomputing their vectors
+    python -m openexcept.scripts.group_export import --config new_model.yaml --reembed groups.oex.gz
+"""
+import argparse
+import contextlib
+import gzip
+import sys
+import time
+import typing as t
+from openexcept.easy import OpenExcept
+from openexcept.storage.locking import StorageInUseError
+
+def open_file(path: str, mode: str) -> t.ContextManager[t.BinaryIO]:
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin.buffer if mode == "rb" else sys.stdout.buffer)
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+def main(argv: t.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="export file, or - for stdin/stdout")
+    parser.add_argument("--config", help="OpenExcept config with local storage (default: config_local_fs.yaml)")
+    parser.add_argument("--batch-size", type=int, default=1024, help="groups per block when exporting")
+    parser.add_argument("--reembed", action="store_true",
+                        help="recompute vectors with the config's embedding when importing")
+    args = parser.parse_args(argv)
+
+    config = OpenExcept._load_config(args.config)
+    if not OpenExcept._is_local(config['storage']):
+        parser.error("export and import access storage directly and need a config with local storage")
+    try:
+        grouper = OpenExcept.create_grouper(config)
+    except StorageInUseError as e:
+        parser.error(str(e))
+    start = time.monotonic()
+    try:
+        if args.command == "export":
+            with open_file(args.path, "wb") as f:
+                groups = grouper.storage.export_groups(f, args.batch_size)
+        else:
+            with open_file(args.path, "rb") as f:
+                groups = grouper.storage.import_groups(f, grouper.embedding if args.reembed else None)
+    finally:
+        for component in (grouper.embedding, grouper.storage):
+            if hasattr(component, "close"):
+                component.close()
+    print(f"{args.command}ed {groups} groups in {time.monotonic() - start:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
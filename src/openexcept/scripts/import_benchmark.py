@@ -0,0 +1,59 @@
+"""Import-time benchmark for the openexcept package.
+
+Imports the package in fresh interpreters and reports the median wall time and
+any heavy optional dependency that was imported along the way. Exits non-zero
+when the median exceeds ``--max-seconds`` or a heavy module is imported, so it
+can guard CI against regressions.
+
+    python -m openexcept.scripts.import_benchmark --runs 10 --max-seconds 1.0
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import typing as t
+
+# Only needed once a config selects the backend that uses them
+HEAVY_MODULES = ("qdrant_client", "sentence_transformers", "torch", "transformers", "openai", "httpx", "onnxruntime")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(statement: str = "import openexcept", runs: int = 5) -> t.Dict[str, t.Any]:
+    """Median import time over ``runs`` fresh interpreters and the heavy modules imported."""
+    probe = _PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    results = [
+        json.loads(subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True).stdout)
+        for _ in range(runs)
+    ]
+    return {
+        "median_seconds": statistics.median(result["seconds"] for result in results),
+        "heavy_modules": sorted({module for result in results for module in result["heavy"]}),
+    }
+
+def main(argv: t.List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statement", default="import openexcept", help="code to time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail when the median is slower")
+    args = parser.parse_args(argv)
+
+    result = measure(args.statement, args.runs)
+    print(f"{args.statement}: median {result['median_seconds'] * 1000:.1f} ms over {args.runs} runs")
+    failed = False
+    if result["heavy_modules"]:
+        print(f"heavy modules imported: {', '.join(result['heavy_modules'])}")
+        failed = True
+    if args.max_seconds is not None and result["median_seconds"] > args.max_seconds:
+        print(f"slower than the {args.max_seconds} s budget")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Merge near-duplicate groups, evict stale groups and compact the storage once.
+
+Settings default to the config's maintenance section; the options override them.
+With --dry-run the near-duplicate clusters are only printed. The storage is
+accessed directly, so stop the server that uses a local store first, or let the
+server run maintenance itself (maintenance.background in its config).
+
+    python -m openexcept.scripts.maintain_groups --config config.yaml --merge-threshold 0.95 --ttl-days 30
+    python -m openexcept.scripts.maintain_groups --config config.yaml --merge-threshold 0.9 --dry-run
+"""
+import argparse
+import json
+import sys
+import time
+import typing as t
+from openexcept.easy import OpenExcept
+from openexcept.maintenance import GroupMaintenance
+from openexcept.storage.locking import StorageInUseError
+
+def main(argv: t.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="OpenExcept config with local storage (default: config_local_fs.yaml)")
+    parser.add_argument("--merge-threshold", type=float, help="merge groups at least this similar")
+    parser.add_argument("--ttl-days", type=float, help="evict groups not seen for this many days")
+    parser.add_argument("--no-compact", action="store_true", help="skip storage compaction")
+    parser.add_argument("--batch-size", type=int, help="groups scanned per similarity search")
+    parser.add_argument("--dry-run", action="store_true", help="print the clusters that would be merged")
+    args = parser.parse_args(argv)
+
+    config = OpenExcept._load_config(args.config)
+    if not OpenExcept._is_local(config['storage']):
+        parser.error("maintenance accesses storage directly and needs a config with local storage")
+    settings = {k: v for k, v in (config.get('maintenance') or {}).items() if k not in ('background', 'interval')}
+    overrides = {"merge_threshold": args.merge_threshold, "ttl_days": args.ttl_days, "batch_size": args.batch_size}
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    if args.no_compact:
+        settings['compact'] = False
+
+    try:
+        grouper = OpenExcept.create_grouper(config)
+    except StorageInUseError as e:
+        parser.error(str(e))
+    maintenance = GroupMaintenance(grouper, **settings)
+    start = time.monotonic()
+    try:
+        if args.dry_run:
+            if maintenance.merge_threshold is None:
+                parser.error("--dry-run needs a merge threshold")
+            for cluster in maintenance.find_duplicates():
+                print(json.dumps({"group_id": cluster[0], "merged_ids": cluster[1:]}))
+        else:
+            report = maintenance.run()
+            print(f"merged {report['merged']} and evicted {report['evicted']} groups "
+                  f"in {time.monotonic() - start:.1f}s", file=sys.stderr)
+    finally:
+        for component in (grouper.aggregator, grouper.embedding, grouper.storage):
+            if hasattr(component, "close"):
+                component.close()
+
+if __name__ == "__main__":
+    main()
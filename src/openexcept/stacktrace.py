@@ -0,0 +1,135 @@
+import hashlib
+import re
+import typing as t
+from .cache import GroupCache
+
+# File "/app/myapp/db.py", line 42, in connect
+_PYTHON_FRAME = re.compile(r'^\s*File "(?P<path>[^"]+)", line \d+, in (?P<function>.+?)\s*$')
+# at com.example.Dao.load(Dao.java:42)
+_JAVA_FRAME = re.compile(r'^\s*at (?P<qualified>[\w$.<>/]+)\((?P<location>[^)]*)\)\s*$')
+# at load (/app/dao.js:42:7) or at /app/dao.js:42:7
+_JS_FRAME = re.compile(r'^\s*at (?:async )?(?:(?P<function>[^\s(]+) \((?P<path>[^)]+)\)|(?P<bare>\S+))\s*$')
+_LINE_SUFFIX = re.compile(r"(?::\d+)+$")
+# Generated parts of names: lambda$load$0, Foo$$EnhancerBySpring$$1a2b, addresses like 0x7f3a...
+_GENERATED_SUFFIX = re.compile(r"\$\d+\b|\$\$.*|0x[0-9a-fA-F]+")
+
+# Path fragments of code that does not belong to the application
+LIBRARY_MARKERS = ("site-packages", "dist-packages", "node_modules")
+_STDLIB_PATH = re.compile(r"[/\\]lib[/\\]python\d+(?:\.\d+)?[/\\]")
+LIBRARY_PACKAGES = ("java.", "javax.", "jdk.", "sun.", "com.sun.", "kotlin.", "scala.", "node:", "internal/")
+
+class StackFrame:
+    def __init__(self, module: str, function: str, in_app: bool):
+        self.module = module
+        self.function = function
+        self.in_app = in_app
+
+    def __str__(self) -> str:
+        return f"{self.module}:{self.function}"
+
+    def __repr__(self) -> str:
+        return f"StackFrame({self.module!r}, {self.function!r}, in_app={self.in_app})"
+
+def parse_stack_trace(stack_trace: str, app_paths: t.Sequence[str] = (), module_depth: int = 2) -> t.List[StackFrame]:
+    """Parse a Python, Java or JavaScript stack trace into frames, innermost first.
+
+    Frames are reduced to module and function; file system prefixes, line
+    numbers and generated suffixes are dropped so that the same code yields the
+    same frames on every host and after unrelated edits. Modules are the path
+    relative to one of ``app_paths`` or, failing that, its last
+    ``module_depth`` components.
+    """
+    python_frames, other_frames = [], []
+    for line in stack_trace.splitlines():
+        match = _PYTHON_FRAME.match(line)
+        if match:
+            python_frames.append(_path_frame(match["path"], match["function"], app_paths, module_depth))
+            continue
+        match = _JAVA_FRAME.match(line)
+        if match:
+            module, _, function = match["qualified"].rpartition(".")
+            other_frames.append(StackFrame(module, _clean(function), not module.startswith(LIBRARY_PACKAGES)))
+            continue
+        match = _JS_FRAME.match(line)
+        if match:
+            path = match["path"] or match["bare"]
+            other_frames.append(_path_frame(_LINE_SUFFIX.sub("", path), match["function"] or "<anonymous>",
+                                            app_paths, module_depth))
+    # Python prints the innermost call last, Java and JavaScript print it first
+    return python_frames[::-1] + other_frames
+
+def _path_frame(path: str, function: str, app_paths: t.Sequence[str], module_depth: int) -> StackFrame:
+    if path.startswith("<"):
+        # <frozen importlib._bootstrap>, <string>, <stdin>
+        return StackFrame(path.strip("<>").replace("frozen ", ""), _clean(function), False)
+    path = path.replace("\\", "/")
+    in_app = not (any(marker in path for marker in LIBRARY_MARKERS) or _STDLIB_PATH.search(path)
+                  or path.startswith(LIBRARY_PACKAGES))
+    for prefix in app_paths:
+        prefix = prefix.replace("\\", "/").rstrip("/") + "/"
+        if path.startswith(prefix):
+            parts = path[len(prefix):].split("/")
+            break
+    else:
+        parts = path.split("/")[-module_depth:]
+    parts[-1] = parts[-1].rsplit(".", 1)[0] if "." in parts[-1] else parts[-1]
+    return StackFrame(".".join(part for part in parts if part), _clean(function), in_app)
+
+def _clean(function: str) -> str:
+    return _GENERATED_SUFFIX.sub("", function) or function
+
+class StackFingerprinter:
+    """Structural fingerprints of exceptions from their stack traces.
+
+    The fingerprint hashes the exception type and the ``top_k`` innermost
+    in-app frames (all frames if none are in-app). Exceptions with the same
+    fingerprint are raised by the same code path, so the grouper assigns them
+    to the group the fingerprint was first seen in without calling the model.
+    It remembers up to ``max_size`` fingerprints; storages that index the
+    ``stack_fingerprint`` metadata answer for the rest.
+
+    With ``embed_frames`` the frames are also appended to the embedded text, so
+    that exceptions with similar messages but different origins are told apart.
+    """
+
+    def __init__(self, top_k: int = 5, app_paths: t.Sequence[str] = (), module_depth: int = 2,
+                 embed_frames: bool = True, max_size: int = 100000):
+        if top_k <= 0:
+            raise ValueError("top_k must be positive")
+        self.top_k = top_k
+        self.app_paths = list(app_paths)
+        self.module_depth = module_depth
+        self.embed_frames = embed_frames
+        self._groups = GroupCache(max_size=max_size, ttl=None)
+
+    def frames(self, stack_trace: str) -> t.List[StackFrame]:
+        if not stack_trace:
+            return []
+        frames = parse_stack_trace(stack_trace, self.app_paths, self.module_depth)
+        in_app = [frame for frame in frames if frame.in_app]
+        return (in_app or frames)[:self.top_k]
+
+    @staticmethod
+    def fingerprint(exception_type: str, frames: t.List[StackFrame]) -> t.Optional[str]:
+        if not frames:
+            return None
+        text = "\n".join([exception_type] + [str(frame) for frame in frames])
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def describe(frames: t.List[StackFrame]) -> str:
+        """Frames as a suffix for the embedded text."""
+        return " at " + " < ".join(str(frame) for frame in frames) if frames else ""
+
+    def lookup(self, fingerprint: str) -> t.Optional[str]:
+        cached = self._groups.get(fingerprint)
+        return cached[0] if cached is not None else None
+
+    def remember(self, fingerprint: str, group_id: str):
+        self._groups.put(fingerprint, group_id)
+
+    def invalidate(self, group_id: str):
+        self._groups.invalidate(group_id)
+
+    def stats(self) -> t.Dict[str, int]:
+        return {"size": len(self._groups), "hits": self._groups.hits, "misses": self._groups.misses}
@@ -0,0 +1,190 @@
+import typing as t
+from abc import ABC, abstractmethod
+import numpy as np
+
+class VectorIndex(ABC):
+    """Approximate nearest neighbour index over the rows of a vector matrix.
+
+    ``search`` only proposes candidate rows; the storage scores them exactly
+    against its own matrix, so an index can cost recall but never changes a
+    similarity score.
+    """
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray, start: int):
+        """Index ``vectors[start:]``. ``vectors`` holds every row stored so far."""
+        pass
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int) -> t.Optional[t.List[np.ndarray]]:
+        """Candidate rows per query, or None when the storage should search exhaustively."""
+        pass
+
+class HNSWIndex(VectorIndex):
+    """HNSW graph from hnswlib, or faiss-cpu when hnswlib is not installed.
+
+    ``M`` and ``ef_construction`` trade build time and memory for graph
+    quality; ``ef`` is the search-time candidate list size.
+    """
+
+    def __init__(self, dim: int, M: int = 16, ef_construction: int = 200, ef: int = 64,
+                 initial_capacity: int = 1024):
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self._count = 0
+        try:
+            import hnswlib
+        except ImportError:
+            hnswlib = None
+
+        if hnswlib is not None:
+            self._index = hnswlib.Index(space="ip", dim=dim)
+            self._index.init_index(max_elements=initial_capacity, ef_construction=ef_construction, M=M)
+            self._index.set_ef(ef)
+            self._faiss = None
+            return
+
+        try:
+            import faiss
+        except ImportError:
+            raise ImportError("HNSWIndex requires hnswlib or faiss-cpu: pip install hnswlib")
+        self._faiss = faiss
+        self._index = faiss.IndexHNSWFlat(dim, M, faiss.METRIC_INNER_PRODUCT)
+        self._index.hnsw.efConstruction = ef_construction
+        self._index.hnsw.efSearch = ef
+
+    def add(self, vectors: np.ndarray, start: int):
+        new = np.ascontiguousarray(vectors[start:], dtype=np.float32)
+        if not len(new):
+            return
+        if self._faiss is not None:
+            # faiss numbers vectors in insertion order, which matches the storage rows
+            self._index.add(new)
+        else:
+            needed = start + len(new)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+            self._index.add_items(new, np.arange(start, needed))
+        self._count = start + len(new)
+
+    def search(self, queries: np.ndarray, k: int) -> t.Optional[t.List[np.ndarray]]:
+        k = min(k, self._count)
+        if k == 0:
+            return [np.zeros(0, dtype=np.int64) for _ in queries]
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if self._faiss is not None:
+            self._index.hnsw.efSearch = max(self.ef, k)
+            _, labels = self._index.search(queries, k)
+            return [row[row >= 0] for row in labels.astype(np.int64)]
+        self._index.set_ef(max(self.ef, k))
+        labels, _ = self._index.knn_query(queries, k=k)
+        return list(labels.astype(np.int64))
+
+class IVFIndex(VectorIndex):
+    """Inverted file index in pure NumPy.
+
+    Rows are clustered around ``nlist`` k-means centroids (``sqrt(n)`` when not
+    set) and a query only scans the rows of its ``nprobe`` closest centroids.
+    Until ``min_train_size`` rows exist the storage keeps searching
+    exhaustively. Centroids are retrained whenever the row count has grown by
+    ``retrain_growth`` since the last training; rows added in between are
+    assigned to their closest existing centroid.
+    """
+
+    def __init__(self, dim: int, nlist: int = None, nprobe: int = 8, min_train_size: int = 4096,
+                 retrain_growth: float = 4.0, kmeans_iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.kmeans_iterations = kmeans_iterations
+        self._random = np.random.default_rng(seed)
+
+        self._centroids: t.Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._lists: t.List[t.List[int]] = []
+        # numpy copies of the lists, rebuilt lazily after a list changes
+        self._list_arrays: t.List[t.Optional[np.ndarray]] = []
+
+    def add(self, vectors: np.ndarray, start: int):
+        n = len(vectors)
+        if n < self.min_train_size:
+            return
+        if self._centroids is None or n >= self._trained_size * self.retrain_growth:
+            self._train(vectors)
+            return
+        new = np.asarray(vectors[start:], dtype=np.float32)
+        if not len(new):
+            return
+        for row, centroid in enumerate(self._assign(new), start):
+            self._lists[centroid].append(row)
+            self._list_arrays[centroid] = None
+
+    def search(self, queries: np.ndarray, k: int) -> t.Optional[t.List[np.ndarray]]:
+        if self._centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self._centroids))
+        centroid_scores = queries @ self._centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        return [np.concatenate([self._list_array(c) for c in probe]) for probe in probes]
+
+    def _train(self, vectors: np.ndarray):
+        n = len(vectors)
+        nlist = min(self.nlist or max(1, int(np.sqrt(n))), n)
+        sample_size = min(n, nlist * 64)
+        sample = np.asarray(vectors[np.sort(self._random.choice(n, sample_size, replace=False))], dtype=np.float32)
+
+        # Spherical k-means: centroids are renormalized means of their members
+        centroids = sample[self._random.choice(sample_size, nlist, replace=False)]
+        for _ in range(self.kmeans_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+
+        self._centroids = centroids
+        self._trained_size = n
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]].tolist() for c in range(nlist)]
+        self._list_arrays = [None] * nlist
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(np.asarray(vectors[i:i + chunk_size], dtype=np.float32) @ self._centroids.T, axis=1)
+            for i in range(0, len(vectors), chunk_size)
+        ])
+
+    def _list_array(self, centroid: int) -> np.ndarray:
+        array = self._list_arrays[centroid]
+        if array is None:
+            array = self._list_arrays[centroid] = np.array(self._lists[centroid], dtype=np.int64)
+        return array
+
+INDEX_TYPES = {"hnsw": HNSWIndex, "ivf": IVFIndex}
+
+def hnsw_available() -> bool:
+    for module in ("hnswlib", "faiss"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+def create_index(dim: int, type: str = "auto", **params) -> VectorIndex:
+    """Build an index from the ``index`` storage config, e.g. ``{"type": "hnsw", "ef": 128}``.
+
+    ``auto`` picks HNSW when hnswlib or faiss-cpu is installed and IVF otherwise.
+    """
+    if type == "auto":
+        type = "hnsw" if hnsw_available() else "ivf"
+    if type not in INDEX_TYPES:
+        raise ValueError(f"index type must be one of {['auto', *INDEX_TYPES]}, got {type!r}")
+    return INDEX_TYPES[type](dim, **params)
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 import typing as t
 from datetime import datetime, timedelta
+from ..histogram import OccurrenceDelta
 
 class VectorStorage(ABC):
     @abstractmethod
@@ -17,4 +18,121 @@ class VectorStorage(ABC):
 
     @abstractmethod
     def get_top_exceptions(self, limit: int, time_range: timedelta) -> t.List[dict]:
-        pass
\ No newline at end of file
+        pass
+
+    def store_vectors(self, vectors: t.List[t.List[float]], metadatas: t.List[dict]) -> t.List[str]:
+        return [self.store_vector(vector, metadata) for vector, metadata in zip(vectors, metadatas)]
+
+    def find_similar_batch(self, vectors: t.List[t.List[float]], threshold: float,
+                           where: t.Dict[str, t.Any] = None) -> t.List[t.List[tuple[str, float]]]:
+        """Like find_similar for every vector. Storages that support it restrict
+        the search to groups whose metadata equals ``where`` in every field; dotted
+        fields such as ``context.service`` address nested metadata."""
+        kwargs = {"where": where} if where else {}
+        return [self.find_similar(vector, threshold, **kwargs) for vector in vectors]
+
+    def increment_occurrences(self, occurrences: t.Dict[str, OccurrenceDelta]):
+        """Write buffered occurrences, one OccurrenceDelta per group."""
+        for group_id, delta in occurrences.items():
+            for _ in range(delta.count):
+                self.increment_occurrence(group_id, delta.last_seen)
+
+    def find_group_by_fingerprint(self, fingerprint: str) -> t.Optional[str]:
+        """The group whose ``stack_fingerprint`` metadata is ``fingerprint``, or None
+        if there is none or the storage cannot look it up."""
+        return None
+
+    def resolve_group(self, group_id: str) -> t.Optional[str]:
+        """``group_id`` itself, the group it was merged into, or None if it no
+        longer exists. Storages that cannot merge groups return it unchanged."""
+        return group_id
+
+    def merge_groups(self, group_id: str, merged_ids: t.List[str]):
+        """Fold the groups ``merged_ids`` into ``group_id``: their occurrences are
+        added to it, they are deleted and their ids resolve to ``group_id``."""
+        raise NotImplementedError(f"{type(self).__name__} cannot merge groups")
+
+    def merge_groups_batch(self, merges: t.List[t.Tuple[str, t.List[str]]]):
+        """merge_groups for every (group_id, merged_ids) pair. Storages that have
+        to rewrite themselves after removing groups do so once for the batch."""
+        for group_id, merged_ids in merges:
+            self.merge_groups(group_id, merged_ids)
+
+    def delete_groups(self, group_ids: t.List[str]) -> t.List[str]:
+        """Delete groups and return the ids that existed."""
+        raise NotImplementedError(f"{type(self).__name__} cannot delete groups")
+
+    def evict_groups(self, last_seen_before: datetime) -> t.List[str]:
+        """Delete the groups last seen before ``last_seen_before`` and return their ids."""
+        raise NotImplementedError(f"{type(self).__name__} cannot evict groups")
+
+    def compact(self):
+        """Reclaim the space of deleted groups; a no-op where the backend does it itself."""
+
+    def get_occurrence_histogram(self, group_id: str, time_range: timedelta,
+                                 resolution: str = None) -> t.List[tuple[datetime, int]]:
+        """Occurrences of a group per minute, hour or day bucket within ``time_range``."""
+        raise NotImplementedError(f"{type(self).__name__} does not keep occurrence histograms")
+
+    def scan_groups(self, batch_size: int = 1024) -> t.Iterator[t.Tuple[t.Any, t.List[dict]]]:
+        """All groups in blocks of at most ``batch_size``: a float32 vector matrix
+        and one record per group with group_id, metadata, count, last_seen (a Unix
+        timestamp) and the occurrence histogram buckets."""
+        raise NotImplementedError(f"{type(self).__name__} cannot list its groups")
+
+    def restore_groups(self, vectors: t.Any, records: t.List[dict]):
+        """Store groups as scan_groups returned them, keeping their ids and
+        occurrences and replacing groups with the same id."""
+        raise NotImplementedError(f"{type(self).__name__} cannot restore groups")
+
+    def export_groups(self, f: t.BinaryIO, batch_size: int = 1024) -> int:
+        """Stream all groups to ``f`` in the format of ``storage.export`` and
+        return the number of groups written."""
+        from .export import write_groups
+        return write_groups(f, self.scan_groups(batch_size), self.vector_size)
+
+    def import_groups(self, f: t.BinaryIO, embedding=None) -> int:
+        """Restore the groups of an export read from ``f`` and return their number.
+
+        With ``embedding``, vectors are recomputed from each group's template or
+        example message, which moves the groups to a new embedding model.
+        """
+        from .export import read_header, read_blocks, group_text
+        header = read_header(f)
+        if embedding is None and header["vector_size"] != self.vector_size:
+            raise ValueError(f"Export holds {header['vector_size']}-dimensional vectors, not {self.vector_size}; "
+                             f"pass an embedding to recompute them")
+        groups = 0
+        for vectors, records in read_blocks(f, header["vector_size"]):
+            if embedding is not None:
+                from ..core import ExceptionEvent
+                vectors = embedding.embed_matrix([
+                    ExceptionEvent(message=group_text(record["metadata"]),
+                                   type=record["metadata"].get("type", "Unknown"))
+                    for record in records
+                ])
+            self.restore_groups(vectors, records)
+            groups += len(records)
+        return groups
+
+def merged_metadata(metadata: dict, merged: t.List[t.Tuple[str, dict]]) -> dict:
+    """Metadata of a group that absorbed the (group id, metadata) pairs in ``merged``."""
+    aliases = list(metadata.get("merged_ids", []))
+    fingerprints = list(metadata.get("merged_fingerprints", []))
+    for group_id, other in merged:
+        aliases += [group_id] + other.get("merged_ids", [])
+        if "stack_fingerprint" in other:
+            fingerprints.append(other["stack_fingerprint"])
+        fingerprints += other.get("merged_fingerprints", [])
+    metadata = {**metadata, "merged_ids": aliases}
+    if fingerprints:
+        metadata["merged_fingerprints"] = list(dict.fromkeys(fingerprints))
+    return metadata
+
+def first_seen_timestamp(metadata: dict, default: float) -> float:
+    """Unix time of a new group's first occurrence: its ``first_seen`` metadata,
+    which the grouper sets to the event time, or ``default``."""
+    try:
+        return datetime.fromisoformat(metadata["first_seen"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return default
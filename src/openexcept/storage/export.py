@@ -0,0 +1,65 @@
+import json
+import struct
+import typing as t
+import numpy as np
+
+# A group export is a header followed by blocks of groups:
+#
+#   MAGIC, uint32 header length, header JSON ({"version": 1, "vector_size": d})
+#   per block: uint32 groups n, uint32 records length, n * d little-endian
+#              float32 vectors, records JSON (one record per group)
+#   uint32 0, uint32 0
+#
+# A record holds group_id, metadata, count, last_seen (a Unix timestamp) and the
+# combined occurrence histogram buckets. Blocks are written and read one at a
+# time, so memory use is bounded by the block size, not the store size.
+MAGIC = b"OPENEXCEPT-GROUPS\n"
+VERSION = 1
+_UINT32 = struct.Struct("<I")
+_BLOCK = struct.Struct("<II")
+
+GroupBlock = t.Tuple[np.ndarray, t.List[dict]]
+
+def write_groups(f: t.BinaryIO, blocks: t.Iterable[GroupBlock], vector_size: int) -> int:
+    """Write blocks of (vectors, records) to ``f`` and return the number of groups."""
+    header = json.dumps({"version": VERSION, "vector_size": vector_size}).encode("utf-8")
+    f.write(MAGIC + _UINT32.pack(len(header)) + header)
+    groups = 0
+    for vectors, records in blocks:
+        if not records:
+            continue
+        payload = json.dumps(records, separators=(",", ":")).encode("utf-8")
+        f.write(_BLOCK.pack(len(records), len(payload)))
+        f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        f.write(payload)
+        groups += len(records)
+    f.write(_BLOCK.pack(0, 0))
+    return groups
+
+def read_header(f: t.BinaryIO) -> dict:
+    if _read(f, len(MAGIC)) != MAGIC:
+        raise ValueError("Not an OpenExcept group export")
+    (length,) = _UINT32.unpack(_read(f, _UINT32.size))
+    header = json.loads(_read(f, length))
+    if header["version"] > VERSION:
+        raise ValueError(f"Group export version {header['version']} is newer than the supported version {VERSION}")
+    return header
+
+def read_blocks(f: t.BinaryIO, vector_size: int) -> t.Iterator[GroupBlock]:
+    """Blocks of (float32 vectors, records) following the header."""
+    while True:
+        groups, length = _BLOCK.unpack(_read(f, _BLOCK.size))
+        if not groups:
+            return
+        vectors = np.frombuffer(_read(f, groups * vector_size * 4), dtype="<f4").reshape(groups, vector_size)
+        yield vectors.astype(np.float32), json.loads(_read(f, length))
+
+def group_text(metadata: dict) -> str:
+    """The text a group was embedded from: its template, else its example message."""
+    return metadata.get("template") or metadata.get("example_message", "")
+
+def _read(f: t.BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Group export is truncated")
+    return data
@@ -0,0 +1,25 @@
+import os
+import typing as t
+
+class StorageInUseError(RuntimeError):
+    """The storage files are held by another process, such as a running server."""
+
+def try_lock(path: str) -> t.Optional[t.IO]:
+    """Open ``path`` and take an exclusive lock on it without waiting.
+
+    Returns the open file, which holds the lock until it is closed or the
+    process exits, or None if another process or open file holds the lock.
+    """
+    f = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
@@ -0,0 +1,507 @@
+import heapq
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+import typing as t
+import numpy as np
+from .ann import VectorIndex, create_index
+from .base import VectorStorage, first_seen_timestamp, merged_metadata
+from .locking import StorageInUseError, try_lock
+from ..histogram import OccurrenceDelta, OccurrenceHistogram, RESOLUTIONS
+
+class NumpyVectorStorage(VectorStorage):
+    """In-process storage that keeps normalized group vectors in one float32 matrix.
+
+    ``find_similar`` is a brute-force matrix-vector product, which for tens of
+    thousands of groups beats a vector database round-trip. Counts and last seen
+    times live in NumPy arrays next to the matrix.
+
+    With ``path`` set, the matrix is a memory-mapped file and every change is
+    appended to a JSON-lines log. The log is folded into a snapshot every
+    ``checkpoint_every`` records and on ``close``, so opening an existing store
+    only maps the matrix, reads the snapshot and replays a short log. A
+    persisted store is locked by the process that opens it, so a second process
+    (e.g. a maintenance script next to a running server) gets a
+    StorageInUseError instead of corrupting the files.
+
+    ``index`` switches search to an approximate nearest neighbour index (see
+    ``create_index``) for stores with hundreds of thousands of groups. Its
+    candidates are still scored exactly against the matrix. The index lives in
+    memory and is rebuilt from the matrix when a persisted store is opened.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    SNAPSHOT_FILE = "snapshot.json"
+    LOG_FILE = "log.jsonl"
+    LOCK_FILE = "lock"
+
+    def __init__(self, size: int = 384, path: str = None, histogram_retention: t.Dict[str, int] = None,
+                 checkpoint_every: int = 10000, index: t.Dict[str, t.Any] = None):
+        self.vector_size = size
+        self.path = os.path.expanduser(path) if path else None
+        self.histogram_retention = histogram_retention
+        self.checkpoint_every = checkpoint_every
+
+        self._lock = threading.RLock()
+        self._ids: t.List[str] = []
+        self._rows: t.Dict[str, int] = {}
+        self._metadata: t.List[dict] = []
+        self._stack_groups: t.Dict[str, str] = {}
+        self._aliases: t.Dict[str, str] = {}
+        self._postings: t.Dict[str, t.Dict[t.Any, t.List[int]]] = {}
+        self._histograms: t.List[OccurrenceHistogram] = []
+        self._vectors = np.zeros((0, size), dtype=np.float32)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._log = None
+        self._log_records = 0
+        self._lock_file = None
+        self._index_params = index
+        self._index: t.Optional[VectorIndex] = create_index(size, **index) if index else None
+
+        if self.path:
+            self._open()
+        self._index_rows(0)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def store_vector(self, vector: t.List[float], metadata: dict) -> str:
+        return self.store_vectors([vector], [metadata])[0]
+
+    def store_vectors(self, vectors: t.List[t.List[float]], metadatas: t.List[dict]) -> t.List[str]:
+        if not len(vectors):
+            return []
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.vector_size))
+        now = datetime.now().timestamp()
+        with self._lock:
+            start = len(self._ids)
+            group_ids = []
+            for vector, metadata in zip(matrix, metadatas):
+                group_id = str(uuid.uuid4())
+                # The first occurrence is counted at the event time, which is
+                # in the past for late and backfilled events
+                timestamp = first_seen_timestamp(metadata, now)
+                self._apply_store(group_id, vector, metadata, timestamp)
+                self._append_log({"op": "store", "id": group_id, "metadata": metadata, "timestamp": timestamp})
+                group_ids.append(group_id)
+            self._index_rows(start)
+            return group_ids
+
+    def find_similar(self, vector: t.List[float], threshold: float, limit: int = 5,
+                     where: t.Dict[str, t.Any] = None) -> t.List[tuple[str, float]]:
+        return self.find_similar_batch([vector], threshold, limit, where)[0]
+
+    def find_similar_batch(self, vectors: t.List[t.List[float]], threshold: float, limit: int = 5,
+                           where: t.Dict[str, t.Any] = None) -> t.List[t.List[tuple[str, float]]]:
+        if not len(vectors):
+            return []
+        queries = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.vector_size))
+        with self._lock:
+            if where:
+                # Filtered candidate sets are small, so they are scored exactly without the index
+                rows = self._filter_rows(where)
+                scores = queries @ self._vectors[rows].T
+                return [self._top_hits(row, threshold, limit, rows) for row in scores]
+            n = len(self._ids)
+            candidates = self._index.search(queries, limit) if self._index is not None and n else None
+            if candidates is not None:
+                return [
+                    self._top_hits(self._vectors[rows] @ query, threshold, limit, rows)
+                    for query, rows in zip(queries, candidates)
+                ]
+            scores = queries @ self._vectors[:n].T if n else np.zeros((len(queries), 0), dtype=np.float32)
+            return [self._top_hits(row, threshold, limit) for row in scores]
+
+    def _top_hits(self, scores: np.ndarray, threshold: float, limit: int,
+                  rows: np.ndarray = None) -> t.List[tuple[str, float]]:
+        candidates = np.flatnonzero(scores >= threshold)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        if rows is None:
+            return [(self._ids[i], float(scores[i])) for i in candidates]
+        return [(self._ids[rows[i]], float(scores[i])) for i in candidates]
+
+    def _filter_rows(self, where: t.Dict[str, t.Any]) -> np.ndarray:
+        rows = None
+        for field, value in where.items():
+            if field not in self._postings:
+                # Inverted index of the field, kept up to date by _apply_store from now on
+                postings: t.Dict[t.Any, t.List[int]] = {}
+                for row, metadata in enumerate(self._metadata):
+                    _add_posting(postings, _metadata_value(metadata, field), row)
+                self._postings[field] = postings
+            matching = np.asarray(self._postings[field].get(value, []), dtype=np.int64)
+            rows = matching if rows is None else np.intersect1d(rows, matching, assume_unique=True)
+        return rows
+
+    def find_group_by_fingerprint(self, fingerprint: str) -> t.Optional[str]:
+        return self._stack_groups.get(fingerprint)
+
+    def resolve_group(self, group_id: str) -> t.Optional[str]:
+        with self._lock:
+            return group_id if group_id in self._rows else self._aliases.get(group_id)
+
+    def merge_groups(self, group_id: str, merged_ids: t.List[str]):
+        self.merge_groups_batch([(group_id, merged_ids)])
+
+    def merge_groups_batch(self, merges: t.List[t.Tuple[str, t.List[str]]]):
+        # Removing rows rewrites the lookups, the ANN index and the snapshot, so
+        # all merged rows are removed together
+        with self._lock:
+            removed: t.Set[int] = set()
+            for group_id, merged_ids in merges:
+                row = self._rows.get(group_id)
+                if row is None or row in removed:
+                    continue
+                merged_rows = [
+                    r for r in dict.fromkeys(self._rows[m] for m in merged_ids if m in self._rows)
+                    if r != row and r not in removed
+                ]
+                if not merged_rows:
+                    continue
+                self._metadata[row] = merged_metadata(self._metadata[row], [
+                    (self._ids[m], self._metadata[m]) for m in merged_rows
+                ])
+                self._counts[row] += self._counts[merged_rows].sum()
+                self._last_seen[row] = max(self._last_seen[row], self._last_seen[merged_rows].max())
+                combined = OccurrenceHistogram.combine([self._histograms[r] for r in [row] + merged_rows])
+                self._histograms[row] = OccurrenceHistogram(combined.buckets, self.histogram_retention)
+                removed.update(merged_rows)
+            self._delete_rows(sorted(removed))
+
+    def delete_groups(self, group_ids: t.List[str]) -> t.List[str]:
+        with self._lock:
+            rows = [self._rows[group_id] for group_id in group_ids if group_id in self._rows]
+            deleted = [self._ids[row] for row in rows]
+            self._delete_rows(rows)
+            return deleted
+
+    def evict_groups(self, last_seen_before: datetime) -> t.List[str]:
+        with self._lock:
+            rows = np.flatnonzero(self._last_seen[:len(self._ids)] < last_seen_before.timestamp())
+            evicted = [self._ids[row] for row in rows]
+            self._delete_rows(rows)
+            return evicted
+
+    def compact(self):
+        """Shrink the matrix and its file to the stored groups and rebuild the ANN index."""
+        with self._lock:
+            n = len(self._ids)
+            capacity = max(n, 1)
+            self._counts = self._counts[:capacity].copy()
+            self._last_seen = self._last_seen[:capacity].copy()
+            if self.path:
+                self._vectors.flush()
+                self._vectors = np.zeros((0, self.vector_size), dtype=np.float32)
+                with open(os.path.join(self.path, self.VECTORS_FILE), "r+b") as f:
+                    f.truncate(capacity * self.vector_size * 4)
+                self._vectors = self._map_vectors(capacity)
+            else:
+                self._vectors = self._vectors[:n].copy()
+            self._reindex()
+            self.checkpoint()
+
+    def increment_occurrence(self, group_id: str, timestamp: datetime):
+        delta = OccurrenceDelta()
+        delta.add(timestamp)
+        self.increment_occurrences({group_id: delta})
+
+    def increment_occurrences(self, occurrences: t.Dict[str, OccurrenceDelta]):
+        with self._lock:
+            for group_id, delta in occurrences.items():
+                if group_id not in self._rows:
+                    continue
+                minutes = {str(minute): count for minute, count in delta.minutes.items()}
+                self._apply_increment(group_id, delta.count, delta.last_seen.timestamp(), minutes)
+                self._append_log({
+                    "op": "increment",
+                    "id": group_id,
+                    "count": delta.count,
+                    "last_seen": delta.last_seen.timestamp(),
+                    "minutes": minutes
+                })
+
+    def get_top_exceptions(self, limit: int, time_range: timedelta) -> t.List[t.Dict[str, t.Any]]:
+        current_time = datetime.now().timestamp()
+        start = current_time - time_range.total_seconds()
+        resolution = OccurrenceHistogram.resolution_for(start, current_time, self.histogram_retention)
+        with self._lock:
+            n = len(self._ids)
+            in_window = np.flatnonzero((self._last_seen[:n] >= start) & (self._last_seen[:n] <= current_time))
+            counted = ((self._histograms[row].count_since(start, resolution), row) for row in in_window)
+            top = heapq.nlargest(limit, counted, key=lambda item: item[0])
+            return [
+                {
+                    "group_id": self._ids[row],
+                    "count": count,
+                    "total_count": int(self._counts[row]),
+                    "metadata": dict(self._metadata[row])
+                }
+                for count, row in top
+            ]
+
+    def get_occurrence_histogram(self, group_id: str, time_range: timedelta,
+                                 resolution: str = None) -> t.List[tuple[datetime, int]]:
+        current_time = datetime.now().timestamp()
+        start = current_time - time_range.total_seconds()
+        if resolution is None:
+            resolution = OccurrenceHistogram.resolution_for(start, current_time, self.histogram_retention)
+        elif resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {list(RESOLUTIONS)}, got {resolution!r}")
+        with self._lock:
+            row = self._rows.get(group_id)
+            if row is None:
+                return []
+            series = self._histograms[row].series(start, resolution)
+        return [(datetime.fromtimestamp(bucket), count) for bucket, count in series]
+
+    def scan_groups(self, batch_size: int = 1024) -> t.Iterator[t.Tuple[np.ndarray, t.List[dict]]]:
+        start = 0
+        while True:
+            with self._lock:
+                end = min(start + batch_size, len(self._ids))
+                if start >= end:
+                    return
+                vectors = np.array(self._vectors[start:end])
+                records = [
+                    {
+                        "group_id": self._ids[row],
+                        "metadata": self._metadata[row],
+                        "count": int(self._counts[row]),
+                        "last_seen": float(self._last_seen[row]),
+                        "histogram": self._histograms[row].buckets
+                    }
+                    for row in range(start, end)
+                ]
+            yield vectors, records
+            start = end
+
+    def restore_groups(self, vectors: np.ndarray, records: t.List[dict]):
+        if not records:
+            return
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(records), self.vector_size))
+        with self._lock:
+            start = len(self._ids)
+            for vector, record in zip(matrix, records):
+                self._apply_restore(vector, record)
+                self._append_log({"op": "restore", **record})
+            self._index_rows(start)
+
+    def checkpoint(self):
+        """Write a snapshot of all groups and truncate the append log."""
+        if not self.path:
+            return
+        with self._lock:
+            n = len(self._ids)
+            self._vectors.flush()
+            snapshot = {
+                "size": self.vector_size,
+                "ids": self._ids,
+                "metadata": self._metadata,
+                "counts": self._counts[:n].tolist(),
+                "last_seen": self._last_seen[:n].tolist(),
+                "histograms": [histogram.buckets for histogram in self._histograms],
+            }
+            tmp_path = os.path.join(self.path, self.SNAPSHOT_FILE + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, os.path.join(self.path, self.SNAPSHOT_FILE))
+            self._log.seek(0)
+            self._log.truncate()
+            self._log_records = 0
+
+    def close(self):
+        if self._log is None:
+            return
+        with self._lock:
+            self.checkpoint()
+            self._log.close()
+            self._log = None
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _apply_store(self, group_id: str, vector: np.ndarray, metadata: dict, timestamp: float):
+        row = len(self._ids)
+        self._reserve(row + 1)
+        self._vectors[row] = vector
+        self._ids.append(group_id)
+        self._rows[group_id] = row
+        self._metadata.append(metadata)
+        self._remember_metadata(group_id, metadata)
+        for field, postings in self._postings.items():
+            _add_posting(postings, _metadata_value(metadata, field), row)
+        self._histograms.append(OccurrenceHistogram(retention=self.histogram_retention))
+        self._counts[row] = 0
+        self._last_seen[row] = 0.0
+        first_minute = {str(int(timestamp // 60 * 60)): 1}
+        self._apply_increment(group_id, 1, timestamp, first_minute)
+
+    def _apply_restore(self, vector: np.ndarray, record: dict):
+        group_id = record["group_id"]
+        row = self._rows.get(group_id)
+        if row is None:
+            self._apply_store(group_id, vector, record["metadata"], record["last_seen"])
+            row = self._rows[group_id]
+        else:
+            # A replaced vector keeps its old position in an ANN index until the index is rebuilt
+            self._vectors[row] = vector
+            self._metadata[row] = record["metadata"]
+            self._postings.clear()
+            self._remember_metadata(group_id, record["metadata"])
+        self._counts[row] = record["count"]
+        self._last_seen[row] = record["last_seen"]
+        self._histograms[row] = OccurrenceHistogram(record["histogram"], self.histogram_retention)
+
+    def _apply_increment(self, group_id: str, count: int, last_seen: float, minutes: t.Dict[str, int]):
+        row = self._rows[group_id]
+        self._counts[row] += count
+        self._last_seen[row] = max(self._last_seen[row], last_seen)
+        histogram = self._histograms[row]
+        histogram.add({int(minute): n for minute, n in minutes.items()})
+        # Pruning walks every bucket, so only do it once the minute buckets overflow
+        if len(histogram.buckets["minute"]) > histogram.retention["minute"]:
+            histogram.prune(datetime.now().timestamp())
+
+    def _remember_metadata(self, group_id: str, metadata: dict):
+        if "stack_fingerprint" in metadata:
+            self._stack_groups.setdefault(metadata["stack_fingerprint"], group_id)
+        # Groups merged into this one keep resolving to it
+        for fingerprint in metadata.get("merged_fingerprints", ()):
+            self._stack_groups[fingerprint] = group_id
+        for alias in metadata.get("merged_ids", ()):
+            self._aliases[alias] = group_id
+
+    def _delete_rows(self, rows: t.Sequence[int]):
+        if not len(rows):
+            return
+        n = len(self._ids)
+        keep = np.ones(n, dtype=bool)
+        keep[np.asarray(rows, dtype=np.int64)] = False
+        kept = np.flatnonzero(keep)
+        self._vectors[:len(kept)] = self._vectors[kept]
+        self._counts[:len(kept)] = self._counts[kept]
+        self._last_seen[:len(kept)] = self._last_seen[kept]
+        self._ids = [self._ids[row] for row in kept]
+        self._metadata = [self._metadata[row] for row in kept]
+        self._histograms = [self._histograms[row] for row in kept]
+        self._reindex()
+        # Rows moved, so the log of earlier stores no longer matches the matrix
+        self.checkpoint()
+
+    def _reindex(self):
+        """Rebuild the lookups derived from the rows after rows were removed or moved."""
+        self._rows = {group_id: row for row, group_id in enumerate(self._ids)}
+        self._stack_groups = {}
+        self._aliases = {}
+        for group_id, metadata in zip(self._ids, self._metadata):
+            self._remember_metadata(group_id, metadata)
+        self._postings.clear()
+        if self._index_params:
+            self._index = create_index(self.vector_size, **self._index_params)
+            self._index_rows(0)
+
+    def _index_rows(self, start: int):
+        if self._index is not None and start < len(self._ids):
+            self._index.add(self._vectors[:len(self._ids)], start)
+
+    def _reserve(self, rows: int):
+        capacity = len(self._counts)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        self._counts = np.concatenate([self._counts, np.zeros(capacity - len(self._counts), dtype=np.int64)])
+        self._last_seen = np.concatenate([self._last_seen, np.zeros(capacity - len(self._last_seen), dtype=np.float64)])
+        if self.path:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            self._vectors = self._map_vectors(capacity)
+        else:
+            vectors = np.zeros((capacity, self.vector_size), dtype=np.float32)
+            vectors[:len(self._vectors)] = self._vectors
+            self._vectors = vectors
+
+    def _map_vectors(self, capacity: int) -> np.memmap:
+        vectors_path = os.path.join(self.path, self.VECTORS_FILE)
+        with open(vectors_path, "ab") as f:
+            f.truncate(max(os.path.getsize(vectors_path), capacity * self.vector_size * 4))
+        rows = os.path.getsize(vectors_path) // (self.vector_size * 4)
+        return np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.vector_size))
+
+    def _append_log(self, record: dict):
+        if self._log is None:
+            return
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+        self._log_records += 1
+        if self._log_records >= self.checkpoint_every:
+            self.checkpoint()
+
+    def _open(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_file = try_lock(os.path.join(self.path, self.LOCK_FILE))
+        if self._lock_file is None:
+            raise StorageInUseError(f"Storage at {self.path} is in use by another process; "
+                                    f"stop the server or script that uses it first")
+        self._reserve(1)
+
+        snapshot_path = os.path.join(self.path, self.SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+            if snapshot["size"] != self.vector_size:
+                raise ValueError(f"Storage at {self.path} holds {snapshot['size']}-dimensional vectors, "
+                                 f"not {self.vector_size}")
+            n = len(snapshot["ids"])
+            self._reserve(n)
+            self._ids = snapshot["ids"]
+            self._rows = {group_id: row for row, group_id in enumerate(self._ids)}
+            self._metadata = snapshot["metadata"]
+            for group_id, metadata in zip(self._ids, self._metadata):
+                self._remember_metadata(group_id, metadata)
+            self._counts[:n] = snapshot["counts"]
+            self._last_seen[:n] = snapshot["last_seen"]
+            self._histograms = [OccurrenceHistogram(b, self.histogram_retention) for b in snapshot["histograms"]]
+
+        log_path = os.path.join(self.path, self.LOG_FILE)
+        if os.path.exists(log_path):
+            with open(log_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # a torn write at the end of the log
+                    self._replay(record)
+        self._log = open(log_path, "a")
+
+    def _replay(self, record: dict):
+        if record["op"] == "store":
+            # The vector itself was written to the memory-mapped file already
+            row = len(self._ids)
+            self._apply_store(record["id"], self._vectors[row].copy(), record["metadata"], record["timestamp"])
+        elif record["op"] == "restore":
+            # As for stores, the vector is in the memory-mapped file already
+            row = self._rows.get(record["group_id"], len(self._ids))
+            self._apply_restore(self._vectors[row].copy(), record)
+        elif record["op"] == "increment":
+            self._apply_increment(record["id"], record["count"], record["last_seen"], record["minutes"])
+        self._log_records += 1
+
+def _metadata_value(metadata: dict, field: str) -> t.Any:
+    value = metadata
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def _add_posting(postings: t.Dict[t.Any, t.List[int]], value: t.Any, row: int):
+    if value is not None and not isinstance(value, (dict, list)):
+        postings.setdefault(value, []).append(row)
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
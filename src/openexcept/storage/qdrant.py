@@ -1,104 +1,646 @@
+import heapq
+import itertools
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import uuid
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.models import PointStruct
 from datetime import datetime, timedelta
 import typing as t
-from .base import VectorStorage
+from .base import VectorStorage, first_seen_timestamp, merged_metadata
+from .locking import StorageInUseError, try_lock
+from ..histogram import OccurrenceDelta, OccurrenceHistogram, RESOLUTIONS
 from typing import List, Dict, Any
 
+logger = logging.getLogger(__name__)
+
+# Occurrences after the first are counted in per-writer payload fields named
+# COUNT_SHARD_PREFIX + writer id; a group's total is "count" plus all shards
+COUNT_SHARD_PREFIX = "count_"
+# Likewise every writer keeps its minute/hour/day occurrence histogram of a
+# group in its own HISTOGRAM_SHARD_PREFIX + writer id field
+HISTOGRAM_SHARD_PREFIX = "hist_"
+# get_top_exceptions pre-ranks groups on the server by one of these fields: the
+# occurrences in the last day and within the histogram retention, as the writer
+# that last wrote the group counted them in its shard
+DAY_COUNT_FIELD = "day_count"
+RETAINED_COUNT_FIELD = "retained_count"
+
 class QdrantVectorStorage(VectorStorage):
-    def __init__(self, path: str = None, url: str = None, collection: str = "exceptions", size: int = 384):
+    """Groups stored as points of a Qdrant collection.
+
+    ``hnsw``, ``quantization``, ``on_disk``, ``on_disk_payload`` and
+    ``optimizers`` are collection settings applied when the collection is
+    created; with ``migrate`` they are also applied to an existing collection
+    (see ``update_collection_config``). ``search`` holds the default search-time
+    parameters: ``hnsw_ef``, ``exact``, ``rescore`` and ``oversampling``.
+
+    ``type``, ``stack_fingerprint`` and the ``merged_ids``/``merged_fingerprints``
+    of merged groups get keyword payload indexes, as do the
+    ``payload_indexes`` fields (e.g. ``context.service``) that searches are
+    filtered on.
+
+    ``get_top_exceptions`` asks the server for the ``top_oversampling`` x
+    ``limit`` groups with the most recent occurrences as seen by one writer and
+    ranks only those by their exact window counts, so it does not read every
+    group of the window.
+
+    ``writer_id`` names this writer's count and histogram shards. It defaults to
+    the host name and the lowest slot number not taken by another storage on
+    the host, so a restarted process continues its old shards instead of adding
+    new ones to every group it touches.
+    """
+
+    # Keys of the storage config section that are passed through to __init__
+    CONFIG_OPTIONS = ("collection", "hnsw", "quantization", "on_disk", "on_disk_payload", "optimizers",
+                      "search", "payload_indexes", "migrate", "writer_id", "top_oversampling")
+
+    def __init__(self, path: str = None, url: str = None, collection: str = "exceptions", size: int = 384,
+                 histogram_retention: Dict[str, int] = None, hnsw: Dict[str, Any] = None,
+                 quantization: Dict[str, Any] = None, on_disk: bool = None, on_disk_payload: bool = None,
+                 optimizers: Dict[str, Any] = None, search: Dict[str, Any] = None,
+                 payload_indexes: t.List[str] = None, migrate: bool = False, writer_id: str = None,
+                 top_oversampling: int = 10):
         if url:
             self.client = QdrantClient(url=url)
         else:
-            self.client = QdrantClient(path=path)
+            try:
+                self.client = QdrantClient(path=path)
+            except RuntimeError as e:
+                # Embedded Qdrant locks its folder to one client
+                if "already accessed" not in str(e):
+                    raise
+                raise StorageInUseError(f"Storage at {path} is in use by another process; stop the server or "
+                                        f"script that uses it first, or run a Qdrant server for shared access") from e
         self.collection = collection
         self.vector_size = size
-        self._ensure_collection()
+        self._writer_lock = None
+        if writer_id is None:
+            writer_id, self._writer_lock = _claim_writer_slot()
+        # Dots would address nested payload fields
+        self.writer_id = re.sub(r"[^\w\-]", "_", writer_id)
+        self._shard_key = COUNT_SHARD_PREFIX + self.writer_id
+        self._shard_counts: Dict[str, int] = {}
+        self._histogram_key = HISTOGRAM_SHARD_PREFIX + self.writer_id
+        self._histograms: Dict[str, OccurrenceHistogram] = {}
+        # Newest last_seen_timestamp of each group this writer has read or written;
+        # groups missing here have not been touched by this process yet
+        self._last_seen: Dict[str, float] = {}
+        self.histogram_retention = histogram_retention
+        self._count_lock = threading.Lock()
+        self.hnsw_config = models.HnswConfigDiff(**hnsw) if hnsw else None
+        self.quantization_config = _quantization_config(quantization)
+        self.on_disk = on_disk
+        self.on_disk_payload = on_disk_payload
+        self.optimizers_config = models.OptimizersConfigDiff(**optimizers) if optimizers else None
+        self.search_defaults = dict(search or {})
+        self.top_oversampling = top_oversampling
+        self.keyword_indexes = list(dict.fromkeys(["type", "stack_fingerprint", "merged_ids", "merged_fingerprints"] + list(payload_indexes or [])))
+        self._ensure_collection(migrate)
+
+    @classmethod
+    def options_from_config(cls, storage_config: dict) -> Dict[str, Any]:
+        return {name: storage_config[name] for name in cls.CONFIG_OPTIONS if name in storage_config}
 
-    def _ensure_collection(self):
+    def _ensure_collection(self, migrate: bool = False):
         collections = self.client.get_collections().collections
-        if self.collection not in [c.name for c in collections]:
-            self.client.create_collection(
-                collection_name=self.collection,
-                vectors_config=models.VectorParams(size=self.vector_size, distance=models.Distance.COSINE),
-            )
+        if self.collection in [c.name for c in collections]:
+            if migrate:
+                self.update_collection_config()
+                self._create_keyword_indexes()
+            # Qdrant server only orders by indexed fields, and collections of
+            # older versions lack these indexes
+            self._create_rank_indexes()
+            return
+        self.client.create_collection(
+            collection_name=self.collection,
+            vectors_config=models.VectorParams(
+                size=self.vector_size, distance=models.Distance.COSINE, on_disk=self.on_disk
+            ),
+            hnsw_config=self.hnsw_config,
+            quantization_config=self.quantization_config,
+            optimizers_config=self.optimizers_config,
+            on_disk_payload=self.on_disk_payload
+        )
+        self.client.create_payload_index(
+            collection_name=self.collection,
+            field_name="last_seen_timestamp",
+            field_schema=models.PayloadSchemaType.FLOAT
+        )
+        self.client.create_payload_index(
+            collection_name=self.collection,
+            field_name="count",
+            field_schema=models.PayloadSchemaType.INTEGER
+        )
+        self._create_rank_indexes()
+        self._create_keyword_indexes()
+
+    def _create_rank_indexes(self):
+        for field in (DAY_COUNT_FIELD, RETAINED_COUNT_FIELD):
             self.client.create_payload_index(
                 collection_name=self.collection,
-                field_name="last_seen",
-                field_schema=models.PayloadSchemaType.DATETIME
+                field_name=field,
+                field_schema=models.PayloadSchemaType.INTEGER
             )
+
+    def _create_keyword_indexes(self):
+        for field in self.keyword_indexes:
             self.client.create_payload_index(
                 collection_name=self.collection,
-                field_name="count",
-                field_schema=models.PayloadSchemaType.INTEGER
+                field_name=field,
+                field_schema=models.PayloadSchemaType.KEYWORD
             )
 
-    def store_vector(self, vector: t.List[float], metadata: dict) -> str:
-        point_id = self.client.count(collection_name=self.collection).count
-        self.client.upsert(
+    def update_collection_config(self):
+        """Apply the configured collection settings to an existing collection.
+
+        Qdrant rebuilds the HNSW graph, quantized vectors and on-disk storage of
+        the affected segments in the background, so search keeps working during
+        the migration. Settings that are not configured are left as they are.
+        """
+        self.client.update_collection(
             collection_name=self.collection,
-            points=[PointStruct(
-                id=point_id,
-                vector=vector,
-                payload={**metadata, "count": 1, "last_seen_timestamp": datetime.now().timestamp()}
-            )]
+            hnsw_config=self.hnsw_config,
+            quantization_config=self.quantization_config,
+            optimizers_config=self.optimizers_config,
+            vectors_config={"": models.VectorParamsDiff(on_disk=self.on_disk)} if self.on_disk is not None else None,
+            collection_params=(
+                models.CollectionParamsDiff(on_disk_payload=self.on_disk_payload)
+                if self.on_disk_payload is not None else None
+            )
+        )
+
+    def _search_params(self, hnsw_ef: int = None, rescore: bool = None) -> t.Optional[models.SearchParams]:
+        params = dict(self.search_defaults)
+        if hnsw_ef is not None:
+            params["hnsw_ef"] = hnsw_ef
+        if rescore is not None:
+            params["rescore"] = rescore
+        if not params:
+            return None
+        quantization = {k: params.pop(k) for k in ("rescore", "oversampling") if k in params}
+        return models.SearchParams(
+            **params,
+            quantization=models.QuantizationSearchParams(**quantization) if quantization else None
         )
-        return str(point_id)
 
-    def find_similar(self, vector: t.List[float], threshold: float, limit: int = 5) -> t.List[tuple[str, float]]:
+    def store_vector(self, vector: t.List[float], metadata: dict) -> str:
+        return self.store_vectors([vector], [metadata])[0]
+
+    def store_vectors(self, vectors: t.List[t.List[float]], metadatas: t.List[dict]) -> t.List[str]:
+        if not len(vectors):
+            return []
+        vectors = _as_lists(vectors)
+        now = datetime.now()
+        points = []
+        with self._count_lock:
+            for vector, metadata in zip(vectors, metadatas):
+                group_id = str(uuid.uuid4())
+                # The first occurrence is counted at the event time, which is
+                # in the past for late and backfilled events
+                first_seen = first_seen_timestamp(metadata, now.timestamp())
+                first_occurrence = OccurrenceDelta()
+                first_occurrence.add(datetime.fromtimestamp(first_seen))
+                histogram = self._updated_histogram(group_id, first_occurrence, now)
+                points.append(PointStruct(
+                    id=group_id,
+                    vector=vector,
+                    payload={
+                        **metadata,
+                        "count": 1,
+                        "last_seen_timestamp": first_seen,
+                        self._histogram_key: histogram.buckets,
+                        **_rank_fields(histogram, now.timestamp())
+                    }
+                ))
+                self._histograms[group_id] = histogram
+                self._last_seen[group_id] = first_seen
+            self.client.upsert(collection_name=self.collection, points=points)
+        return [point.id for point in points]
+
+    def _updated_histogram(self, group_id: str, delta: OccurrenceDelta, now: datetime) -> OccurrenceHistogram:
+        current = self._histograms.get(group_id)
+        histogram = OccurrenceHistogram(current.buckets if current else None, self.histogram_retention)
+        histogram.add(delta.minutes)
+        histogram.prune(now.timestamp())
+        return histogram
+
+    def find_similar(self, vector: t.List[float], threshold: float, limit: int = 5, hnsw_ef: int = None,
+                     rescore: bool = None, where: t.Dict[str, t.Any] = None) -> t.List[tuple[str, float]]:
         results = self.client.search(
             collection_name=self.collection,
             query_vector=vector,
+            query_filter=_match_filter(where),
             limit=limit,
-            score_threshold=threshold
+            score_threshold=threshold,
+            search_params=self._search_params(hnsw_ef, rescore)
         )
         return [(str(hit.id), hit.score) for hit in results]
 
-    def increment_occurrence(self, group_id: str, timestamp: datetime):
-        self.client.set_payload(
+    def find_similar_batch(self, vectors: t.List[t.List[float]], threshold: float, limit: int = 5,
+                           hnsw_ef: int = None, rescore: bool = None,
+                           where: t.Dict[str, t.Any] = None) -> t.List[t.List[tuple[str, float]]]:
+        if not len(vectors):
+            return []
+        vectors = _as_lists(vectors)
+        search_params = self._search_params(hnsw_ef, rescore)
+        query_filter = _match_filter(where)
+        results = self.client.search_batch(
             collection_name=self.collection,
-            payload={
-                "count": self.client.retrieve(
-                    collection_name=self.collection,
-                    ids=[int(group_id)]
-                )[0].payload["count"] + 1,
-                "last_seen_timestamp": timestamp.timestamp()
-            },
-            points=[int(group_id)]
+            requests=[
+                models.SearchRequest(vector=vector, filter=query_filter, limit=limit, score_threshold=threshold,
+                                     with_payload=False, params=search_params)
+                for vector in vectors
+            ]
         )
+        return [[(str(hit.id), hit.score) for hit in hits] for hits in results]
+
+    def find_group_by_fingerprint(self, fingerprint: str) -> t.Optional[str]:
+        # Groups also answer for the fingerprints of the groups merged into them
+        return self._find_one(models.Filter(should=[
+            models.FieldCondition(key=field, match=models.MatchValue(value=fingerprint))
+            for field in ("stack_fingerprint", "merged_fingerprints")
+        ]))
+
+    def resolve_group(self, group_id: str) -> t.Optional[str]:
+        if self.client.retrieve(collection_name=self.collection, ids=[_point_id(group_id)], with_payload=False):
+            return group_id
+        return self._find_one(_match_filter({"merged_ids": group_id}))
+
+    def _find_one(self, scroll_filter: models.Filter) -> t.Optional[str]:
+        points, _ = self.client.scroll(
+            collection_name=self.collection,
+            scroll_filter=scroll_filter,
+            limit=1,
+            with_payload=False,
+            with_vectors=False
+        )
+        return str(points[0].id) if points else None
+
+    def merge_groups(self, group_id: str, merged_ids: t.List[str]):
+        merged_ids = [m for m in merged_ids if m != group_id]
+        with self._count_lock:
+            points = self.client.retrieve(
+                collection_name=self.collection, ids=[_point_id(g) for g in [group_id] + merged_ids]
+            )
+            by_id = {str(point.id): point for point in points}
+            survivor = by_id.get(group_id)
+            merged = [by_id[m] for m in merged_ids if m in by_id]
+            if survivor is None or not merged:
+                return
+            # The merged occurrences are added to this writer's shards of the
+            # survivor, so shards of other writers are left untouched
+            own = OccurrenceHistogram(survivor.payload.get(self._histogram_key), self.histogram_retention)
+            histogram = OccurrenceHistogram(
+                OccurrenceHistogram.combine([own] + [h for p in merged for h in _histograms(p.payload)]).buckets,
+                self.histogram_retention
+            )
+            shard_count = survivor.payload.get(self._shard_key, 0) + sum(_total_count(p.payload) for p in merged)
+            metadata = merged_metadata(_metadata(survivor.payload), [(str(p.id), _metadata(p.payload)) for p in merged])
+            payload = {
+                "merged_ids": metadata["merged_ids"],
+                self._shard_key: shard_count,
+                self._histogram_key: histogram.buckets,
+                **_rank_fields(histogram, datetime.now().timestamp()),
+                "last_seen_timestamp": max(p.payload.get("last_seen_timestamp", 0.0) for p in [survivor] + merged)
+            }
+            if "merged_fingerprints" in metadata:
+                payload["merged_fingerprints"] = metadata["merged_fingerprints"]
+            self.client.set_payload(collection_name=self.collection, payload=payload, points=[survivor.id])
+            self.client.delete(collection_name=self.collection,
+                               points_selector=models.PointIdsList(points=[p.id for p in merged]))
+            self._shard_counts[group_id] = shard_count
+            self._histograms[group_id] = histogram
+            self._last_seen[group_id] = payload["last_seen_timestamp"]
+            for point in merged:
+                self._forget(str(point.id))
+
+    def delete_groups(self, group_ids: t.List[str]) -> t.List[str]:
+        if not group_ids:
+            return []
+        existing = [str(point.id) for point in self.client.retrieve(
+            collection_name=self.collection, ids=[_point_id(g) for g in group_ids], with_payload=False
+        )]
+        if existing:
+            self.client.delete(collection_name=self.collection,
+                               points_selector=models.PointIdsList(points=[_point_id(g) for g in existing]))
+        with self._count_lock:
+            for group_id in existing:
+                self._forget(group_id)
+        return existing
+
+    def evict_groups(self, last_seen_before: datetime) -> t.List[str]:
+        stale = models.Filter(must=[models.FieldCondition(
+            key="last_seen_timestamp", range=models.Range(lt=last_seen_before.timestamp())
+        )])
+        evicted = [str(point.id) for point in self._scroll(stale, with_payload=False)]
+        for start in range(0, len(evicted), 1024):
+            self.delete_groups(evicted[start:start + 1024])
+        return evicted
+
+    def _forget(self, group_id: str):
+        self._shard_counts.pop(group_id, None)
+        self._histograms.pop(group_id, None)
+        self._last_seen.pop(group_id, None)
+
+    def increment_occurrence(self, group_id: str, timestamp: datetime):
+        delta = OccurrenceDelta()
+        delta.add(timestamp)
+        self.increment_occurrences({group_id: delta})
+
+    def increment_occurrences(self, occurrences: t.Dict[str, OccurrenceDelta]):
+        # Each storage instance only ever writes its own count and histogram
+        # shards, so the write cannot lose updates of other workers. The shards
+        # and the shared last_seen_timestamp are read the first time this
+        # process touches a group: the shards may hold counts from before a
+        # restart, and last_seen is only written when a delta is newer, so late
+        # and backfilled occurrences do not set it back.
+        now = datetime.now()
+        with self._count_lock:
+            try:
+                self._apply_occurrences(occurrences, now)
+            except Exception:
+                # Qdrant rejects updates of points that no longer exist, so a group
+                # that another process deleted since it was cached here would
+                # block every later write; forget such groups and write the rest
+                existing = {str(point.id) for point in self.client.retrieve(
+                    collection_name=self.collection, ids=[_point_id(g) for g in occurrences], with_payload=False
+                )}
+                missing = [group_id for group_id in occurrences if group_id not in existing]
+                if not missing:
+                    raise
+                for group_id in missing:
+                    self._forget(group_id)
+                self._apply_occurrences(occurrences, now)
+
+    def _apply_occurrences(self, occurrences: t.Dict[str, OccurrenceDelta], now: datetime):
+        unknown = [group_id for group_id in occurrences if group_id not in self._last_seen]
+        missing = set(unknown) - self._load_shards(unknown) if unknown else set()
+        if missing:
+            occurrences = self._resolve_missing(occurrences, missing)
+            survivors = [group_id for group_id in occurrences if group_id not in self._last_seen]
+            if survivors:
+                self._load_shards(survivors)
+        shard_counts = {}
+        histograms = {}
+        last_seen = {}
+        operations = []
+        for group_id, delta in occurrences.items():
+            shard_counts[group_id] = self._shard_counts.get(group_id, 0) + delta.count
+            histograms[group_id] = self._updated_histogram(group_id, delta, now)
+            payload = {
+                self._shard_key: shard_counts[group_id],
+                self._histogram_key: histograms[group_id].buckets,
+                **_rank_fields(histograms[group_id], now.timestamp())
+            }
+            if delta.last_seen.timestamp() > self._last_seen.get(group_id, 0.0):
+                payload["last_seen_timestamp"] = last_seen[group_id] = delta.last_seen.timestamp()
+            operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload=payload,
+                points=[_point_id(group_id)]
+            )))
+        if operations:
+            self.client.batch_update_points(collection_name=self.collection, update_operations=operations)
+        self._shard_counts.update(shard_counts)
+        self._histograms.update(histograms)
+        self._last_seen.update(last_seen)
+
+    def _resolve_missing(self, occurrences: t.Dict[str, OccurrenceDelta],
+                         missing: t.Set[str]) -> t.Dict[str, OccurrenceDelta]:
+        """Occurrences of groups that no longer exist go to the group they were
+        merged into, or are dropped if they were deleted."""
+        resolved = {group_id: delta for group_id, delta in occurrences.items() if group_id not in missing}
+        for group_id in missing:
+            target = self.resolve_group(group_id)
+            if target is None:
+                logger.warning("Dropping %d occurrences of deleted group %s", occurrences[group_id].count, group_id)
+                continue
+            # New deltas, since the caller may retry with the ones it passed
+            delta = OccurrenceDelta()
+            delta.merge(occurrences[group_id])
+            if target in resolved:
+                delta.merge(resolved[target])
+            resolved[target] = delta
+        return resolved
+
+    def _load_shards(self, group_ids: t.List[str]) -> t.Set[str]:
+        """Read this writer's shards of ``group_ids``; returns the ids that exist."""
+        points = self.client.retrieve(
+            collection_name=self.collection, ids=[_point_id(g) for g in group_ids],
+            with_payload=[self._shard_key, self._histogram_key, "last_seen_timestamp"]
+        )
+        for point in points:
+            group_id = str(point.id)
+            self._shard_counts[group_id] = point.payload.get(self._shard_key, 0)
+            if self._histogram_key in point.payload:
+                self._histograms[group_id] = OccurrenceHistogram(point.payload[self._histogram_key],
+                                                                 self.histogram_retention)
+            self._last_seen[group_id] = point.payload.get("last_seen_timestamp", 0.0)
+        return {str(point.id) for point in points}
+
+    def close(self):
+        self.client.close()
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
 
     def get_top_exceptions(self, limit: int, time_range: timedelta) -> List[Dict[str, Any]]:
         current_time = datetime.now()
         start_time = current_time - time_range
-        results, offset = self.client.scroll(
-            collection_name=self.collection,
-            scroll_filter=models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="last_seen_timestamp",
-                        range=models.Range(
-                            gte=start_time.timestamp(),
-                            lte=current_time.timestamp()
-                        )
+        window_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="last_seen_timestamp",
+                    range=models.Range(
+                        gte=start_time.timestamp(),
+                        lte=current_time.timestamp()
                     )
-                ]
-            ),
-            limit=limit,
+                )
+            ]
+        )
+        resolution = OccurrenceHistogram.resolution_for(
+            start_time.timestamp(), current_time.timestamp(), self.histogram_retention
+        )
+
+        # Counts are spread over writer shards, so the server only pre-ranks
+        # candidates by one writer's recent count and they are summed and ranked
+        # here. Groups without rank fields (not written since an upgrade) are
+        # always candidates; without histograms they fall back to their
+        # lifetime count.
+        rank_field = DAY_COUNT_FIELD if time_range <= timedelta(days=1) else RETAINED_COUNT_FIELD
+        candidates, _ = self.client.scroll(
+            collection_name=self.collection,
+            scroll_filter=window_filter,
+            order_by=models.OrderBy(key=rank_field, direction=models.Direction.DESC),
+            limit=limit * self.top_oversampling,
             with_payload=True,
-            with_vectors=False,
-            order_by=models.OrderBy(
-                key="count",
-                direction=models.Direction.DESC
-            )
+            with_vectors=False
+        )
+        unranked = self._scroll(models.Filter(must=window_filter.must + [
+            models.IsEmptyCondition(is_empty=models.PayloadField(key=rank_field))
+        ]))
+        counted = (
+            (self._window_count(point.payload, start_time.timestamp(), resolution), point)
+            for point in itertools.chain(candidates, unranked)
         )
+        top = heapq.nlargest(limit, counted, key=lambda item: item[0])
 
         return [
             {
                 "group_id": str(point.id),
-                "count": point.payload["count"],
-                "metadata": {k: v for k, v in point.payload.items() if k not in ["count", "last_seen_timestamp"]}
+                "count": count,
+                "total_count": _total_count(point.payload),
+                "metadata": _metadata(point.payload)
             }
-            for point in results
+            for count, point in top
         ]
 
+    def get_occurrence_histogram(self, group_id: str, time_range: timedelta,
+                                 resolution: str = None) -> List[tuple[datetime, int]]:
+        current_time = datetime.now()
+        start = (current_time - time_range).timestamp()
+        if resolution is None:
+            resolution = OccurrenceHistogram.resolution_for(start, current_time.timestamp(), self.histogram_retention)
+        elif resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {list(RESOLUTIONS)}, got {resolution!r}")
+
+        points = self.client.retrieve(collection_name=self.collection, ids=[_point_id(group_id)])
+        if not points:
+            return []
+        histogram = OccurrenceHistogram.combine(_histograms(points[0].payload))
+        return [(datetime.fromtimestamp(bucket), count) for bucket, count in histogram.series(start, resolution)]
+
+    def scan_groups(self, batch_size: int = 1024) -> t.Iterator[t.Tuple[np.ndarray, t.List[dict]]]:
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                yield np.asarray([point.vector for point in points], dtype=np.float32), [
+                    {
+                        "group_id": str(point.id),
+                        "metadata": _metadata(point.payload),
+                        "count": _total_count(point.payload),
+                        "last_seen": point.payload.get("last_seen_timestamp", 0.0),
+                        "histogram": OccurrenceHistogram.combine(_histograms(point.payload)).buckets
+                    }
+                    for point in points
+                ]
+            if offset is None:
+                return
+
+    def restore_groups(self, vectors: np.ndarray, records: t.List[dict]):
+        if not records:
+            return
+        # The restored point carries its whole count and histogram in this
+        # writer's fields, replacing the shards of any point with the same id
+        with self._count_lock:
+            points = []
+            for vector, record in zip(_as_lists(vectors), records):
+                histogram = OccurrenceHistogram(record["histogram"], self.histogram_retention)
+                points.append(PointStruct(
+                    id=_point_id(record["group_id"]),
+                    vector=vector,
+                    payload={
+                        **record["metadata"],
+                        "count": record["count"],
+                        "last_seen_timestamp": record["last_seen"],
+                        self._histogram_key: histogram.buckets,
+                        **_rank_fields(histogram, datetime.now().timestamp())
+                    }
+                ))
+                self._shard_counts[record["group_id"]] = 0
+                self._histograms[record["group_id"]] = histogram
+                self._last_seen[record["group_id"]] = record["last_seen"]
+            self.client.upsert(collection_name=self.collection, points=points)
+
+    @staticmethod
+    def _window_count(payload: dict, start: float, resolution: str) -> int:
+        histograms = _histograms(payload)
+        if not histograms:
+            return _total_count(payload)
+        return sum(histogram.count_since(start, resolution) for histogram in histograms)
+
+    def _scroll(self, scroll_filter: models.Filter = None, batch_size: int = 256,
+                with_payload: bool = True) -> t.Iterator[models.Record]:
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=False
+            )
+            yield from points
+            if offset is None:
+                return
+
+def _claim_writer_slot() -> t.Tuple[str, t.IO]:
+    # Slots are lock files shared by all storages on the host; a slot is free
+    # again once the process holding it exits
+    host = socket.gethostname() or "localhost"
+    slot = 0
+    while True:
+        lock = try_lock(os.path.join(tempfile.gettempdir(), f"openexcept-writer-{slot}.lock"))
+        if lock is not None:
+            return f"{host}-{slot}", lock
+        slot += 1
+
+def _quantization_config(config: t.Optional[dict]):
+    # {"scalar": {"type": "int8", "quantile": 0.99, "always_ram": true}}, {"binary": {...}} or {"product": {...}}
+    if not config:
+        return None
+    if "scalar" in config:
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(**{"type": "int8", **config["scalar"]}))
+    if "binary" in config:
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(**config["binary"]))
+    if "product" in config:
+        return models.ProductQuantization(product=models.ProductQuantizationConfig(**config["product"]))
+    raise ValueError(f"quantization must configure one of scalar, binary or product, got {list(config)}")
+
+def _as_lists(vectors: t.Union[np.ndarray, t.List[t.List[float]]]) -> t.List[t.List[float]]:
+    # The grouper passes float32 matrices; the REST and gRPC models want lists
+    return vectors.tolist() if isinstance(vectors, np.ndarray) else vectors
+
+def _match_filter(where: t.Optional[t.Dict[str, t.Any]]) -> t.Optional[models.Filter]:
+    if not where:
+        return None
+    return models.Filter(must=[
+        models.FieldCondition(key=field, match=models.MatchValue(value=value)) for field, value in where.items()
+    ])
+
+def _point_id(group_id: str) -> t.Union[int, str]:
+    # Groups created before UUID ids were introduced have integer ids
+    return int(group_id) if group_id.isdigit() else group_id
+
+def _rank_fields(histogram: OccurrenceHistogram, now: float) -> Dict[str, int]:
+    return {
+        DAY_COUNT_FIELD: histogram.count_since(now - RESOLUTIONS["day"], "hour"),
+        RETAINED_COUNT_FIELD: sum(histogram.buckets["day"].values())
+    }
+
+def _total_count(payload: dict) -> int:
+    return payload.get("count", 0) + sum(v for k, v in payload.items() if k.startswith(COUNT_SHARD_PREFIX))
+
+def _histograms(payload: dict) -> List[OccurrenceHistogram]:
+    return [OccurrenceHistogram(v) for k, v in payload.items() if k.startswith(HISTOGRAM_SHARD_PREFIX)]
+
+def _metadata(payload: dict) -> dict:
+    return {
+        k: v for k, v in payload.items()
+        if k not in ["count", "last_seen_timestamp", DAY_COUNT_FIELD, RETAINED_COUNT_FIELD]
+        and not k.startswith((COUNT_SHARD_PREFIX, HISTOGRAM_SHARD_PREFIX))
+    }
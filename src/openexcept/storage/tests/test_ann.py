@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from openexcept.storage.ann import IVFIndex, VectorIndex, create_index
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+from openexcept.scripts.ann_benchmark import synthetic_vectors
+
+@pytest.fixture(scope="module")
+def vectors():
+    return synthetic_vectors(3000, 32, clusters=50, spread=0.1)
+
+def test_ivf_searches_exhaustively_until_trained(vectors):
+    index = IVFIndex(32, min_train_size=1000)
+    index.add(vectors[:999], 0)
+    assert index.search(vectors[:1], 5) is None
+
+    index.add(vectors[:1000], 999)
+    candidates = index.search(vectors[:2], 5)
+    assert len(candidates) == 2
+    assert 0 in candidates[0] and 1 in candidates[1]
+
+def test_ivf_assigns_rows_added_after_training(vectors):
+    index = IVFIndex(32, nlist=20, nprobe=2, min_train_size=1000)
+    index.add(vectors[:1000], 0)
+    index.add(vectors[:1500], 1000)
+
+    assert sum(len(rows) for rows in index._lists) == 1500
+    assert 1200 in index.search(vectors[1200:1201], 5)[0]
+
+def test_storage_with_ivf_matches_exact_search(vectors):
+    exact = NumpyVectorStorage(size=32)
+    approximate = NumpyVectorStorage(size=32, index={"type": "ivf", "nprobe": 8, "min_train_size": 500})
+    exact_ids = exact.store_vectors(vectors[:2500], [{}] * 2500)
+    approximate_ids = approximate.store_vectors(vectors[:2500], [{}] * 2500)
+    rows = [{group_id: row for row, group_id in enumerate(ids)} for ids in (exact_ids, approximate_ids)]
+
+    for query in vectors[2500:2600]:
+        expected = [(rows[0][g], round(score, 5)) for g, score in exact.find_similar(query, 0.9)]
+        found = [(rows[1][g], round(score, 5)) for g, score in approximate.find_similar(query, 0.9)]
+        assert found == expected
+
+def test_create_index_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        create_index(32, type="lsh")
+
+def test_incomplete_index_fails_on_creation():
+    class AddOnlyIndex(VectorIndex):
+        def add(self, vectors, start):
+            pass
+
+    with pytest.raises(TypeError):
+        AddOnlyIndex()
+
+def test_hnsw_index(vectors):
+    pytest.importorskip("hnswlib")
+    index = create_index(32, type="hnsw", ef=32)
+    index.add(vectors[:100], 0)
+    index.add(vectors[:200], 100)
+
+    assert index.search(vectors[150:151], 1)[0].tolist() == [150]
@@ -0,0 +1,84 @@
+import io
+import pytest
+from datetime import datetime, timedelta
+from openexcept.embeddings.hashed_ngram import HashedNgramEmbedding
+from openexcept.histogram import OccurrenceDelta
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+from openexcept.storage.qdrant import QdrantVectorStorage
+
+def filled_storage(storage, groups=5):
+    embedding = HashedNgramEmbedding(dim=storage.vector_size)
+    texts = [f"Connection to host-{i} refused" for i in range(groups)]
+    ids = storage.store_vectors(embedding.transform(texts),
+                                [{"type": "ConnectionError", "example_message": text} for text in texts])
+    delta = OccurrenceDelta()
+    delta.add(datetime.now(), 3)
+    storage.increment_occurrences({ids[0]: delta})
+    return ids
+
+def exported(storage, batch_size=2):
+    f = io.BytesIO()
+    storage.export_groups(f, batch_size)
+    f.seek(0)
+    return f
+
+def test_export_and_import_keep_groups(tmp_path):
+    source = NumpyVectorStorage(size=64)
+    ids = filled_storage(source)
+    target = NumpyVectorStorage(size=64, path=str(tmp_path))
+
+    assert target.import_groups(exported(source)) == 5
+    target.close()
+    target = NumpyVectorStorage(size=64, path=str(tmp_path))
+
+    top = target.get_top_exceptions(10, timedelta(hours=1))
+    assert [g["group_id"] for g in top][0] == ids[0]
+    assert {g["group_id"]: g["count"] for g in top} == {g["group_id"]: g["count"] for g in
+                                                         source.get_top_exceptions(10, timedelta(hours=1))}
+    query = HashedNgramEmbedding(dim=64).transform(["Connection to host-3 refused"])[0]
+    assert target.find_similar(query, 0.99)[0][0] == ids[3]
+
+def test_import_replaces_groups_with_the_same_id():
+    source = NumpyVectorStorage(size=64)
+    filled_storage(source, groups=2)
+    target = NumpyVectorStorage(size=64)
+
+    target.import_groups(exported(source))
+    target.import_groups(exported(source))
+
+    assert len(target) == 2
+    assert sorted(g["count"] for g in target.get_top_exceptions(10, timedelta(hours=1))) == [1, 4]
+
+def test_move_between_qdrant_and_numpy(tmp_path):
+    qdrant = QdrantVectorStorage(path=str(tmp_path / "source"), size=64)
+    ids = filled_storage(qdrant)
+    numpy_storage = NumpyVectorStorage(size=64)
+    numpy_storage.import_groups(exported(qdrant))
+
+    back = QdrantVectorStorage(path=str(tmp_path / "copy"), size=64)
+    back.import_groups(exported(numpy_storage))
+
+    top = back.get_top_exceptions(10, timedelta(hours=1))
+    assert sorted(g["group_id"] for g in top) == sorted(ids)
+    assert max(g["count"] for g in top) == 4
+
+def test_import_reembeds_into_another_dimension():
+    source = NumpyVectorStorage(size=64)
+    ids = filled_storage(source)
+    target = NumpyVectorStorage(size=128)
+    embedding = HashedNgramEmbedding(dim=128)
+
+    with pytest.raises(ValueError):
+        target.import_groups(exported(source))
+    target.import_groups(exported(source), embedding=embedding)
+
+    query = embedding.transform(["ConnectionError: Connection to host-2 refused"])[0]
+    assert target.find_similar(query, 0.99)[0][0] == ids[2]
+
+def test_truncated_export_is_rejected():
+    source = NumpyVectorStorage(size=64)
+    filled_storage(source)
+    data = exported(source).getvalue()
+
+    with pytest.raises(ValueError):
+        NumpyVectorStorage(size=64).import_groups(io.BytesIO(data[:-20]))
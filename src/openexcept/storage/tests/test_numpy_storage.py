@@ -0,0 +1,117 @@
+import pytest
+from datetime import datetime, timedelta
+from openexcept.storage.locking import StorageInUseError
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+from openexcept.histogram import OccurrenceDelta
+
+@pytest.fixture(scope="function")
+def numpy_storage():
+    return NumpyVectorStorage(size=384)
+
+def occurrences(count, timestamp=None):
+    delta = OccurrenceDelta()
+    delta.add(timestamp or datetime.now(), count)
+    return delta
+
+def test_store_and_find_similar(numpy_storage):
+    vector1 = [0.1, 0.2, 0.3] * 128
+    vector2 = [0.2, 0.3, 0.4] * 128
+    vector3 = [0.3, 0.4, 0.5] * 128
+
+    id1 = numpy_storage.store_vector(vector1, {"error": "Error 1"})
+    numpy_storage.store_vector(vector2, {"error": "Error 2"})
+    numpy_storage.store_vector(vector3, {"error": "Error 3"})
+
+    similar = numpy_storage.find_similar(vector1, 0.8)
+
+    assert len(similar) == 3
+    assert similar[0] == (id1, pytest.approx(1.0))
+
+def test_find_similar_with_threshold_and_limit(numpy_storage):
+    vector1 = [0.1, 0.2, 0.3] * 128
+    vector2 = [0.2, 0.3, 0.4, 0.2, 0.3, 0.7] * 64
+    vector3 = [0.1] * 384
+    # Similarity between vector1 and vector2 is 0.9707253433941512
+    # Similarity between vector1 and vector3 is 0.9258200997725515
+    id1, id2, id3 = numpy_storage.store_vectors([vector1, vector2, vector3], [{}, {}, {}])
+
+    assert [g for g, _ in numpy_storage.find_similar(vector1, 0.98)] == [id1]
+    assert [g for g, _ in numpy_storage.find_similar(vector1, 0.95)] == [id1, id2]
+    assert [g for g, _ in numpy_storage.find_similar(vector1, 0.5, limit=2)] == [id1, id2]
+    assert [[g for g, _ in hits] for hits in numpy_storage.find_similar_batch([vector3, vector2], 0.99)] == [[id3], [id2]]
+
+def test_find_similar_empty(numpy_storage):
+    assert numpy_storage.find_similar([0.1] * 384, 0.5) == []
+
+def test_find_similar_where(numpy_storage):
+    vector = [0.1, 0.2, 0.3] * 128
+    connection = numpy_storage.store_vector(vector, {"type": "ConnectionError", "context": {"service": "api"}})
+    timeout = numpy_storage.store_vector(vector, {"type": "TimeoutError", "context": {"service": "api"}})
+    later = numpy_storage.store_vector(vector, {"type": "ConnectionError", "context": {"service": "worker"}})
+
+    assert [g for g, _ in numpy_storage.find_similar(vector, 0.9, where={"type": "TimeoutError"})] == [timeout]
+    assert [g for g, _ in numpy_storage.find_similar(vector, 0.9, where={"type": "ConnectionError"})] == [
+        connection, later
+    ]
+    assert numpy_storage.find_similar_batch(
+        [vector], 0.9, where={"type": "ConnectionError", "context.service": "worker"}
+    )[0][0][0] == later
+    assert numpy_storage.find_similar(vector, 0.9, where={"type": "KeyError"}) == []
+
+def test_get_top_exceptions(numpy_storage):
+    id1 = numpy_storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Frequent Error"})
+    id2 = numpy_storage.store_vector([0.2, 0.3, 0.4] * 128, {"error": "Less Frequent Error"})
+    id3 = numpy_storage.store_vector([0.3, 0.4, 0.5] * 128, {"error": "Old Error"})
+
+    for _ in range(5):
+        numpy_storage.increment_occurrence(id1, datetime.now())
+    numpy_storage.increment_occurrences({id2: occurrences(3), id3: occurrences(50, datetime.now() - timedelta(days=10))})
+
+    top = numpy_storage.get_top_exceptions(3, timedelta(days=1))
+
+    assert [(r["group_id"], r["count"]) for r in top] == [(id1, 6), (id2, 4), (id3, 1)]
+    assert top[0]["metadata"] == {"error": "Frequent Error"}
+    assert top[2]["total_count"] == 51
+
+def test_new_group_counted_at_its_first_seen_time(numpy_storage):
+    old = (datetime.now() - timedelta(days=20)).isoformat()
+    old_id, new_id = numpy_storage.store_vectors(
+        [[0.1, 0.2, 0.3] * 128, [0.3, 0.2, 0.1] * 128], [{"first_seen": old}, {"first_seen": datetime.now().isoformat()}]
+    )
+
+    assert [r["group_id"] for r in numpy_storage.get_top_exceptions(10, timedelta(days=1))] == [new_id]
+    assert {r["group_id"] for r in numpy_storage.get_top_exceptions(10, timedelta(days=30))} == {old_id, new_id}
+    assert numpy_storage.evict_groups(datetime.now() - timedelta(days=7)) == [old_id]
+
+def test_persistence_across_restarts(tmp_path):
+    storage = NumpyVectorStorage(size=384, path=str(tmp_path), checkpoint_every=3)
+    group_ids = [storage.store_vector([0.1 * (i + 1), 0.2, 0.3] * 128, {"error": f"Error {i}"}) for i in range(5)]
+    storage.increment_occurrence(group_ids[0], datetime.now())
+    # No close(), as if the process died: the reopened store has to replay the
+    # log on top of the last snapshot. The lock dies with the process.
+    storage._lock_file.close()
+    reopened = NumpyVectorStorage(size=384, path=str(tmp_path))
+
+    assert len(reopened) == 5
+    assert reopened.find_similar([0.3, 0.2, 0.3] * 128, 0.9999)[0][0] == group_ids[2]
+    top = reopened.get_top_exceptions(1, timedelta(days=1))
+    assert (top[0]["group_id"], top[0]["count"]) == (group_ids[0], 2)
+
+    reopened.close()
+    assert len(NumpyVectorStorage(size=384, path=str(tmp_path))) == 5
+
+def test_persisted_store_is_locked_to_one_user(tmp_path):
+    storage = NumpyVectorStorage(size=384, path=str(tmp_path))
+
+    with pytest.raises(StorageInUseError):
+        NumpyVectorStorage(size=384, path=str(tmp_path))
+    storage.close()
+    NumpyVectorStorage(size=384, path=str(tmp_path)).close()
+
+def test_persistence_rejects_other_vector_size(tmp_path):
+    storage = NumpyVectorStorage(size=384, path=str(tmp_path))
+    storage.store_vector([0.1] * 384, {})
+    storage.close()
+
+    with pytest.raises(ValueError):
+        NumpyVectorStorage(size=768, path=str(tmp_path))
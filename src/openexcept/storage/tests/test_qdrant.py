@@ -2,8 +2,12 @@ import pytest
 import tempfile
 import shutil
 from datetime import datetime, timedelta
+from openexcept.aggregator import OccurrenceAggregator
 from openexcept.storage.qdrant import QdrantVectorStorage
+from openexcept.histogram import OccurrenceDelta
+from qdrant_client.http.models import PointStruct
 import time
+import uuid
 
 @pytest.fixture(scope="function")
 def temp_dir():
@@ -16,6 +20,11 @@ def qdrant_storage(temp_dir):
     storage = QdrantVectorStorage(path=temp_dir)
     yield storage
 
+def occurrences(count, timestamp=None):
+    delta = OccurrenceDelta()
+    delta.add(timestamp or datetime.now(), count)
+    return delta
+
 def test_store_and_find_similar(qdrant_storage):
     # Store some vectors
     vector1 = [0.1, 0.2, 0.3] * 128  # 384-dimensional vector
@@ -103,3 +112,237 @@ def test_find_similar_with_threshold(qdrant_storage):
     assert len(similar) == 2  # The first two vectors should be returned
     assert similar[0][1] > 0.99  # The first match should be very similar
     assert 0.95 < similar[1][1] < 0.98  # The second match should be somewhat similar
+
+def test_store_vectors_and_find_similar_batch(qdrant_storage):
+    vector1 = [0.1, 0.2, 0.3] * 128
+    vector2 = [0.3, 0.1, 0.0] * 128
+
+    id1, id2 = qdrant_storage.store_vectors([vector1, vector2], [{"error": "Error 1"}, {"error": "Error 2"}])
+
+    assert id1 != id2
+    results = qdrant_storage.find_similar_batch([vector1, vector2], 0.99)
+    assert [r[0][0] for r in results] == [id1, id2]
+    assert qdrant_storage.find_similar_batch([], 0.99) == []
+
+def test_store_vector_ids_are_unique_uuids(qdrant_storage):
+    ids = [qdrant_storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Error"}) for _ in range(3)]
+    ids += qdrant_storage.store_vectors([[0.3, 0.2, 0.1] * 128] * 2, [{"error": "Error"}] * 2)
+
+    assert len(set(ids)) == 5
+    assert all(uuid.UUID(group_id) for group_id in ids)
+
+def test_increment_occurrence_from_several_writers(qdrant_storage, tmp_path):
+    group_id = qdrant_storage.store_vector([0.5, 0.6, 0.7] * 128, {"error": "Test Error"})
+    # A second storage instance on the same collection, as in another worker process
+    other_writer = QdrantVectorStorage(path=str(tmp_path))
+    other_writer.client = qdrant_storage.client
+
+    for _ in range(3):
+        qdrant_storage.increment_occurrence(group_id, datetime.now())
+        other_writer.increment_occurrence(group_id, datetime.now())
+
+    results = qdrant_storage.get_top_exceptions(1, timedelta(days=1))
+    assert results[0]["count"] == 7
+    assert results[0]["metadata"] == {"error": "Test Error"}
+
+def test_increment_occurrences_in_bulk(qdrant_storage):
+    id1 = qdrant_storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Error 1"})
+    id2 = qdrant_storage.store_vector([0.3, 0.2, 0.1] * 128, {"error": "Error 2"})
+
+    qdrant_storage.increment_occurrences({id1: occurrences(4), id2: occurrences(2)})
+    qdrant_storage.increment_occurrences({id2: occurrences(5)})
+
+    counts = {r["group_id"]: r["count"] for r in qdrant_storage.get_top_exceptions(2, timedelta(days=1))}
+    assert counts == {id1: 5, id2: 8}
+
+def test_get_top_exceptions_counts_only_the_window(qdrant_storage):
+    old_id = qdrant_storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Old Error"})
+    new_id = qdrant_storage.store_vector([0.3, 0.2, 0.1] * 128, {"error": "New Error"})
+
+    qdrant_storage.increment_occurrences({old_id: occurrences(100, datetime.now() - timedelta(days=20))})
+    qdrant_storage.increment_occurrence(old_id, datetime.now())
+    qdrant_storage.increment_occurrences({new_id: occurrences(5)})
+
+    top = qdrant_storage.get_top_exceptions(2, timedelta(days=1))
+    assert [(r["group_id"], r["count"]) for r in top] == [(new_id, 6), (old_id, 2)]
+    assert top[1]["total_count"] == 102
+
+    top = qdrant_storage.get_top_exceptions(2, timedelta(days=30))
+    assert [(r["group_id"], r["count"]) for r in top] == [(old_id, 102), (new_id, 6)]
+
+def test_find_group_by_fingerprint(qdrant_storage):
+    group_id, _ = qdrant_storage.store_vectors(
+        [[0.1, 0.2, 0.3] * 128, [0.3, 0.2, 0.1] * 128],
+        [{"type": "ConnectionError", "stack_fingerprint": "abc"}, {"type": "ConnectionError"}]
+    )
+
+    assert qdrant_storage.find_group_by_fingerprint("abc") == group_id
+    assert qdrant_storage.find_group_by_fingerprint("def") is None
+
+def test_find_similar_where(qdrant_storage):
+    vector = [0.1, 0.2, 0.3] * 128
+    connection, timeout = qdrant_storage.store_vectors(
+        [vector, vector], [{"type": "ConnectionError"}, {"type": "TimeoutError", "context": {"service": "api"}}]
+    )
+
+    assert [g for g, _ in qdrant_storage.find_similar(vector, 0.9, where={"type": "ConnectionError"})] == [connection]
+    assert [g for g, _ in qdrant_storage.find_similar_batch(
+        [vector], 0.9, where={"context.service": "api"}
+    )[0]] == [timeout]
+    assert qdrant_storage.find_similar(vector, 0.9, where={"type": "KeyError"}) == []
+
+def test_get_occurrence_histogram(qdrant_storage):
+    group_id = qdrant_storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Error"})
+    qdrant_storage.increment_occurrences({group_id: occurrences(3, datetime.now() - timedelta(hours=2))})
+
+    series = qdrant_storage.get_occurrence_histogram(group_id, timedelta(days=1), resolution="hour")
+    assert [count for _, count in series] == [3, 1]
+    assert series[0][0] < series[1][0]
+
+def test_collection_settings_applied_on_creation(temp_dir):
+    storage = QdrantVectorStorage(
+        path=temp_dir,
+        hnsw={"m": 32, "ef_construct": 256},
+        quantization={"scalar": {"quantile": 0.99, "always_ram": True}},
+        on_disk=True,
+        search={"hnsw_ef": 128, "rescore": True, "oversampling": 2.0}
+    )
+    config = storage.client.get_collection(storage.collection).config
+
+    # Embedded Qdrant keeps on_disk but ignores HNSW and quantization settings
+    assert config.params.vectors.on_disk is True
+    assert storage.hnsw_config.m == 32
+    assert storage.quantization_config.scalar.type == "int8"
+
+    params = storage._search_params()
+    assert params.hnsw_ef == 128
+    assert (params.quantization.rescore, params.quantization.oversampling) == (True, 2.0)
+    assert storage._search_params(hnsw_ef=16, rescore=False).quantization.rescore is False
+
+    group_id = storage.store_vector([0.1] * 384, {})
+    assert storage.find_similar([0.1] * 384, 0.9, hnsw_ef=256, rescore=False)[0][0] == group_id
+    assert storage.find_similar_batch([[0.1] * 384], 0.9, hnsw_ef=256)[0][0][0] == group_id
+
+def test_migrate_existing_collection(temp_dir):
+    storage = QdrantVectorStorage(path=temp_dir)
+    group_id = storage.store_vector([0.1] * 384, {})
+    storage.client.close()
+
+    migrated = QdrantVectorStorage(path=temp_dir, hnsw={"m": 32}, on_disk=True, migrate=True)
+    assert migrated.find_similar([0.1] * 384, 0.9)[0][0] == group_id
+
+def test_invalid_quantization_config(temp_dir):
+    with pytest.raises(ValueError):
+        QdrantVectorStorage(path=temp_dir, quantization={"float16": {}})
+
+def test_merge_and_evict_groups(qdrant_storage):
+    vector1 = [0.1, 0.2, 0.3] * 128
+    vector2 = [0.3, 0.2, 0.1] * 128
+    id1, id2 = qdrant_storage.store_vectors([vector1, vector2], [{"type": "A"}, {"stack_fingerprint": "f2"}])
+    qdrant_storage.increment_occurrences({id2: occurrences(2)})
+
+    qdrant_storage.merge_groups(id1, [id2])
+
+    assert qdrant_storage.resolve_group(id2) == id1
+    assert qdrant_storage.find_group_by_fingerprint("f2") == id1
+    top = qdrant_storage.get_top_exceptions(10, timedelta(hours=1))
+    assert [(g["group_id"], g["count"]) for g in top] == [(id1, 4)]
+
+    assert qdrant_storage.evict_groups(datetime.now() + timedelta(minutes=1)) == [id1]
+    assert qdrant_storage.resolve_group(id1) is None
+
+def test_late_occurrences_do_not_move_last_seen_back(qdrant_storage, tmp_path):
+    group_id = qdrant_storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Error"})
+    # Another writer that has not touched the group yet, as after a restart
+    other_writer = QdrantVectorStorage(path=str(tmp_path))
+    other_writer.client = qdrant_storage.client
+
+    qdrant_storage.increment_occurrences({group_id: occurrences(1, datetime.now() - timedelta(days=20))})
+    other_writer.increment_occurrences({group_id: occurrences(2, datetime.now() - timedelta(days=10))})
+
+    top = qdrant_storage.get_top_exceptions(1, timedelta(days=1))
+    assert [(r["group_id"], r["count"], r["total_count"]) for r in top] == [(group_id, 1, 4)]
+    assert qdrant_storage.evict_groups(datetime.now() - timedelta(days=7)) == []
+
+def test_groups_deleted_by_another_process_do_not_block_writes(qdrant_storage, tmp_path):
+    deleted, merged, kept = qdrant_storage.store_vectors(
+        [[0.1, 0.2, 0.3] * 128, [0.3, 0.2, 0.1] * 128, [0.2, 0.1, 0.3] * 128], [{}, {}, {}]
+    )
+    aggregator = OccurrenceAggregator(qdrant_storage, flush_interval=60)
+    for group_id in (deleted, merged, kept):
+        aggregator.add(group_id, datetime.now())
+    aggregator.flush()
+
+    # Maintenance in another process deletes one group and merges another
+    other_writer = QdrantVectorStorage(path=str(tmp_path))
+    other_writer.client = qdrant_storage.client
+    other_writer.delete_groups([deleted])
+    other_writer.merge_groups(kept, [merged])
+    for group_id in (deleted, merged, kept):
+        aggregator.add(group_id, datetime.now(), 2)
+
+    # Like a Qdrant server, reject payload updates of missing points
+    client = qdrant_storage.client
+    batch_update_points = client.batch_update_points
+    def strict_batch_update_points(collection_name, update_operations):
+        ids = [point for operation in update_operations for point in operation.set_payload.points]
+        if len(client.retrieve(collection_name, ids=ids)) < len(ids):
+            raise RuntimeError("No point with id found")
+        return batch_update_points(collection_name=collection_name, update_operations=update_operations)
+    client.batch_update_points = strict_batch_update_points
+
+    aggregator.flush()
+    aggregator.close()
+
+    assert aggregator.stats()["pending"] == 0
+    top = qdrant_storage.get_top_exceptions(10, timedelta(hours=1))
+    assert [(r["group_id"], r["count"]) for r in top] == [(kept, 8)]
+
+def test_new_group_counted_at_its_first_seen_time(qdrant_storage):
+    old = (datetime.now() - timedelta(days=20)).isoformat()
+    old_id, new_id = qdrant_storage.store_vectors(
+        [[0.1, 0.2, 0.3] * 128, [0.3, 0.2, 0.1] * 128], [{"first_seen": old}, {"first_seen": datetime.now().isoformat()}]
+    )
+
+    assert [r["group_id"] for r in qdrant_storage.get_top_exceptions(10, timedelta(days=1))] == [new_id]
+    top = qdrant_storage.get_top_exceptions(10, timedelta(days=30))
+    assert {r["group_id"]: r["count"] for r in top} == {old_id: 1, new_id: 1}
+    series = qdrant_storage.get_occurrence_histogram(old_id, timedelta(days=30), resolution="day")
+    assert series[0][0] < datetime.now() - timedelta(days=19)
+
+def test_writers_on_one_host_get_distinct_ids(qdrant_storage, tmp_path):
+    other_writer = QdrantVectorStorage(path=str(tmp_path))
+
+    assert other_writer.writer_id != qdrant_storage.writer_id
+    assert QdrantVectorStorage(path=str(tmp_path / "other"), writer_id="api.host-1").writer_id == "api_host-1"
+
+def test_restarted_writer_continues_its_shards(temp_dir):
+    storage = QdrantVectorStorage(path=temp_dir, writer_id="worker-1")
+    group_id = storage.store_vector([0.1, 0.2, 0.3] * 128, {"error": "Error"})
+    storage.increment_occurrences({group_id: occurrences(2)})
+    storage.close()
+
+    restarted = QdrantVectorStorage(path=temp_dir, writer_id="worker-1")
+    restarted.increment_occurrences({group_id: occurrences(3)})
+
+    payload = restarted.client.retrieve(restarted.collection, ids=[group_id])[0].payload
+    assert [k for k in payload if k.startswith("count_")] == ["count_worker-1"]
+    assert [(r["count"], r["total_count"]) for r in restarted.get_top_exceptions(1, timedelta(hours=1))] == [(6, 6)]
+
+def test_get_top_exceptions_ranks_candidates_on_the_server(temp_dir):
+    storage = QdrantVectorStorage(path=temp_dir, top_oversampling=2)
+    ids = storage.store_vectors([[0.1 * (i + 1), 0.2, 0.3] * 128 for i in range(10)], [{} for _ in range(10)])
+    storage.increment_occurrences({group_id: occurrences(i) for i, group_id in enumerate(ids) if i})
+    storage.increment_occurrences({ids[2]: occurrences(40, datetime.now() - timedelta(days=5))})
+    # A group written by an older version, without histograms or rank fields
+    storage.client.upsert(storage.collection, points=[PointStruct(
+        id=str(uuid.uuid4()), vector=[0.5] * 384, payload={"count": 50, "last_seen_timestamp": datetime.now().timestamp()}
+    )])
+
+    top = storage.get_top_exceptions(3, timedelta(days=1))
+    assert [r["count"] for r in top] == [50, 10, 9]
+    assert [r["group_id"] for r in top[1:]] == [ids[9], ids[8]]
+    assert "day_count" not in top[1]["metadata"]
+
+    top = storage.get_top_exceptions(2, timedelta(days=30))
+    assert [(r["group_id"], r["count"]) for r in top[1:]] == [(ids[2], 43)]
@@ -1,48 +1,157 @@
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import json
+import typing as t
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, ValidationError
 from openexcept import OpenExcept
 from datetime import datetime
 import logging
 import asyncio
-from fastapi.responses import JSONResponse
+import time
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .batcher import MicroBatcher, QueueFullError
+from .middleware import GzipRequestMiddleware
 
 # Add this line to set up logging
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
-config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
+# Clients gzip large request bodies
+app.add_middleware(GzipRequestMiddleware)
+# The grouping service runs with config.yaml; API workers in front of it set
+# OPENEXCEPT_CONFIG to api_config.yaml and forward to it in remote mode
+config_path = os.environ.get('OPENEXCEPT_CONFIG') or os.path.join(os.path.dirname(__file__), 'config.yaml')
 grouper = OpenExcept(config_path=config_path)
 
+# Concurrent /process requests are grouped together in batches of up to
+# max_batch_size, waiting at most max_wait_ms for a batch to fill up
+batcher = MicroBatcher(
+    lambda exceptions: grouper.group_exceptions([exception.dict() for exception in exceptions]),
+    **grouper.config.get('server', {}).get('batching', {})
+)
+
+# Bulk ingestion through /process_batch is grouped in chunks of this many exceptions
+bulk_chunk_size = grouper.config.get('server', {}).get('bulk_chunk_size', 512)
+
+# Prometheus metrics (the metrics config section), served by /metrics
+metrics = grouper.metrics
+if metrics is not None:
+    metrics.register_stats("batcher", lambda: {"queue_depth": batcher.queue_depth})
+
+    @app.middleware("http")
+    async def time_requests(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Unknown paths share one label so that scans cannot create unbounded series
+        path = request.url.path if request.url.path in route_paths else "other"
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started,
+                        (("path", path), ("status", str(response.status_code))),
+                        help="Duration of HTTP requests")
+        return response
+
+@app.on_event("startup")
+async def start_batcher():
+    await batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+
+@app.on_event("shutdown")
+def stop_maintenance():
+    # Group maintenance (the maintenance config section) runs in the grouping service only
+    if getattr(grouper, 'maintenance', None) is not None:
+        grouper.maintenance.stop()
+
 class ExceptionInput(BaseModel):
     message: str
     type: str = "Unknown"
     timestamp: datetime = None
+    stack_trace: str = ""
     context: dict = {}
 
 class GroupResult(BaseModel):
     group_id: str
 
+class BatchGroupResult(BaseModel):
+    group_ids: t.List[str]
+
+async def _read_ndjson(request: Request) -> t.AsyncIterator[dict]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+async def _read_json_array(request: Request) -> t.AsyncIterator[dict]:
+    payload = await request.json()
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of exceptions")
+    for item in payload:
+        yield item
+
 @app.post("/process", response_model=GroupResult)
 async def process_exception(exception: ExceptionInput):
     try:
         # Add a timeout of 10 seconds
-        group_id = await asyncio.wait_for(
-            asyncio.to_thread(
-                grouper.group_exception,
-                message=exception.message,
-                type_name=exception.type,
-                timestamp=exception.timestamp or datetime.now(),
-                **exception.context
-            ),
-            timeout=10.0,
-        )
+        group_id = await asyncio.wait_for(batcher.submit(exception), timeout=10.0)
         return GroupResult(group_id=group_id)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Request timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/process_batch", response_model=BatchGroupResult)
+async def process_exception_batch(request: Request):
+    """Groups a JSON array or a streamed NDJSON body (``application/x-ndjson``)
+    of exceptions and returns their group ids in the same order.
+
+    The whole body is validated before anything is grouped, so an invalid
+    exception (422) leaves every group untouched. A chunk that fails to group
+    (500 or 504) answers with the ids of the exceptions grouped before it and
+    the index of the first exception that was not.
+    """
+    content_type = request.headers.get("content-type", "")
+    is_ndjson = "ndjson" in content_type or "jsonlines" in content_type
+    items = _read_ndjson(request) if is_ndjson else _read_json_array(request)
+
+    exceptions = []
+    try:
+        async for item in items:
+            exceptions.append(ExceptionInput(**item).dict())
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid exception at index {len(exceptions)}: {e}")
+
+    group_ids = []
+    for start in range(0, len(exceptions), bulk_chunk_size):
+        try:
+            group_ids += await _group_chunk(exceptions[start:start + bulk_chunk_size])
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code,
+                                detail={"error": e.detail, "group_ids": group_ids, "failed_index": start})
+    return BatchGroupResult(group_ids=group_ids)
+
+async def _group_chunk(chunk: t.List[dict]) -> t.List[str]:
+    try:
+        # Add a timeout of 30 seconds per chunk
+        return await asyncio.wait_for(asyncio.to_thread(grouper.group_exceptions, chunk), timeout=30.0)
     except asyncio.TimeoutError:
         raise HTTPException(status_code=504, detail="Request timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def get_metrics():
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set metrics.enabled in the config")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/top_exceptions")
 async def get_top_exceptions(limit: int = 10, days: int = 1):
     try:
@@ -62,3 +171,6 @@ async def get_top_exceptions(limit: int = 10, days: int = 1):
         logging.exception("An error occurred while fetching top exceptions")
         import traceback; traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+# Paths that get their own label in the request metrics
+route_paths = {route.path for route in app.routes}
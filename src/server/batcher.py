@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import typing as t
+
+class QueueFullError(Exception):
+    pass
+
+class MicroBatcher:
+    """Collects concurrent requests into batches for a single worker.
+
+    A batch is dispatched once it holds ``max_batch_size`` items or the oldest
+    item has waited ``max_wait_ms``. ``process_batch`` runs in a thread and must
+    return one result per item, in order. ``submit`` raises ``QueueFullError``
+    when ``max_queue_size`` items are already waiting.
+    """
+
+    def __init__(self, process_batch: t.Callable[[t.List[t.Any]], t.List[t.Any]],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0, max_queue_size: int = 1024):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self._queue: t.Optional[asyncio.Queue] = None
+        self._has_items: t.Optional[asyncio.Event] = None
+        self._worker: t.Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._has_items = asyncio.Event()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item: t.Any) -> t.Any:
+        if self._worker is None:
+            raise RuntimeError("Batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"More than {self.max_queue_size} requests are waiting to be processed")
+        self._has_items.set()
+        return await future
+
+    async def _collect(self) -> t.List[t.Tuple[t.Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._has_items.clear()
+            try:
+                await asyncio.wait_for(self._has_items.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Requests that timed out while queued are not worth processing
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await asyncio.to_thread(self.process_batch, [item for item, _ in batch])
+            except Exception as e:
+                logging.exception("Failed to process a batch of %d items", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,30 @@
+import zlib
+
+class GzipRequestMiddleware:
+    """Transparently decompresses request bodies sent with ``Content-Encoding: gzip``.
+
+    Decompression is incremental, so streamed bodies such as NDJSON uploads to
+    /process_batch are never buffered whole.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (b"content-encoding", b"gzip") not in scope["headers"]:
+            await self.app(scope, receive, send)
+            return
+
+        headers = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+        async def receive_decompressed():
+            message = await receive()
+            if message["type"] == "http.request":
+                body = decompressor.decompress(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body += decompressor.flush()
+                message = {**message, "body": body}
+            return message
+
+        await self.app({**scope, "headers": headers}, receive_decompressed, send)
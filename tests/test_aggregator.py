@@ -0,0 +1,103 @@
+import time
+import pytest
+from datetime import datetime, timedelta
+from openexcept.aggregator import OccurrenceAggregator
+from openexcept.storage.base import VectorStorage
+
+class RecordingStorage(VectorStorage):
+    def __init__(self):
+        self.writes = []
+        self.counts = {}
+        self.fail = False
+
+    def store_vector(self, vector, metadata):
+        raise NotImplementedError
+
+    def find_similar(self, vector, threshold):
+        return []
+
+    def increment_occurrence(self, group_id, timestamp):
+        raise AssertionError("occurrences should be written in bulk")
+
+    def increment_occurrences(self, occurrences):
+        if self.fail:
+            raise ConnectionError("storage unavailable")
+        self.writes.append(dict(occurrences))
+        for group_id, delta in occurrences.items():
+            self.counts[group_id] = self.counts.get(group_id, 0) + delta.count
+
+    def get_top_exceptions(self, limit, time_range):
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:limit]
+
+@pytest.fixture
+def storage():
+    return RecordingStorage()
+
+@pytest.fixture
+def aggregator(storage):
+    aggregator = OccurrenceAggregator(storage, flush_interval=60)
+    yield aggregator
+    aggregator.close()
+
+def test_aggregator_merges_occurrences(aggregator, storage):
+    now = datetime.now()
+    aggregator.add("a", now - timedelta(seconds=5))
+    aggregator.add("a", now)
+    aggregator.add("a", now - timedelta(seconds=1))
+    aggregator.add("b", now)
+    aggregator.flush()
+
+    assert len(storage.writes) == 1
+    assert {g: (d.count, d.last_seen) for g, d in storage.writes[0].items()} == {"a": (3, now), "b": (1, now)}
+
+def test_aggregator_flushes_at_max_pending(storage):
+    aggregator = OccurrenceAggregator(storage, flush_interval=60, max_pending=3)
+    for _ in range(3):
+        aggregator.add("a", datetime.now())
+    deadline = time.monotonic() + 5
+    while not storage.counts and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert storage.counts == {"a": 3}
+    aggregator.close()
+
+def test_aggregator_retries_failed_flush(aggregator, storage):
+    aggregator.add("a", datetime.now())
+    storage.fail = True
+    with pytest.raises(ConnectionError):
+        aggregator.flush()
+    storage.fail = False
+    aggregator.add("a", datetime.now())
+    aggregator.flush()
+
+    assert storage.counts == {"a": 2}
+
+def test_aggregator_discard(aggregator, storage):
+    aggregator.add("a", datetime.now())
+    aggregator.add("b", datetime.now())
+    aggregator.discard("a")
+    aggregator.flush()
+
+    assert storage.counts == {"b": 1}
+
+def test_failed_flush_does_not_restore_discarded_groups(aggregator, storage):
+    aggregator.add("a", datetime.now())
+    aggregator.add("b", datetime.now())
+    storage.fail = True
+    # The group is deleted while the failing flush is writing
+    storage.increment_occurrences = lambda occurrences: (aggregator.discard("a"), RecordingStorage.increment_occurrences(storage, occurrences))
+    with pytest.raises(ConnectionError):
+        aggregator.flush()
+    del storage.increment_occurrences
+    storage.fail = False
+    aggregator.flush()
+
+    assert storage.counts == {"b": 1}
+
+def test_aggregator_close_flushes(storage):
+    aggregator = OccurrenceAggregator(storage, flush_interval=60)
+    aggregator.add("a", datetime.now())
+    aggregator.close()
+    aggregator.add("a", datetime.now())  # written through once closed
+
+    assert storage.counts == {"a": 2}
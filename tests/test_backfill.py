@@ -0,0 +1,88 @@
+import io
+import json
+import pytest
+import yaml
+from datetime import timedelta
+from openexcept.easy import OpenExcept
+from openexcept.scripts.backfill import backfill, main, read_jsonl, read_log
+
+LOG = b'''2024-05-01 12:00:00,123 INFO app: started
+2024-05-01 12:00:05,000 ERROR app: request failed
+Traceback (most recent call last):
+  File "/srv/app/api/views.py", line 10, in handle
+    user = load_user(user_id)
+KeyError: 'user_id'
+
+During handling of the above exception, another exception occurred:
+
+Traceback (most recent call last):
+  File "/srv/app/api/views.py", line 12, in handle
+    raise NotFound(user_id)
+app.errors.NotFound: user 42 not found
+2024-05-01 12:01:00,000 ERROR app: shutting down
+Traceback (most recent call last):
+  File "/srv/app/main.py", line 3, in <module>
+KeyboardInterrupt
+'''
+
+def config(tmp_path):
+    return {
+        "storage": {"class": "NumpyVectorStorage", "kwargs": {"path": str(tmp_path / "store")}},
+        "embedding": {"class": "HashedNgramEmbedding", "kwargs": {"dim": 256}, "similarity_threshold": 0.9},
+    }
+
+def write_jsonl(path, messages):
+    with open(path, "w") as f:
+        for i, message in enumerate(messages):
+            f.write(json.dumps({"msg": message, "type": "ValueError", "time": 1714564800 + i}) + "\n")
+
+def test_read_jsonl_aliases_and_offsets():
+    data = b'{"message": "boom", "exc_type": "KeyError", "timestamp": "2024-05-01T12:00:00Z"}\nnot json\n'
+    records = list(read_jsonl(io.BytesIO(data)))
+
+    assert records[0][0]["type"] == "KeyError" and records[0][0]["timestamp"].year == 2024
+    assert records[0][1] == data.index(b"\n") + 1
+    assert records[1] == (None, len(data))
+
+def test_read_log_tracebacks():
+    records = [exception for exception, _ in read_log(io.BytesIO(LOG))]
+
+    assert [(r["type"], r["message"]) for r in records] == [
+        ("app.errors.NotFound", "user 42 not found"), ("KeyboardInterrupt", "")
+    ]
+    assert 'views.py", line 12' in records[0]["stack_trace"]
+    assert records[0]["timestamp"].minute == 0 and records[1]["timestamp"].minute == 1
+
+def test_backfill_groups_and_resumes(tmp_path):
+    path = tmp_path / "exceptions.jsonl"
+    write_jsonl(path, [f"Connection to db-{i % 3} refused" for i in range(6)] + ["Disk full"] * 2)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    grouper = OpenExcept.create_grouper(config(tmp_path))
+    first = backfill(grouper, [str(path)], batch_size=4, checkpoint_path=checkpoint_path, checkpoint_every=1,
+                     out=io.StringIO())
+    grouper.storage.close()
+
+    assert first.exceptions == 8
+    assert first.offsets == {str(path): path.stat().st_size}
+
+    # A rerun resumes at the end of the file and groups nothing twice
+    grouper = OpenExcept.create_grouper(config(tmp_path))
+    second = backfill(grouper, [str(path)], batch_size=4, checkpoint_path=checkpoint_path, out=io.StringIO())
+
+    assert (second.exceptions, second.new_groups) == (8, first.new_groups)
+    assert sum(g["count"] for g in grouper.storage.get_top_exceptions(10, timedelta(days=36500))) == 8
+
+def test_refuses_a_store_in_use(tmp_path, capsys):
+    path = tmp_path / "exceptions.jsonl"
+    write_jsonl(path, ["Disk full"])
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump(config(tmp_path)))
+    # As if the server had the store open
+    server = OpenExcept.create_grouper(config(tmp_path))
+
+    with pytest.raises(SystemExit):
+        main(["--config", str(config_path), str(path)])
+
+    assert "in use by another process" in capsys.readouterr().err
+    server.storage.close()
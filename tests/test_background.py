@@ -0,0 +1,70 @@
+import threading
+import time
+import pytest
+from openexcept.background import BackgroundReporter
+
+class RecordingSender:
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.release.wait()
+        self.batches.append(batch)
+
+@pytest.fixture
+def sender():
+    return RecordingSender()
+
+def test_reporter_sends_in_batches(sender):
+    reporter = BackgroundReporter(sender, batch_size=3, flush_interval=60)
+    for i in range(7):
+        assert reporter.submit({"message": str(i)})
+
+    assert reporter.flush(timeout=5)
+    assert [m["message"] for batch in sender.batches for m in batch] == [str(i) for i in range(7)]
+    assert all(len(batch) <= 3 for batch in sender.batches)
+    assert reporter.stats() == {"queued": 0, "sent": 7, "dropped": 0, "failed": 0}
+    reporter.close()
+
+def test_reporter_drop_oldest(sender):
+    sender.release.clear()
+    reporter = BackgroundReporter(sender, max_queue_size=2, batch_size=1, flush_interval=0.01, overflow="drop_oldest")
+    reporter.submit({"message": "in flight"})
+    while reporter.stats()["queued"]:
+        time.sleep(0.001)  # wait for the worker to pick up the first exception
+    for message in ["a", "b", "c"]:
+        assert reporter.submit({"message": message})
+    sender.release.set()
+    reporter.flush(timeout=5)
+
+    assert [batch[0]["message"] for batch in sender.batches] == ["in flight", "b", "c"]
+    assert reporter.dropped == 1
+    reporter.close()
+
+def test_reporter_drop_newest(sender):
+    sender.release.clear()
+    reporter = BackgroundReporter(sender, max_queue_size=1, batch_size=10, flush_interval=60, overflow="drop_newest")
+    assert reporter.submit({"message": "a"})
+    assert not reporter.submit({"message": "b"})
+    sender.release.set()
+    reporter.close()
+
+    assert sender.batches == [[{"message": "a"}]]
+    assert reporter.dropped == 1
+
+def test_reporter_counts_failures():
+    def failing(batch):
+        raise RuntimeError("server unavailable")
+
+    reporter = BackgroundReporter(failing, flush_interval=60)
+    reporter.submit({"message": "a"})
+    reporter.flush(timeout=5)
+
+    assert reporter.failed == 1
+    reporter.close()
+
+def test_reporter_rejects_unknown_overflow(sender):
+    with pytest.raises(ValueError):
+        BackgroundReporter(sender, overflow="drop_all")
@@ -0,0 +1,106 @@
+import time
+import pytest
+from openexcept.cache import GroupCache, fingerprint
+from openexcept.core import ExceptionEvent, ExceptionGrouper
+from openexcept.normalizers import RegexNormalizer
+
+class CountingEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, exception):
+        self.calls += 1
+        return [1.0, 0.0]
+
+class CountingStorage:
+    def __init__(self):
+        self.searches = 0
+        self.counts = {}
+
+    def store_vector(self, vector, metadata):
+        group_id = str(len(self.counts))
+        self.counts[group_id] = 1
+        return group_id
+
+    def find_similar(self, vector, threshold):
+        self.searches += 1
+        return [(group_id, 0.95) for group_id in self.counts]
+
+    def increment_occurrence(self, group_id, timestamp):
+        self.counts[group_id] += 1
+
+    def get_top_exceptions(self, limit, time_range):
+        return []
+
+@pytest.fixture
+def grouper():
+    return ExceptionGrouper(CountingStorage(), CountingEmbedding(), 0.8, cache=GroupCache(max_size=10))
+
+def test_fingerprint_ignores_whitespace():
+    event1 = ExceptionEvent(message="Connection  refused ", type="ConnectionError")
+    event2 = ExceptionEvent(message="Connection refused", type="ConnectionError")
+    event3 = ExceptionEvent(message="Connection refused", type="TimeoutError")
+
+    assert fingerprint(event1) == fingerprint(event2)
+    assert fingerprint(event1) != fingerprint(event3)
+
+def test_cache_lru_eviction():
+    cache = GroupCache(max_size=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == ("1", 1.0)
+
+    cache.put("c", "3")  # "b" is the least recently used entry
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ("1", 1.0)
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+def test_cache_ttl_expiry():
+    cache = GroupCache(max_size=2, ttl=0.01)
+    cache.put("a", "1")
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.evictions == 1
+
+def test_cache_invalidate_group():
+    cache = GroupCache()
+    cache.put("a", "1")
+    cache.put("b", "1")
+    cache.put("c", "2")
+
+    assert cache.invalidate("1") == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == ("2", 1.0)
+
+def test_grouper_cache_hit_skips_embedding_and_search(grouper):
+    event = ExceptionEvent(message="Division by zero", type="ZeroDivisionError")
+    first = grouper.process(event)
+    second = grouper.process(event)
+
+    assert first.is_new_group
+    assert second.group_id == first.group_id
+    assert not second.is_new_group
+    assert grouper.embedding.calls == 1
+    assert grouper.storage.searches == 1
+    assert grouper.storage.counts[first.group_id] == 2
+
+def test_grouper_invalidate_group(grouper):
+    event = ExceptionEvent(message="Division by zero", type="ZeroDivisionError")
+    group_id = grouper.process(event).group_id
+    grouper.invalidate_group(group_id)
+    grouper.process(event)
+
+    assert grouper.embedding.calls == 2
+
+def test_grouper_normalizer_shares_cache_entry():
+    grouper = ExceptionGrouper(CountingStorage(), CountingEmbedding(), 0.8,
+                               cache=GroupCache(), normalizer=RegexNormalizer())
+    first = grouper.process(ExceptionEvent(message="Connection refused to database xyz123", type="ConnectionError"))
+    second = grouper.process(ExceptionEvent(message="Connection refused to database xyz124", type="ConnectionError"))
+
+    assert second.group_id == first.group_id
+    assert grouper.embedding.calls == 1
+    assert grouper.cache.hits == 1
@@ -0,0 +1,188 @@
+import pytest
+import numpy as np
+from datetime import timedelta
+from openexcept.core import ExceptionEvent, ExceptionGrouper, GroupingResult
+from openexcept.cache import GroupCache
+from openexcept.aggregator import OccurrenceAggregator
+from openexcept.embeddings.base import VectorEmbedding
+from openexcept.storage.base import VectorStorage
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+
+VECTORS = {
+    "ConnectionError: Connection refused": [1.0, 0.0, 0.0],
+    "ConnectionError: Connection reset": [0.95, 0.3, 0.0],
+    "ZeroDivisionError: Division by zero": [0.0, 1.0, 0.0],
+    "IndexError: list index out of range": [0.0, 0.0, 1.0],
+}
+
+class LookupEmbedding(VectorEmbedding):
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, exception):
+        return VECTORS[f"{exception.type}: {exception.message}"]
+
+    def embed_batch(self, exceptions):
+        self.batches.append(len(exceptions))
+        return super().embed_batch(exceptions)
+
+class MemoryStorage(VectorStorage):
+    def __init__(self):
+        self.vectors = {}
+        self.counts = {}
+        self.upserts = 0
+
+    def store_vector(self, vector, metadata):
+        group_id = str(len(self.vectors))
+        self.vectors[group_id] = np.asarray(vector) / np.linalg.norm(vector)
+        self.counts[group_id] = 1
+        return group_id
+
+    def store_vectors(self, vectors, metadatas):
+        self.upserts += 1
+        return super().store_vectors(vectors, metadatas)
+
+    def find_similar(self, vector, threshold):
+        query = np.asarray(vector) / np.linalg.norm(vector)
+        scores = [(group_id, float(stored @ query)) for group_id, stored in self.vectors.items()]
+        return sorted([s for s in scores if s[1] >= threshold], key=lambda s: -s[1])
+
+    def increment_occurrence(self, group_id, timestamp):
+        self.counts[group_id] += 1
+
+    def get_top_exceptions(self, limit, time_range):
+        return []
+
+@pytest.fixture
+def grouper():
+    return ExceptionGrouper(MemoryStorage(), LookupEmbedding(), 0.9, cache=GroupCache())
+
+def event(text):
+    type_name, message = text.split(": ", 1)
+    return ExceptionEvent(message=message, type=type_name)
+
+def test_process_batch_groups_within_batch(grouper):
+    results = grouper.process_batch([
+        event("ConnectionError: Connection refused"),
+        event("ZeroDivisionError: Division by zero"),
+        event("ConnectionError: Connection reset"),
+        event("ConnectionError: Connection refused"),
+    ])
+
+    assert [r.is_new_group for r in results] == [True, True, False, False]
+    assert results[0].group_id == results[2].group_id == results[3].group_id
+    assert results[1].group_id != results[0].group_id
+    assert grouper.embedding.batches == [3]  # duplicate text embedded once
+    assert grouper.storage.upserts == 1
+    assert grouper.storage.counts == {results[0].group_id: 3, results[1].group_id: 1}
+
+def test_process_batch_matches_existing_groups(grouper):
+    existing = grouper.process(event("ZeroDivisionError: Division by zero"))
+    results = grouper.process_batch([
+        event("IndexError: list index out of range"),
+        event("ZeroDivisionError: Division by zero"),
+    ])
+
+    assert results[0].is_new_group
+    assert results[1].group_id == existing.group_id
+    assert not results[1].is_new_group
+    assert grouper.cache.hits == 1
+
+def test_process_batch_agrees_with_process():
+    texts = list(VECTORS) * 2
+    sequential = ExceptionGrouper(MemoryStorage(), LookupEmbedding(), 0.9)
+    batched = ExceptionGrouper(MemoryStorage(), LookupEmbedding(), 0.9)
+
+    expected = [sequential.process(event(text)).group_id for text in texts]
+    actual = [r.group_id for r in batched.process_batch([event(text) for text in texts])]
+
+    assert actual == expected
+    assert batched.storage.counts == sequential.storage.counts
+
+def test_process_batch_empty(grouper):
+    assert grouper.process_batch([]) == []
+
+def test_grouper_with_aggregator_flushes_before_reading():
+    storage = MemoryStorage()
+    grouper = ExceptionGrouper(storage, LookupEmbedding(), 0.9,
+                               aggregator=OccurrenceAggregator(storage, flush_interval=60))
+    group_id = grouper.process(event("ZeroDivisionError: Division by zero")).group_id
+    grouper.process_batch([event("ZeroDivisionError: Division by zero")] * 3)
+
+    assert storage.counts[group_id] == 1
+    grouper.get_top_exceptions()
+    assert storage.counts[group_id] == 4
+    grouper.aggregator.close()
+
+class MessageEmbedding(VectorEmbedding):
+    """Ignores the type, so only the candidate filter tells types apart."""
+
+    def embed(self, exception):
+        return VECTORS[f"ConnectionError: {exception.message}"]
+
+def filtered_grouper(**kwargs):
+    return ExceptionGrouper(NumpyVectorStorage(size=3), MessageEmbedding(), 0.9, filter_fields=["type"], **kwargs)
+
+def test_candidate_filter_keeps_types_apart():
+    grouper = filtered_grouper()
+
+    first = grouper.process(event("ConnectionError: Connection refused"))
+    other_type = grouper.process(event("TimeoutError: Connection refused"))
+    same_type = grouper.process(event("ConnectionError: Connection reset"))
+
+    assert other_type.is_new_group and other_type.group_id != first.group_id
+    assert same_type.group_id == first.group_id
+    metadata = {e["group_id"]: e["metadata"]["type"] for e in grouper.storage.get_top_exceptions(5, timedelta(days=1))}
+    assert metadata == {first.group_id: "ConnectionError", other_type.group_id: "TimeoutError"}
+
+def test_candidate_filter_fallback_searches_all_groups():
+    grouper = filtered_grouper(filter_fallback=True)
+
+    first = grouper.process(event("ConnectionError: Connection refused"))
+    results = grouper.process_batch([event("TimeoutError: Connection reset")])
+
+    assert results[0].group_id == first.group_id
+
+def test_candidate_filter_in_batch():
+    grouper = filtered_grouper()
+    existing = grouper.process(event("ConnectionError: Connection refused"))
+
+    results = grouper.process_batch([
+        event("TimeoutError: Connection refused"),
+        event("TimeoutError: Connection reset"),
+        event("ConnectionError: Connection reset"),
+        event("OSError: Connection reset"),
+    ])
+
+    assert results[0].is_new_group and results[1].group_id == results[0].group_id
+    assert results[2].group_id == existing.group_id
+    assert results[3].is_new_group and results[3].group_id != results[0].group_id
+
+def test_candidate_filter_on_context():
+    grouper = ExceptionGrouper(NumpyVectorStorage(size=3), MessageEmbedding(), 0.9, cache=GroupCache(),
+                               filter_fields=["type", "context.service"])
+
+    def with_service(service):
+        return ExceptionEvent(message="Connection refused", type="ConnectionError", context={"service": service})
+
+    billing = grouper.process(with_service("billing"))
+    search = grouper.process(with_service("search"))
+
+    assert search.group_id != billing.group_id
+    assert grouper.process(with_service("billing")).group_id == billing.group_id
+    assert grouper.process(with_service("search")).group_id == search.group_id
+
+def test_process_columns_returns_arrays(grouper):
+    texts = ["ConnectionError: Connection refused", "ZeroDivisionError: Division by zero",
+             "ConnectionError: Connection reset"]
+    results = grouper.process_columns([t.split(": ")[1] for t in texts], [t.split(": ")[0] for t in texts])
+
+    assert isinstance(results.confidences, np.ndarray) and results.confidences.dtype == np.float32
+    assert results.is_new_group.tolist() == [True, True, False]
+    assert results.group_ids[2] == results.group_ids[0] != results.group_ids[1]
+    assert [r.group_id for r in results] == results.group_ids.tolist()
+    assert results[2].confidence == pytest.approx(0.95 / np.linalg.norm([0.95, 0.3]), rel=1e-5)
+
+def test_events_and_results_have_no_instance_dict():
+    assert not hasattr(event("ConnectionError: Connection refused"), "__dict__")
+    assert not hasattr(GroupingResult("a", 1.0), "__dict__")
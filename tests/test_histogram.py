@@ -0,0 +1,37 @@
+from datetime import datetime
+from openexcept.histogram import OccurrenceDelta, OccurrenceHistogram
+
+NOW = datetime(2024, 5, 1, 12, 30).timestamp()
+
+def test_occurrence_delta_merge():
+    delta = OccurrenceDelta()
+    delta.add(datetime(2024, 5, 1, 12, 0, 10))
+    delta.add(datetime(2024, 5, 1, 12, 0, 50), count=2)
+    other = OccurrenceDelta()
+    other.add(datetime(2024, 5, 1, 12, 5))
+    delta.merge(other)
+
+    assert delta.count == 4
+    assert delta.last_seen == datetime(2024, 5, 1, 12, 5)
+    assert sorted(delta.minutes.values()) == [1, 3]
+
+def test_histogram_rolls_up_minutes():
+    histogram = OccurrenceHistogram()
+    histogram.add({int(NOW) - 60: 2, int(NOW) - 7200: 3})
+
+    assert histogram.count_since(NOW - 300, "minute") == 2
+    assert histogram.count_since(NOW - 3 * 3600, "hour") == 5
+    assert histogram.count_since(NOW - 86400, "day") == 5
+
+def test_histogram_prune_keeps_retention():
+    histogram = OccurrenceHistogram(retention={"minute": 10})
+    histogram.add({int(NOW) - 60: 1, int(NOW) - 3600: 1})
+    histogram.prune(NOW)
+
+    assert histogram.count_since(0, "minute") == 1
+    assert histogram.count_since(0, "hour") == 2
+
+def test_resolution_for_window():
+    assert OccurrenceHistogram.resolution_for(NOW - 3600, NOW) == "minute"
+    assert OccurrenceHistogram.resolution_for(NOW - 86400, NOW) == "hour"
+    assert OccurrenceHistogram.resolution_for(NOW - 30 * 86400, NOW) == "day"
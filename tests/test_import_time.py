@@ -0,0 +1,20 @@
+import textwrap
+from openexcept.scripts.import_benchmark import measure
+
+def test_package_import_skips_heavy_backends():
+    result = measure("import openexcept", runs=1)
+    assert result["heavy_modules"] == []
+
+def test_remote_client_skips_heavy_backends(tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("storage:\n  url: http://localhost:8000\n")
+    statement = textwrap.dedent(f"""
+        from openexcept import OpenExcept
+        OpenExcept(config_path={str(config_path)!r})
+    """)
+    result = measure(statement, runs=1)
+    assert result["heavy_modules"] == []
+
+def test_import_time_budget():
+    # Generous budget: importing the backends used to take several seconds
+    assert measure("import openexcept", runs=3)["median_seconds"] < 2.0
@@ -0,0 +1,101 @@
+import numpy as np
+from datetime import datetime, timedelta
+from openexcept.core import ExceptionEvent, ExceptionGrouper
+from openexcept.cache import GroupCache
+from openexcept.embeddings.hashed_ngram import HashedNgramEmbedding
+from openexcept.histogram import OccurrenceDelta
+from openexcept.maintenance import GroupMaintenance
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+
+def grouper(**kwargs):
+    return ExceptionGrouper(NumpyVectorStorage(size=256), HashedNgramEmbedding(dim=256), 0.99,
+                            cache=GroupCache(), **kwargs)
+
+def process(grouper, message, type_name="ValueError", count=1):
+    for _ in range(count):
+        group_id = grouper.process(ExceptionEvent(message=message, type=type_name)).group_id
+    return group_id
+
+def test_merges_near_duplicates_into_the_largest_group():
+    g = grouper()
+    big = process(g, "Connection to the primary database refused", count=3)
+    small = process(g, "Connection to the primary database refused!")
+    other = process(g, "Disk quota exceeded")
+
+    report = GroupMaintenance(g, merge_threshold=0.9).run()
+
+    assert report == {"merged": 1, "evicted": 0}
+    top = g.get_top_exceptions(10)
+    assert {t["group_id"]: t["count"] for t in top} == {big: 4, other: 1}
+    assert g.storage.resolve_group(small) == big
+    assert sum(count for _, count in g.get_occurrence_histogram(small)) == 4
+    # The cached fingerprint of the merged group is gone
+    assert process(g, "Connection to the primary database refused!") != small
+
+def test_groups_of_other_types_are_not_merged():
+    g = grouper(filter_fields=["type"])
+    process(g, "Connection refused", type_name="ConnectionError")
+    process(g, "Connection refused", type_name="OSError")
+
+    assert GroupMaintenance(g, merge_threshold=0.5).find_duplicates() == []
+
+def test_chains_of_similar_groups_are_not_merged_end_to_end():
+    storage = NumpyVectorStorage(size=3)
+    g = ExceptionGrouper(storage, HashedNgramEmbedding(dim=3), 0.99, cache=GroupCache())
+    # a~b and b~c at cos 45 degrees, a and c orthogonal
+    a, b, c = storage.store_vectors(np.array([[1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float32),
+                                    [{"type": "ValueError"} for _ in range(3)])
+    delta = OccurrenceDelta()
+    delta.add(datetime.now(), 2)
+    storage.increment_occurrences({a: delta})
+
+    assert GroupMaintenance(g, merge_threshold=0.7).find_duplicates() == [[a, b]]
+
+def test_evicts_stale_groups():
+    g = grouper()
+    stale = process(g, "Disk quota exceeded")
+    fresh = process(g, "Connection refused")
+    g.storage._last_seen[g.storage._rows[stale]] = (datetime.now() - timedelta(days=40)).timestamp()
+
+    report = GroupMaintenance(g, ttl_days=30).run()
+
+    assert report == {"merged": 0, "evicted": 1}
+    assert g.storage.resolve_group(stale) is None
+    assert [t["group_id"] for t in g.get_top_exceptions(10)] == [fresh]
+    assert process(g, "Disk quota exceeded") not in (stale, fresh)
+
+def test_merge_and_compaction_survive_restart(tmp_path):
+    storage = NumpyVectorStorage(size=4, path=str(tmp_path))
+    vectors = np.eye(4, dtype=np.float32)
+    ids = storage.store_vectors(vectors, [{"stack_fingerprint": f"f{i}"} for i in range(4)])
+    delta = OccurrenceDelta()
+    delta.add(datetime.now(), 2)
+    storage.increment_occurrences({ids[1]: delta})
+
+    storage.merge_groups(ids[0], [ids[1]])
+    storage.delete_groups([ids[2]])
+    storage.compact()
+    storage.store_vector([1.0, 1.0, 0.0, 0.0], {})
+    storage.close()
+
+    storage = NumpyVectorStorage(size=4, path=str(tmp_path))
+    assert len(storage) == 3
+    assert storage.resolve_group(ids[1]) == ids[0]
+    assert storage.find_group_by_fingerprint("f1") == ids[0]
+    assert storage.find_similar(vectors[3], 0.99)[0][0] == ids[3]
+    assert {t["group_id"]: t["count"] for t in storage.get_top_exceptions(10, timedelta(hours=1))}[ids[0]] == 4
+
+def test_all_merges_of_a_pass_rewrite_the_storage_once(tmp_path, monkeypatch):
+    storage = NumpyVectorStorage(size=8, path=str(tmp_path))
+    g = ExceptionGrouper(storage, HashedNgramEmbedding(dim=8), 0.99, cache=GroupCache())
+    vectors = np.repeat(np.eye(4, 8, dtype=np.float32), 2, axis=0)
+    vectors[1::2, 7] = 0.05
+    ids = storage.store_vectors(vectors, [{"type": "ValueError"} for _ in range(8)])
+    checkpoints = []
+    monkeypatch.setattr(storage, "checkpoint", lambda: checkpoints.append(len(storage)))
+
+    report = GroupMaintenance(g, merge_threshold=0.99, compact=False).run()
+
+    assert report == {"merged": 4, "evicted": 0}
+    assert checkpoints == [4]
+    assert [storage.resolve_group(group_id) for group_id in ids[1::2]] == ids[::2]
@@ -0,0 +1,43 @@
+from openexcept.aggregator import OccurrenceAggregator
+from openexcept.cache import GroupCache
+from openexcept.core import ExceptionEvent, ExceptionGrouper
+from openexcept.embeddings.hashed_ngram import HashedNgramEmbedding
+from openexcept.metrics import Metrics
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+
+def test_render_prometheus_text():
+    metrics = Metrics()
+    metrics.inc("exceptions_total", 3, help="Exceptions grouped")
+    metrics.observe("stage_duration_seconds", 0.003, (("stage", "embed"), ("backend", 'A"B')))
+    metrics.register_stats("cache", lambda: {"size": 2, "hits": 5}, cache="group")
+
+    lines = metrics.render().splitlines()
+
+    assert "# HELP openexcept_exceptions_total Exceptions grouped" in lines
+    assert "openexcept_exceptions_total 3" in lines
+    assert 'openexcept_stage_duration_seconds_bucket{stage="embed",backend="A\\"B",le="0.0025"} 0' in lines
+    assert 'openexcept_stage_duration_seconds_bucket{stage="embed",backend="A\\"B",le="0.005"} 1' in lines
+    assert 'openexcept_stage_duration_seconds_bucket{stage="embed",backend="A\\"B",le="+Inf"} 1' in lines
+    assert 'openexcept_stage_duration_seconds_count{stage="embed",backend="A\\"B"} 1' in lines
+    assert "# TYPE openexcept_cache_hits_total counter" in lines
+    assert 'openexcept_cache_size{cache="group"} 2' in lines
+
+def test_grouper_reports_stages_and_counts():
+    metrics = Metrics()
+    storage = NumpyVectorStorage(size=64)
+    aggregator = OccurrenceAggregator(storage, flush_interval=60, metrics=metrics)
+    grouper = ExceptionGrouper(storage, HashedNgramEmbedding(dim=64), 0.9, cache=GroupCache(),
+                               aggregator=aggregator, metrics=metrics)
+
+    grouper.process_batch([ExceptionEvent("Connection refused", "ConnectionError")] * 3)
+    grouper.process(ExceptionEvent("Connection refused", "ConnectionError"))
+    aggregator.close()
+
+    text = metrics.render()
+    assert "openexcept_exceptions_total 4" in text
+    assert "openexcept_new_groups_total 1" in text
+    assert "openexcept_cached_exceptions_total 1" in text
+    for stage, backend in [("embed", "HashedNgramEmbedding"), ("search", "NumpyVectorStorage"),
+                           ("store", "NumpyVectorStorage"), ("increment", "NumpyVectorStorage")]:
+        assert f'openexcept_stage_duration_seconds_count{{stage="{stage}",backend="{backend}"}} 1' in text
+    assert 'openexcept_grouping_batch_size_bucket{le="4"} 2' in text
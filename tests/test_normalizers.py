@@ -0,0 +1,63 @@
+import pytest
+from openexcept.core import ExceptionEvent
+from openexcept.normalizers import RegexNormalizer
+
+@pytest.fixture
+def normalizer():
+    return RegexNormalizer()
+
+@pytest.mark.parametrize("message, expected", [
+    ("Connection refused to database xyz123", "Connection refused to database <ID>"),
+    ("Connection refused to database xyz124", "Connection refused to database <ID>"),
+    ("Session user_42 expired", "Session <ID> expired"),
+    ("Replica db-7 is down", "Replica <ID> is down"),
+    ("Unsupported version 1.2.3 of protocol", "Unsupported version <NUM> of protocol"),
+    ("Commit a1b2c3 not found", "Commit <ID> not found"),
+    ("Object at 0x7f3a2b1c not found", "Object at <HEX> not found"),
+    ("User 550e8400-e29b-41d4-a716-446655440000 missing", "User <UUID> missing"),
+    ("Timeout connecting to 10.0.0.12:5432 after 30.5 seconds", "Timeout connecting to <IP> after <NUM> seconds"),
+    ("No such file: /var/log/app-1/out.log", "No such file: <PATH>"),
+    ("GET https://api.example.com/v1/users/42 failed with 503", "GET <URL> failed with <NUM>"),
+    ("list index out of range", "list index out of range"),
+    ("Connect to fe80::1 failed", "Connect to <IP> failed"),
+    ("Host 2001:db8:85a3:0:0:8a2e:370:7334 unreachable", "Host <IP> unreachable"),
+])
+def test_regex_normalizer_masks(normalizer, message, expected):
+    assert normalizer.normalize(message) == expected
+
+@pytest.mark.parametrize("message", [
+    "No module named 'h5py'",
+    "No module named 'boto3'",
+    "'utf-8' codec can't decode byte",
+    "Incorrect padding in base64 sha256 digest",
+    "Cannot cast int32 to float16",
+    "Expected 2D array, got 1D array instead",
+    "std::vector index out of range",
+    "Wheel for x86_64 not found, UTF-8 and SHA256 required",
+])
+def test_regex_normalizer_keeps_meaningful_tokens(normalizer, message):
+    assert normalizer.normalize(message) == message
+
+def test_regex_normalizer_does_not_mask_times_as_ip(normalizer):
+    assert normalizer.normalize("Job scheduled at 12:30:45 failed") == "Job scheduled at <NUM>:<NUM>:<NUM> failed"
+
+def test_regex_normalizer_mask_subset():
+    normalizer = RegexNormalizer(masks=["number"])
+    assert normalizer.normalize("Retry 3 of job abc123") == "Retry <NUM> of job abc123"
+
+def test_regex_normalizer_extra_patterns():
+    normalizer = RegexNormalizer(extra_patterns={"<EMAIL>": r"[\w.]+@[\w.]+"})
+    assert normalizer.normalize("Unknown user bob@example.com") == "Unknown user <EMAIL>"
+
+def test_regex_normalizer_unknown_mask():
+    with pytest.raises(ValueError):
+        RegexNormalizer(masks=["phone"])
+
+def test_normalize_event_keeps_other_fields(normalizer):
+    event = ExceptionEvent(message="Retry 3 failed", type="RuntimeError", stack_trace="tb", context={"a": 1})
+    normalized = normalizer.normalize_event(event)
+
+    assert normalized.message == "Retry <NUM> failed"
+    assert normalized.type == "RuntimeError"
+    assert normalized.timestamp == event.timestamp
+    assert normalized.context == {"a": 1}
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from openexcept.remote import AsyncOpenExcept, HTTPOptions, create_session, send_request
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    failures = 0
+    failure_status = 503
+    delay = 0.0
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        FlakyHandler.requests.append(json.loads(body))
+        time.sleep(FlakyHandler.delay)
+        if FlakyHandler.failures:
+            FlakyHandler.failures -= 1
+            self.send_response(FlakyHandler.failure_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        response = json.dumps({"group_ids": [str(i) for i, _ in enumerate(FlakyHandler.requests[-1])]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    FlakyHandler.failures = 0
+    FlakyHandler.failure_status = 503
+    FlakyHandler.delay = 0.0
+    FlakyHandler.requests = []
+    httpd = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+@pytest.fixture
+def options():
+    return HTTPOptions(max_retries=2, backoff_factor=0.01, gzip_min_size=10)
+
+def test_encode_gzips_large_bodies(options):
+    body, headers = options.encode([{"message": "x" * 100}])
+    assert headers == {"Content-Encoding": "gzip"}
+    assert json.loads(gzip.decompress(body)) == [{"message": "x" * 100}]
+
+    body, headers = HTTPOptions(gzip_min_size=1000).encode({"message": "x"})
+    assert headers == {}
+    assert json.loads(body) == {"message": "x"}
+
+def test_retry_delay_is_bounded(options):
+    assert all(0 <= options.retry_delay(attempt) <= options.max_backoff for attempt in range(20))
+    assert options.retry_delay(0, retry_after="2") == 2.0
+
+def test_send_request_retries_server_errors(server, options):
+    FlakyHandler.failures = 2
+    session = create_session({"Content-Type": "application/json"}, options)
+    result = send_request(session, "POST", f"{server}/process_batch", options, data=[{"message": "a"}] * 3)
+
+    assert result == {"group_ids": ["0", "1", "2"]}
+    assert len(FlakyHandler.requests) == 3
+
+def test_send_request_gives_up_after_max_retries(server, options):
+    FlakyHandler.failures = 5
+    session = create_session({}, options)
+    with pytest.raises(Exception):
+        send_request(session, "POST", f"{server}/process_batch", options, data=[])
+    assert len(FlakyHandler.requests) == options.max_retries + 1
+
+def test_send_request_does_not_resend_posts_the_server_may_have_processed(server, options):
+    session = create_session({}, options)
+    FlakyHandler.failures = 1
+    FlakyHandler.failure_status = 500
+    with pytest.raises(Exception):
+        send_request(session, "POST", f"{server}/process_batch", options, data=[])
+    assert len(FlakyHandler.requests) == 1
+
+    FlakyHandler.failures = 0
+    FlakyHandler.delay = 0.5
+    options.timeout = 0.1
+    with pytest.raises(Exception):
+        send_request(session, "POST", f"{server}/process_batch", options, data=[])
+    assert len(FlakyHandler.requests) == 2
+
+def test_send_request_retries_posts_that_never_connected(options, monkeypatch):
+    attempts = []
+    monkeypatch.setattr("openexcept.remote.time.sleep", attempts.append)
+    session = create_session({}, options)
+    with pytest.raises(Exception):
+        send_request(session, "POST", "http://127.0.0.1:1/process_batch", options, data=[])
+    assert len(attempts) == options.max_retries
+
+def test_async_client_groups_exceptions(server, tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        f"storage:\n  url: {server}\n  backoff_factor: 0.01\n"
+        "embedding:\n  class: SentenceTransformerEmbedding\n  similarity_threshold: 0.8\n"
+    )
+    FlakyHandler.failures = 1
+
+    async def run():
+        async with AsyncOpenExcept(config_path=str(config_path)) as client:
+            return await client.group_exceptions([{"message": "a"}, {"message": "b", "type": "ValueError"}])
+
+    assert asyncio.run(run()) == ["0", "1"]
+    assert FlakyHandler.requests[-1][1]["type"] == "ValueError"
@@ -0,0 +1,59 @@
+import importlib
+import os
+import sys
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+from openexcept import OpenExcept
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump({
+        "storage": {"class": "NumpyVectorStorage"},
+        "embedding": {"class": "HashedNgramEmbedding", "kwargs": {"dim": 256}, "similarity_threshold": 0.9},
+        "server": {"bulk_chunk_size": 2},
+    }))
+    monkeypatch.setenv("OPENEXCEPT_CONFIG", str(config_path))
+    # The app's OpenExcept must be built from this config, not reuse the singleton of other tests
+    monkeypatch.setattr(OpenExcept, "_instance", None)
+    sys.modules.pop("server.app", None)
+    app = importlib.import_module("server.app")
+    with TestClient(app.app) as client:
+        yield app, client
+
+def exceptions(count):
+    return [{"message": f"Disk {i} full", "type": "OSError"} for i in range(count)]
+
+def test_invalid_exception_groups_nothing(server):
+    app, client = server
+    payload = exceptions(5)
+    payload[3] = {"type": "OSError"}
+
+    response = client.post("/process_batch", json=payload)
+
+    assert response.status_code == 422
+    assert "index 3" in response.json()["detail"]
+    assert app.grouper.get_top_exceptions(limit=10) == []
+
+def test_failed_chunk_reports_the_exceptions_already_grouped(server, monkeypatch):
+    app, client = server
+    group_exceptions = app.grouper.group_exceptions
+    calls = []
+
+    def fail_second_chunk(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise RuntimeError("storage unavailable")
+        return group_exceptions(chunk)
+
+    monkeypatch.setattr(app.grouper, "group_exceptions", fail_second_chunk)
+    response = client.post("/process_batch", json=exceptions(5))
+
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert detail["failed_index"] == 2
+    assert len(detail["group_ids"]) == 2
+    assert detail["error"] == "storage unavailable"
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from openexcept.core import ExceptionEvent, ExceptionGrouper
+from openexcept.embeddings.hashed_ngram import HashedNgramEmbedding
+from openexcept.stacktrace import StackFingerprinter, parse_stack_trace
+from openexcept.storage.numpy_storage import NumpyVectorStorage
+
+PYTHON_TRACE = '''Traceback (most recent call last):
+  File "/srv/deploy-{release}/myapp/api/views.py", line {line}, in handle
+    user = load_user(user_id)
+  File "/usr/lib/python3.11/json/__init__.py", line 346, in loads
+    return _default_decoder.decode(s)
+  File "/venv/lib/python3.11/site-packages/requests/api.py", line 73, in get
+    return request("get", url, params=params, **kwargs)
+  File "/srv/deploy-{release}/myapp/db/conn.py", line {line}, in connect
+    raise ConnectionError(message)
+'''
+
+JAVA_TRACE = '''java.lang.IllegalStateException: closed
+\tat com.example.Dao.lambda$load$0(Dao.java:42)
+\tat java.base/java.util.ArrayList.forEach(ArrayList.java:1541)
+\tat com.example.Service.run(Service.java:10)
+'''
+
+JS_TRACE = '''TypeError: x is undefined
+    at load (/srv/app/lib/dao.js:42:7)
+    at /srv/app/node_modules/express/lib/router.js:10:3
+'''
+
+class CountingEmbedding(HashedNgramEmbedding):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.embedded = 0
+
+    def embed_matrix(self, exceptions):
+        self.embedded += len(exceptions)
+        return super().embed_matrix(exceptions)
+
+def stack_event(message, release=1, line=10, type_name="ConnectionError"):
+    return ExceptionEvent(message=message, type=type_name,
+                          stack_trace=PYTHON_TRACE.format(release=release, line=line))
+
+def test_parse_python_frames_innermost_first():
+    frames = parse_stack_trace(PYTHON_TRACE.format(release=1, line=10))
+
+    assert [str(frame) for frame in frames] == [
+        "db.conn:connect", "requests.api:get", "json.__init__:loads", "api.views:handle"
+    ]
+    assert [frame.in_app for frame in frames] == [True, False, False, True]
+
+def test_parse_python_frames_relative_to_app_paths():
+    frames = parse_stack_trace(PYTHON_TRACE.format(release=1, line=10), app_paths=["/srv/deploy-1"])
+
+    assert str(frames[0]) == "myapp.db.conn:connect"
+
+def test_parse_java_and_javascript_frames():
+    java = parse_stack_trace(JAVA_TRACE)
+    js = parse_stack_trace(JS_TRACE)
+
+    assert [str(frame) for frame in java] == [
+        "com.example.Dao:lambda$load", "java.base/java.util.ArrayList:forEach", "com.example.Service:run"
+    ]
+    assert [frame.in_app for frame in java] == [True, False, True]
+    assert [str(frame) for frame in js] == ["lib.dao:load", "lib.router:<anonymous>"]
+    assert [frame.in_app for frame in js] == [True, False]
+
+def test_fingerprint_ignores_line_numbers_and_install_paths():
+    fingerprinter = StackFingerprinter(top_k=2)
+
+    def key(event):
+        return fingerprinter.fingerprint(event.type, fingerprinter.frames(event.stack_trace))
+
+    first = key(stack_event("a", release=1, line=10))
+    assert first == key(stack_event("b", release=2, line=99))
+    assert first != key(stack_event("a", type_name="TimeoutError"))
+    assert [str(frame) for frame in fingerprinter.frames(PYTHON_TRACE.format(release=1, line=1))] == [
+        "db.conn:connect", "api.views:handle"
+    ]
+    assert fingerprinter.frames("no frames here") == []
+
+def test_identical_stack_skips_the_model():
+    embedding = CountingEmbedding()
+    grouper = ExceptionGrouper(NumpyVectorStorage(size=256), embedding, 0.99,
+                               stack_fingerprinter=StackFingerprinter())
+
+    first = grouper.process(stack_event("Connection refused by host a"))
+    second = grouper.process(stack_event("Timed out after 30 seconds", release=2, line=77))
+    results = grouper.process_batch([stack_event("Something else entirely", line=5), stack_event("and again")])
+
+    assert first.is_new_group
+    assert second.group_id == first.group_id and not second.is_new_group
+    assert [r.group_id for r in results] == [first.group_id] * 2
+    assert embedding.embedded == 1
+    assert grouper.storage.get_top_exceptions(5, timedelta(days=1))[0]["count"] == 4
+
+def test_frames_are_part_of_the_embedded_text():
+    grouper = ExceptionGrouper(NumpyVectorStorage(size=256), CountingEmbedding(), 0.99,
+                               stack_fingerprinter=StackFingerprinter(top_k=1))
+
+    with_stack = grouper.process(stack_event("Connection refused"))
+    without_stack = grouper.process(ExceptionEvent(message="Connection refused", type="ConnectionError"))
+
+    assert with_stack.group_id != without_stack.group_id
+    metadata = grouper.storage.get_top_exceptions(5, timedelta(days=1))
+    templates = {m["metadata"].get("template") for m in metadata}
+    assert "Connection refused at db.conn:connect" in templates
+
+def test_batch_shares_one_group_per_stack():
+    embedding = CountingEmbedding()
+    grouper = ExceptionGrouper(NumpyVectorStorage(size=256), embedding, 0.99,
+                               stack_fingerprinter=StackFingerprinter())
+
+    results = grouper.process_batch([stack_event("first message"), stack_event("second message", line=3)])
+
+    assert results[0].group_id == results[1].group_id
+    assert [r.is_new_group for r in results] == [True, False]
+    assert embedding.embedded == 1
+
+def test_fingerprints_survive_restart(tmp_path):
+    storage = NumpyVectorStorage(size=256, path=str(tmp_path))
+    grouper = ExceptionGrouper(storage, CountingEmbedding(), 0.99, stack_fingerprinter=StackFingerprinter())
+    group_id = grouper.process(stack_event("Connection refused")).group_id
+    storage.close()
+
+    embedding = CountingEmbedding()
+    grouper = ExceptionGrouper(NumpyVectorStorage(size=256, path=str(tmp_path)), embedding, 0.99,
+                               stack_fingerprinter=StackFingerprinter())
+
+    assert grouper.process(stack_event("Other message")).group_id == group_id
+    assert embedding.embedded == 0
+
+def test_invalidated_group_is_forgotten():
+    fingerprinter = StackFingerprinter()
+    fingerprinter.remember("key", "group")
+    fingerprinter.invalidate("group")
+
+    assert fingerprinter.lookup("key") is None